@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CompetencyScore, FeedbackReport, UserAnalytics, CompetencyDefinition
+from .models import CompetencyScore, FeedbackReport, UserAnalytics, CompetencyDefinition, EvaluationJob, UserCompetencyStat, RoleLeaderboardEntry, RoleScoreBucket
 
 @admin.register(CompetencyScore)
 class CompetencyScoreAdmin(admin.ModelAdmin):
@@ -23,6 +23,25 @@ class UserAnalyticsAdmin(admin.ModelAdmin):
     ordering = ['-average_overall_score']
     readonly_fields = ['last_updated']
 
+@admin.register(UserCompetencyStat)
+class UserCompetencyStatAdmin(admin.ModelAdmin):
+    list_display = ['user', 'competency_name', 'score_sum', 'score_count']
+    list_filter = ['competency_name']
+    search_fields = ['user__username', 'competency_name']
+
+@admin.register(RoleLeaderboardEntry)
+class RoleLeaderboardEntryAdmin(admin.ModelAdmin):
+    list_display = ['user', 'role', 'average_score', 'report_count', 'updated_at']
+    list_filter = ['role']
+    search_fields = ['user__username']
+    ordering = ['role', '-average_score']
+
+@admin.register(RoleScoreBucket)
+class RoleScoreBucketAdmin(admin.ModelAdmin):
+    list_display = ['role', 'bucket', 'entry_count']
+    list_filter = ['role']
+    ordering = ['role', '-bucket']
+
 @admin.register(CompetencyDefinition)
 class CompetencyDefinitionAdmin(admin.ModelAdmin):
     list_display = ['name', 'icon', 'is_active', 'order']
@@ -30,3 +49,10 @@ class CompetencyDefinitionAdmin(admin.ModelAdmin):
     search_fields = ['name', 'description']
     ordering = ['order', 'name']
     list_editable = ['is_active', 'order']
+
+@admin.register(EvaluationJob)
+class EvaluationJobAdmin(admin.ModelAdmin):
+    list_display = ['session', 'status', 'attempts', 'next_attempt_at', 'updated_at']
+    list_filter = ['status']
+    search_fields = ['session__user__username', 'session__title']
+    readonly_fields = ['created_at', 'updated_at', 'finished_at']
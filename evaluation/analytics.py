@@ -0,0 +1,348 @@
+import logging
+from collections import Counter
+
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, FirstValue, RowNumber
+from django.utils import timezone
+
+from .analytics_cache import invalidate_user_data
+from .models import (
+    CompetencyScore, FeedbackReport, RoleLeaderboardEntry, RoleScoreBucket, UserAnalytics, UserCompetencyStat,
+    leaderboard_bucket,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def evaluated_reports():
+    """
+    📋 Reportes que cuentan para las analytics: los generados por la evaluación.
+    Los reportes provisionales que crea finish_timer (sin performance_level) no cuentan.
+    """
+    return FeedbackReport.objects.exclude(performance_level='')
+
+
+def _average(total, count):
+    return total / count if count else 0.0
+
+
+def _set_extreme_competencies(analytics, stats):
+    # Misma regla que la reconstrucción: mayor/menor promedio, empate por nombre
+    stats = [stat for stat in stats if stat.score_count]
+    if not stats:
+        analytics.strongest_competency = ''
+        analytics.weakest_competency = ''
+        return
+    analytics.strongest_competency = min(stats, key=lambda s: (-s.average, s.competency_name)).competency_name
+    analytics.weakest_competency = min(stats, key=lambda s: (s.average, s.competency_name)).competency_name
+
+
+def apply_report_to_analytics(user_id, report, competency_scores, questions_asked):
+    """
+    ➕ PROPÓSITO: Suma un reporte nuevo a las analytics del usuario (agregado incremental)
+    📝 QUÉ HACE: Bloquea la fila de UserAnalytics y las sumas por competencia, aplica el
+    delta del reporte y recalcula promedios como suma/cantidad. El coste no depende de
+    cuántas sesiones tenga el usuario.
+    ⚠️  IMPORTANTE: Debe llamarse dentro de la misma transacción que crea el reporte
+    """
+    analytics, _ = UserAnalytics.objects.select_for_update().get_or_create(user_id=user_id)
+
+    analytics.total_sessions_evaluated += 1
+    analytics.total_overall_score += report.average_score
+    analytics.average_overall_score = _average(analytics.total_overall_score, analytics.total_sessions_evaluated)
+    analytics.total_questions_answered += questions_asked or 0
+    analytics.total_session_time_minutes += report.session_duration_minutes or 0
+
+    if report.time_management_score is not None:
+        analytics.total_time_management_evaluations += 1
+        analytics.total_time_management_score += report.time_management_score
+        analytics.average_time_management_score = _average(
+            analytics.total_time_management_score, analytics.total_time_management_evaluations
+        )
+
+    stats = {
+        stat.competency_name: stat
+        for stat in UserCompetencyStat.objects.select_for_update().filter(user_id=user_id)
+    }
+    changed, created = [], []
+    for score in competency_scores:
+        stat = stats.get(score.competency_name)
+        if stat is None:
+            stat = UserCompetencyStat(user_id=user_id, competency_name=score.competency_name)
+            stats[score.competency_name] = stat
+            created.append(stat)
+        elif stat not in changed:
+            changed.append(stat)
+        stat.score_sum += score.score
+        stat.score_count += 1
+    if changed:
+        UserCompetencyStat.objects.bulk_update(changed, ['score_sum', 'score_count'])
+    if created:
+        UserCompetencyStat.objects.bulk_create(created)
+
+    _set_extreme_competencies(analytics, stats.values())
+    analytics.save()
+    return analytics
+
+
+def apply_report_time_change(user_id, old_minutes, new_minutes, old_score, new_score):
+    """
+    ⏱️ PROPÓSITO: Ajusta las analytics cuando finish_timer reescribe un reporte ya contado
+    📝 QUÉ HACE: Resta la duración y la nota de tiempo anteriores y suma las nuevas
+    (las notas pueden ser None: evaluación de tiempo deshabilitada)
+    """
+    if old_minutes == new_minutes and old_score == new_score:
+        return
+    with transaction.atomic():
+        analytics = UserAnalytics.objects.select_for_update().filter(user_id=user_id).first()
+        if analytics is None:
+            return
+        analytics.total_session_time_minutes += (new_minutes or 0) - (old_minutes or 0)
+        if old_score is not None:
+            analytics.total_time_management_evaluations -= 1
+            analytics.total_time_management_score -= old_score
+        if new_score is not None:
+            analytics.total_time_management_evaluations += 1
+            analytics.total_time_management_score += new_score
+        analytics.average_time_management_score = _average(
+            analytics.total_time_management_score, analytics.total_time_management_evaluations
+        )
+        analytics.save(update_fields=[
+            'total_session_time_minutes', 'total_time_management_evaluations',
+            'total_time_management_score', 'average_time_management_score', 'last_updated',
+        ])
+
+
+def rebuild_user_analytics(user_id=None):
+    """
+    🔄 PROPÓSITO: Reconstrucción completa de las analytics desde los reportes
+    📝 QUÉ HACE: Recalcula las sumas por competencia con un GROUP BY y los totales con un
+    único UPDATE de subconsultas correlacionadas. Sin user_id reconstruye a todos los
+    usuarios con reportes. Sirve para reparar desvíos del agregado incremental.
+    Devuelve la cantidad de filas de UserAnalytics actualizadas.
+    """
+    reports = evaluated_reports()
+    scores = CompetencyScore.objects.all()
+    analytics = UserAnalytics.objects.all()
+    if user_id is not None:
+        reports = reports.filter(session__user_id=user_id)
+        scores = scores.filter(session__user_id=user_id)
+        analytics = analytics.filter(user_id=user_id)
+
+    user_ids = set(reports.order_by().values_list('session__user_id', flat=True).distinct())
+    existing = set(analytics.values_list('user_id', flat=True))
+
+    with transaction.atomic():
+        UserAnalytics.objects.bulk_create([UserAnalytics(user_id=uid) for uid in user_ids - existing])
+
+        stats = UserCompetencyStat.objects.all()
+        if user_id is not None:
+            stats = stats.filter(user_id=user_id)
+        stats.delete()
+        UserCompetencyStat.objects.bulk_create([
+            UserCompetencyStat(
+                user_id=row['session__user_id'],
+                competency_name=row['competency_name'],
+                score_sum=row['score_sum'],
+                score_count=row['score_count'],
+            )
+            for row in scores.order_by().values('session__user_id', 'competency_name').annotate(
+                score_sum=models.Sum('score'), score_count=models.Count('id'),
+            )
+        ])
+
+        correlated = evaluated_reports().filter(session__user=models.OuterRef('user')).order_by().values('session__user')
+        competencies = (
+            UserCompetencyStat.objects.filter(user=models.OuterRef('user'), score_count__gt=0)
+            .annotate(avg_score=models.ExpressionWrapper(
+                models.F('score_sum') * 1.0 / models.F('score_count'), output_field=models.FloatField(),
+            ))
+        )
+
+        def report_aggregate(expression, default, output_field):
+            return Coalesce(
+                models.Subquery(correlated.annotate(value=expression).values('value')[:1], output_field=output_field),
+                models.Value(default, output_field=output_field),
+            )
+
+        def competency_at(ordering):
+            return Coalesce(
+                models.Subquery(competencies.order_by(ordering, 'competency_name').values('competency_name')[:1]),
+                models.Value(''),
+            )
+
+        integer, decimal = models.IntegerField(), models.FloatField()
+        updated = analytics.update(
+            total_sessions_evaluated=report_aggregate(models.Count('id'), 0, integer),
+            total_overall_score=report_aggregate(models.Sum('average_score'), 0.0, decimal),
+            average_overall_score=report_aggregate(models.Avg('average_score'), 0.0, decimal),
+            total_questions_answered=report_aggregate(models.Sum('session__questions_asked'), 0, integer),
+            total_session_time_minutes=report_aggregate(models.Sum('session_duration_minutes'), 0, integer),
+            total_time_management_evaluations=report_aggregate(models.Count('time_management_score'), 0, integer),
+            total_time_management_score=report_aggregate(models.Sum('time_management_score'), 0.0, decimal),
+            average_time_management_score=report_aggregate(models.Avg('time_management_score'), 0.0, decimal),
+            strongest_competency=competency_at('-avg_score'),
+            weakest_competency=competency_at('avg_score'),
+            last_updated=timezone.now(),
+        )
+
+    # Los resúmenes cacheados leen UserAnalytics: invalidarlos tras la reconstrucción
+    affected = [user_id] if user_id is not None else user_ids | existing
+    for uid in affected:
+        invalidate_user_data(uid)
+
+    logger.info(f"🔄 Analytics reconstruidas para {updated} usuario(s)")
+    return updated
+
+
+def shift_score_buckets(deltas):
+    """
+    📊 Aplica al histograma del ranking un Counter {(rol, tramo): delta}.
+    Ordenado por (rol, tramo): dos transacciones concurrentes bloquean los tramos en el
+    mismo orden y no se interbloquean.
+    """
+    for (role, bucket), delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        rows = RoleScoreBucket.objects.filter(role=role, bucket=bucket)
+        if not rows.update(entry_count=models.F('entry_count') + delta):
+            RoleScoreBucket.objects.get_or_create(role=role, bucket=bucket)
+            rows.update(entry_count=models.F('entry_count') + delta)
+
+
+def apply_report_to_leaderboard(user_id, role, average_score):
+    """
+    🏆 PROPÓSITO: Suma un reporte nuevo a la entrada del usuario en el ranking del rol
+    📝 QUÉ HACE: Actualiza suma, cantidad y promedio; si el promedio cambia de tramo,
+    mueve la entrada en el histograma (RoleScoreBucket)
+    ⚠️  IMPORTANTE: Debe llamarse dentro de la misma transacción que crea el reporte
+    """
+    entry, created = RoleLeaderboardEntry.objects.select_for_update().get_or_create(user_id=user_id, role=role)
+    previous_bucket = None if created else entry.score_bucket
+    entry.score_sum += average_score
+    entry.report_count += 1
+    entry.average_score = _average(entry.score_sum, entry.report_count)
+    entry.score_bucket = leaderboard_bucket(entry.average_score)
+    entry.save()
+
+    if entry.score_bucket != previous_bucket:
+        deltas = Counter({(role, entry.score_bucket): 1})
+        if previous_bucket is not None:
+            deltas[(role, previous_bucket)] -= 1
+        shift_score_buckets(deltas)
+    return entry
+
+
+def rebuild_score_buckets():
+    """Recalcula todo el histograma del ranking con un GROUP BY (rol, tramo) sobre las entradas."""
+    with transaction.atomic():
+        RoleScoreBucket.objects.all().delete()
+        RoleScoreBucket.objects.bulk_create([
+            RoleScoreBucket(role=row['role'], bucket=row['score_bucket'], entry_count=row['entry_count'])
+            for row in RoleLeaderboardEntry.objects.order_by().values('role', 'score_bucket')
+            .annotate(entry_count=models.Count('id'))
+        ])
+
+
+def rebuild_role_leaderboard(user_id=None, batch_size=1000):
+    """
+    🔄 PROPÓSITO: Recalcula el ranking materializado desde los reportes
+    📝 QUÉ HACE: Un GROUP BY (usuario, rol) sobre los reportes evaluados que reemplaza
+    las entradas existentes, insertadas por lotes. Sin user_id recalcula también todo el
+    histograma; con user_id solo descuenta sus entradas viejas y suma las nuevas.
+    Devuelve la cantidad de entradas.
+    """
+    reports = evaluated_reports()
+    entries = RoleLeaderboardEntry.objects.all()
+    if user_id is not None:
+        reports = reports.filter(session__user_id=user_id)
+        entries = entries.filter(user_id=user_id)
+
+    rows = (
+        reports.order_by().values('session__user_id', 'session__session_type')
+        .annotate(score_sum=models.Sum('average_score'), report_count=models.Count('id'))
+    )
+    total = 0
+    with transaction.atomic():
+        deltas = Counter()
+        if user_id is not None:
+            deltas.subtract(Counter(entries.values_list('role', 'score_bucket')))
+        entries.delete()
+        batch = []
+        for row in rows.iterator():
+            average = _average(row['score_sum'], row['report_count'])
+            batch.append(RoleLeaderboardEntry(
+                user_id=row['session__user_id'],
+                role=row['session__session_type'],
+                score_sum=row['score_sum'],
+                report_count=row['report_count'],
+                average_score=average,
+                score_bucket=leaderboard_bucket(average),
+            ))
+            if user_id is not None:
+                deltas[(batch[-1].role, batch[-1].score_bucket)] += 1
+            if len(batch) >= batch_size:
+                total += len(RoleLeaderboardEntry.objects.bulk_create(batch))
+                batch = []
+        total += len(RoleLeaderboardEntry.objects.bulk_create(batch))
+
+        if user_id is None:
+            rebuild_score_buckets()
+        else:
+            shift_score_buckets(deltas)
+
+    logger.info(f"🏆 Ranking reconstruido: {total} entradas")
+    return total
+
+
+def competency_analysis_data(user_id, evolution_limit=None):
+    """
+    🎯 PROPÓSITO: Estadísticas y evolución de todas las competencias de un usuario
+    📝 QUÉ HACE: Una sola consulta ordenada con funciones de ventana por competencia:
+    promedio/máximo/mínimo/cantidad, último puntaje (FirstValue por fecha de sesión) y
+    posición (RowNumber) para quedarse con los últimos `evolution_limit` puntos.
+    Devuelve (analysis, evolution, total_evaluations); analysis va de mejor a peor.
+    """
+    partition = {'partition_by': [models.F('competency_name')]}
+    newest_first = {
+        **partition,
+        'order_by': [models.F('session__created_at').desc(), models.F('id').desc()],
+    }
+    scores = (
+        CompetencyScore.objects.filter(session__user_id=user_id)
+        .select_related('session')
+        .only('competency_name', 'score', 'session__title', 'session__created_at')
+        .annotate(
+            position=models.Window(RowNumber(), **newest_first),
+            latest_score=models.Window(FirstValue('score'), **newest_first),
+            avg_score=models.Window(models.Avg('score'), **partition),
+            max_score=models.Window(models.Max('score'), **partition),
+            min_score=models.Window(models.Min('score'), **partition),
+            total_evaluations=models.Window(models.Count('id'), **partition),
+        )
+    )
+    if evolution_limit:
+        scores = scores.filter(position__lte=evolution_limit)
+
+    analysis, evolution = {}, {}
+    for score in scores.order_by('competency_name', 'session__created_at', 'id'):
+        name = score.competency_name
+        if name not in analysis:
+            analysis[name] = {
+                'competency_name': name,
+                'avg_score': score.avg_score,
+                'max_score': score.max_score,
+                'min_score': score.min_score,
+                'total_evaluations': score.total_evaluations,
+                'latest_score': score.latest_score,
+            }
+            evolution[name] = []
+        evolution[name].append({
+            'score': score.score,
+            'date': score.session.created_at.strftime('%d/%m'),
+            'session_title': score.session.title,
+        })
+
+    ordered = sorted(analysis.values(), key=lambda row: (-row['avg_score'], row['competency_name']))
+    total = sum(row['total_evaluations'] for row in ordered)
+    return ordered, evolution, total
@@ -0,0 +1,103 @@
+import logging
+import os
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# 📊 Métricas de aciertos por tipo de dato (en memoria del proceso)
+_metrics = defaultdict(lambda: {'hits': 0, 'misses': 0})
+_invalidations = 0
+_metrics_lock = threading.Lock()
+
+
+def _record(name, hit):
+    with _metrics_lock:
+        _metrics[name]['hits' if hit else 'misses'] += 1
+
+
+def _version_key(user_id):
+    return f"analytics:v:{user_id}"
+
+
+def user_cache_version(user_id):
+    """Versión actual de los datos cacheados del usuario (se crea en 1 si no existe)."""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, None)
+        version = cache.get(key, 1)
+    return version
+
+
+def get_user_data(user_id, name, builder):
+    """
+    🗄️ PROPÓSITO: Cache por usuario para datos derivados de sus evaluaciones (charts, stats)
+    📝 QUÉ HACE: La clave incluye la versión del usuario; invalidar es subir la versión,
+    así todas las entradas viejas dejan de leerse sin tener que borrarlas una por una
+    """
+    key = f"analytics:{name}:{user_id}:{user_cache_version(user_id)}"
+    data = cache.get(key)
+    _record(name, data is not None)
+    if data is None:
+        data = builder(user_id)
+        cache.set(key, data, getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', 300))
+    return data
+
+
+def get_user_progress_cached(user):
+    """📈 EvaluationService.get_user_progress a través del cache (API, dashboard y análisis)."""
+    from .services import EvaluationService
+    return get_user_data(user.id, 'progress', lambda _: EvaluationService().get_user_progress(user))
+
+
+def invalidate_user_data(user_id):
+    """♻️ Invalida todo lo cacheado del usuario (nueva evaluación, sesión creada o eliminada)."""
+    global _invalidations
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # No había versión: la próxima lectura empieza de cero igualmente
+        cache.add(key, 1, None)
+    with _metrics_lock:
+        _invalidations += 1
+    logger.debug(f"♻️ Cache de analytics invalidada para usuario {user_id}")
+
+
+def cache_metrics():
+    """
+    📊 PROPÓSITO: Ratio de aciertos del cache de analytics
+    ⚠️  IMPORTANTE: Los contadores son del proceso actual (cada worker lleva los suyos)
+    """
+    with _metrics_lock:
+        namespaces = {name: dict(counts) for name, counts in _metrics.items()}
+        invalidations = _invalidations
+
+    def with_ratio(counts):
+        total = counts['hits'] + counts['misses']
+        counts['hit_ratio'] = round(counts['hits'] / total, 4) if total else None
+        return counts
+
+    totals = {
+        'hits': sum(counts['hits'] for counts in namespaces.values()),
+        'misses': sum(counts['misses'] for counts in namespaces.values()),
+    }
+    return {
+        'backend': settings.CACHES['default']['BACKEND'],
+        'scope': 'process',
+        'pid': os.getpid(),
+        'invalidations': invalidations,
+        'totals': with_ratio(totals),
+        'namespaces': {name: with_ratio(counts) for name, counts in sorted(namespaces.items())},
+    }
+
+
+def reset_cache_metrics():
+    global _invalidations
+    with _metrics_lock:
+        _metrics.clear()
+        _invalidations = 0
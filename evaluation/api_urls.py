@@ -12,4 +12,7 @@ urlpatterns = [
     path('user/analytics/', api_views.get_user_analytics, name='api_user_analytics'),
     path('user/summary/', api_views.get_user_summary, name='api_user_summary'),
     path('user/competencies/', api_views.get_competency_analysis, name='api_competency_analysis'),
+
+    # Métricas del cache de analytics (staff)
+    path('cache/metrics/', api_views.get_cache_metrics, name='api_cache_metrics'),
 ]
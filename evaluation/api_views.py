@@ -1,61 +1,63 @@
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
+from django.http import JsonResponse
+from django.urls import reverse
+from asgiref.sync import sync_to_async
 from interview_trainer.models import InterviewSession
+from interview_trainer.decorators import async_api_view
 from .services import EvaluationService, ReportGenerator
-from .models import FeedbackReport, CompetencyScore, UserAnalytics
-import asyncio
+from .tasks import enqueue_evaluation
+from .models import FeedbackReport, CompetencyScore, UserAnalytics, EvaluationJob
+from .analytics import competency_analysis_data
+from .analytics_cache import cache_metrics, get_user_data, get_user_progress_cached
 import logging
 
 logger = logging.getLogger(__name__)
 
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def generate_evaluation(request, session_id):
+@async_api_view(['POST'])
+async def generate_evaluation(request, session_id):
     """
-    📊 PROPÓSITO: API para generar evaluación completa
-    🎯 QUÉ HACE: Analiza sesión y crea feedback con puntajes
+    📊 PROPÓSITO: API para solicitar la evaluación completa de una sesión
+    🎯 QUÉ HACE: Verifica que la sesión sea evaluable y encola su EvaluationJob (el mismo
+    que dispara el chat), así una petición manual no compite con un trabajo en curso.
+    Un trabajo fallido se vuelve a encolar. Responde 202; el resultado se consulta en status_url
     """
     try:
-        session = get_object_or_404(InterviewSession, id=session_id, user=request.user)
+        try:
+            session = await InterviewSession.objects.aget(id=session_id, user=request.user)
+        except InterviewSession.DoesNotExist:
+            return JsonResponse({'detail': 'No encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+
         evaluation_service = EvaluationService()
         
         # Verificar si se puede generar
-        can_eval = evaluation_service.can_generate_evaluation(session)
+        can_eval = await evaluation_service.can_generate_evaluation(session)
         if not can_eval['can_generate']:
-            return Response({
+            return JsonResponse({
                 'error': can_eval['reason'],
                 'existing': can_eval.get('existing', False),
                 'questions_count': can_eval.get('questions_count', 0)
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Generar evaluación
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(
-            evaluation_service.generate_session_evaluation(session)
-        )
-        loop.close()
+        # Encolar (idempotente): si ya hay un trabajo en cola o en proceso se devuelve su estado
+        job, queued = await sync_to_async(enqueue_evaluation)(session.id, retry_failed=True)
         
-        return Response({
+        return JsonResponse({
             'success': True,
-            'message': 'Evaluación generada exitosamente',
+            'queued': queued,
+            'message': 'Evaluación encolada' if queued else 'La evaluación ya está en curso',
             'session_id': session_id,
-            'average_score': result['average_score'],
-            'performance_level': result['performance_level'],
-            'questions_analyzed': result['questions_analyzed'],
-            'session_duration': result['session_duration']
-        })
+            'questions_analyzed': can_eval['questions_count'],
+            'job': job.as_status(),
+            'status_url': reverse('evaluation_api:api_get_evaluation', args=[session.id]),
+        }, status=status.HTTP_202_ACCEPTED)
         
-    except ValueError as e:
-        return Response({
-            'error': str(e)
-        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
-        logger.error(f"Error generando evaluación: {str(e)}")
-        return Response({
+        logger.error(f"Error encolando evaluación: {str(e)}")
+        return JsonResponse({
             'error': f'Error interno: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -72,28 +74,32 @@ def get_session_evaluation(request, session_id):
         evaluation_data = evaluation_service.get_session_evaluation(session)
         
         if not evaluation_data['exists']:
+            can_eval = evaluation_data['can_generate']
+            job = EvaluationJob.objects.filter(session=session).first()
+            in_progress = job is not None and job.status in ('queued', 'running')
+            # 202 mientras el trabajo en segundo plano sigue en cola o en proceso
             return Response({
                 'exists': False,
-                'can_generate': evaluation_data['can_generate']['can_generate'],
-                'questions_count': evaluation_data['can_generate'].get('questions_count', 0),
-                'min_required': evaluation_data['can_generate'].get('min_required', 10),
-                'reason': evaluation_data['can_generate']['reason']
-            }, status=status.HTTP_404_NOT_FOUND)
+                'can_generate': can_eval['can_generate'],
+                'questions_count': can_eval.get('questions_count', 0),
+                'min_required': can_eval.get('min_required_questions', 7),
+                'reason': can_eval['reason'],
+                'job': job.as_status() if job else None,
+            }, status=status.HTTP_202_ACCEPTED if in_progress else status.HTTP_404_NOT_FOUND)
         
         return Response({
             'success': True,
             'exists': True,
             'average_score': evaluation_data['average_score'],
             'performance_level': evaluation_data['performance_level'],
-            'questions_analyzed': evaluation_data['questions_analyzed'],
+            'questions_analyzed': session.questions_asked,
             'session_duration': evaluation_data['session_duration'],
             'competency_scores': [
                 {
                     'name': comp['name'],
                     'score': comp['score'],
                     'feedback': comp['feedback'],
-                    'examples': comp['examples'],
-                    'improvement_areas': comp['improvement_areas']
+                    'percentage': comp['percentage'],
                 }
                 for comp in evaluation_data['competency_data']
             ],
@@ -114,8 +120,7 @@ def get_user_analytics(request):
     📈 PROPÓSITO: API para obtener analytics del usuario
     """
     try:
-        evaluation_service = EvaluationService()
-        analytics = evaluation_service.get_user_progress(request.user)
+        analytics = get_user_progress_cached(request.user)
         
         return Response({
             'success': True,
@@ -128,6 +133,51 @@ def get_user_analytics(request):
             'error': f'Error obteniendo analytics: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def _build_user_summary(user):
+    """
+    📊 PROPÓSITO: Resumen del usuario ya serializado (lo que se guarda en cache)
+    """
+    summary = ReportGenerator().generate_user_summary_report(user)
+    if 'error' in summary:
+        return {'error': summary['error']}
+
+    analytics = UserAnalytics.objects.filter(user=user).first() or UserAnalytics(user=user)
+
+    # Serializar datos para API
+    recent_sessions_data = []
+    for session_report in summary['recent_sessions']:
+        recent_sessions_data.append({
+            'session_title': session_report.session.title,
+            'session_type': session_report.session.session_type,
+            'average_score': session_report.average_score,
+            'performance_level': session_report.performance_level,
+            'questions_analyzed': session_report.session.questions_asked,
+            'generated_at': session_report.generated_at.isoformat()
+        })
+
+    return {
+        'success': True,
+        'summary': {
+            'user': {
+                'username': user.username,
+                'first_name': user.first_name,
+                'last_name': user.last_name
+            },
+            'analytics': {
+                'total_sessions': analytics.total_sessions_evaluated,
+                'average_score': analytics.average_overall_score,
+                'strongest_competency': analytics.strongest_competency,
+                'weakest_competency': analytics.weakest_competency,
+                'total_questions': analytics.total_questions_answered,
+                'total_time_hours': analytics.total_session_time_minutes / 60
+            },
+            'recent_sessions': recent_sessions_data,
+            'progress_status': summary['progress_status'],
+            'progress_change': summary['progress_change'],
+            'generated_at': summary['generated_at'].isoformat()
+        }
+    }
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_summary(request):
@@ -135,48 +185,10 @@ def get_user_summary(request):
     📊 PROPÓSITO: API para obtener resumen completo del usuario
     """
     try:
-        report_generator = ReportGenerator()
-        summary = report_generator.generate_user_summary_report(request.user)
-        
-        if 'error' in summary:
-            return Response({
-                'error': summary['error']
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-        # Serializar datos para API
-        recent_sessions_data = []
-        for session_report in summary['recent_sessions']:
-            recent_sessions_data.append({
-                'session_title': session_report.session.title,
-                'session_type': session_report.session.session_type,
-                'average_score': session_report.average_score,
-                'performance_level': session_report.performance_level,
-                'questions_analyzed': session_report.questions_analyzed,
-                'generated_at': session_report.generated_at.isoformat()
-            })
-        
-        return Response({
-            'success': True,
-            'summary': {
-                'user': {
-                    'username': summary['user'].username,
-                    'first_name': summary['user'].first_name,
-                    'last_name': summary['user'].last_name
-                },
-                'analytics': {
-                    'total_sessions': summary['analytics'].total_sessions_evaluated,
-                    'average_score': summary['analytics'].average_overall_score,
-                    'strongest_competency': summary['analytics'].strongest_competency,
-                    'weakest_competency': summary['analytics'].weakest_competency,
-                    'total_questions': summary['analytics'].total_questions_answered,
-                    'total_time_hours': summary['analytics'].total_session_time_minutes / 60
-                },
-                'recent_sessions': recent_sessions_data,
-                'progress_status': summary['progress_status'],
-                'progress_change': summary['progress_change'],
-                'generated_at': summary['generated_at'].isoformat()
-            }
-        })
+        payload = get_user_data(request.user.id, 'summary', lambda _: _build_user_summary(request.user))
+        if 'error' in payload:
+            return Response(payload, status=status.HTTP_404_NOT_FOUND)
+        return Response(payload)
         
     except Exception as e:
         logger.error(f"Error generando resumen: {str(e)}")
@@ -184,6 +196,22 @@ def get_user_summary(request):
             'error': f'Error generando resumen: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def _build_competency_analysis(user):
+    """
+    🎯 PROPÓSITO: Análisis de competencias ya serializado (lo que se guarda en cache)
+    """
+    # Una consulta para todas las competencias; evolución: últimas 10 por competencia
+    competency_analysis, competency_evolution, total = competency_analysis_data(user.id, evolution_limit=10)
+    if not competency_analysis:
+        return {'error': 'No hay evaluaciones disponibles'}
+    
+    return {
+        'success': True,
+        'competency_analysis': competency_analysis,
+        'competency_evolution': competency_evolution,
+        'total_evaluations': total
+    }
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_competency_analysis(request):
@@ -191,52 +219,23 @@ def get_competency_analysis(request):
     🎯 PROPÓSITO: API para análisis detallado de competencias
     """
     try:
-        # Obtener todas las evaluaciones del usuario
-        user_scores = CompetencyScore.objects.filter(
-            session__user=request.user
-        ).select_related('session')
-        
-        if not user_scores.exists():
-            return Response({
-                'error': 'No hay evaluaciones disponibles'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-        # Agrupar por competencia
-        from django.db.models import Avg, Count, Max, Min
-        competency_analysis = user_scores.values('competency_name').annotate(
-            avg_score=Avg('score'),
-            max_score=Max('score'),
-            min_score=Min('score'),
-            total_evaluations=Count('id'),
-            latest_score=Max('score')  # Simplificado
-        ).order_by('-avg_score')
-        
-        # Obtener evolución temporal por competencia
-        competency_evolution = {}
-        for comp_data in competency_analysis:
-            comp_name = comp_data['competency_name']
-            comp_scores = user_scores.filter(
-                competency_name=comp_name
-            ).order_by('created_at')[:10]  # Últimas 10
-            
-            competency_evolution[comp_name] = [
-                {
-                    'score': score.score,
-                    'date': score.created_at.strftime('%d/%m'),
-                    'session_title': score.session.title
-                }
-                for score in comp_scores
-            ]
-        
-        return Response({
-            'success': True,
-            'competency_analysis': list(competency_analysis),
-            'competency_evolution': competency_evolution,
-            'total_evaluations': user_scores.count()
-        })
+        payload = get_user_data(
+            request.user.id, 'competencies', lambda _: _build_competency_analysis(request.user)
+        )
+        if 'error' in payload:
+            return Response(payload, status=status.HTTP_404_NOT_FOUND)
+        return Response(payload)
         
     except Exception as e:
         logger.error(f"Error en análisis de competencias: {str(e)}")
         return Response({
             'error': f'Error en análisis: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_cache_metrics(request):
+    """
+    📊 PROPÓSITO: Métricas del cache de analytics (solo staff)
+    """
+    return Response({'success': True, 'metrics': cache_metrics()})
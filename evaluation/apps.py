@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class EvaluationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'evaluation'
+
+    def ready(self):
+        # Registrar receivers de invalidación de cache
+        from . import signals  # noqa: F401
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from evaluation.models import EvaluationJob
+from evaluation.tasks import requeue_stale_jobs, run_evaluation_job
+
+
+class Command(BaseCommand):
+    help = 'Procesa evaluaciones pendientes (recupera trabajos perdidos tras un reinicio sin broker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-minutes', type=int, default=15,
+                            help='Trabajos "running" sin cambios durante este tiempo se vuelven a encolar')
+        parser.add_argument('--limit', type=int, default=50, help='Máximo de trabajos a procesar')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+
+        # Trabajos que quedaron "running" porque el proceso murió a mitad
+        recovered = requeue_stale_jobs(options['stale_minutes'])
+        if recovered:
+            self.stdout.write(f"♻️ {recovered} trabajos atascados vueltos a encolar")
+
+        due = list(
+            EvaluationJob.objects
+            .filter(status='queued')
+            .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+            .order_by('created_at')
+            .values_list('session_id', flat=True)[:options['limit']]
+        )
+        self.stdout.write(f"⚙️ Evaluaciones pendientes: {len(due)}")
+
+        for session_id in due:
+            # Se ejecuta en este proceso; si falla, la tarea reprograma el reintento
+            result = run_evaluation_job(session_id)
+            marker = '✅' if result.get('success') else '❌'
+            self.stdout.write(f"   {marker} Sesión {session_id}: {result}")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from evaluation.analytics import rebuild_role_leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el ranking por rol desde los reportes (ejecutar periódicamente, p. ej. con cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help='Recalcular solo las entradas de este usuario')
+
+    def handle(self, *args, **options):
+        total = rebuild_role_leaderboard(options['user_id'])
+        self.stdout.write(self.style.SUCCESS(f"🏆 Ranking reconstruido: {total} entradas"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from evaluation.analytics import rebuild_user_analytics
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye UserAnalytics y las sumas por competencia desde los reportes (reparación completa)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help='Reconstruir solo las analytics de este usuario')
+
+    def handle(self, *args, **options):
+        updated = rebuild_user_analytics(options['user_id'])
+        self.stdout.write(self.style.SUCCESS(f"🔄 Analytics reconstruidas: {updated} usuario(s)"))
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interview_trainer', '0008_alter_chatmessage_tts_status'),
+        ('evaluation', '0003_useranalytics_average_time_management_score_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EvaluationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'En cola'), ('running', 'En proceso'), ('succeeded', 'Completada'), ('failed', 'Fallida')], default='queued', max_length=10)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='evaluation_job', to='interview_trainer.interviewsession')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Evaluación',
+                'verbose_name_plural': 'Trabajos de Evaluación',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='evaluation__status_9d4f2a_idx')],
+            },
+        ),
+    ]
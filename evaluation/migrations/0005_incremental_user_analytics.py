@@ -0,0 +1,68 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_incremental_analytics(apps, schema_editor):
+    # Punto de partida del agregado incremental: sumas calculadas desde los reportes existentes
+    UserAnalytics = apps.get_model('evaluation', 'UserAnalytics')
+    UserCompetencyStat = apps.get_model('evaluation', 'UserCompetencyStat')
+    FeedbackReport = apps.get_model('evaluation', 'FeedbackReport')
+    CompetencyScore = apps.get_model('evaluation', 'CompetencyScore')
+
+    totals = (
+        FeedbackReport.objects.exclude(performance_level='').order_by()
+        .values('session__user_id').annotate(total=models.Sum('average_score'), count=models.Count('id'))
+    )
+    for row in totals:
+        UserAnalytics.objects.filter(user_id=row['session__user_id']).update(
+            total_sessions_evaluated=row['count'],
+            total_overall_score=row['total'] or 0.0,
+            average_overall_score=(row['total'] or 0.0) / row['count'],
+        )
+
+    UserCompetencyStat.objects.bulk_create([
+        UserCompetencyStat(
+            user_id=row['session__user_id'],
+            competency_name=row['competency_name'],
+            score_sum=row['score_sum'],
+            score_count=row['score_count'],
+        )
+        for row in CompetencyScore.objects.order_by().values('session__user_id', 'competency_name').annotate(
+            score_sum=models.Sum('score'), score_count=models.Count('id'),
+        )
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('evaluation', '0004_evaluationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useranalytics',
+            name='total_overall_score',
+            field=models.FloatField(default=0.0, help_text='Suma de average_score de los reportes (agregado incremental)'),
+        ),
+        migrations.CreateModel(
+            name='UserCompetencyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('competency_name', models.CharField(max_length=100)),
+                ('score_sum', models.IntegerField(default=0)),
+                ('score_count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='competency_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Estadística de Competencia',
+                'verbose_name_plural': 'Estadísticas de Competencias',
+                'unique_together': {('user', 'competency_name')},
+            },
+        ),
+        migrations.RunPython(backfill_incremental_analytics, migrations.RunPython.noop),
+    ]
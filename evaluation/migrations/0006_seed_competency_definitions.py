@@ -0,0 +1,58 @@
+from django.db import migrations
+
+
+DEFAULT_COMPETENCIES = [
+    {
+        'name': 'Comunicación',
+        'description': 'Capacidad de expresar ideas de forma clara y efectiva',
+        'evaluation_criteria': 'Claridad, estructura, capacidad de expresar ideas',
+        'icon': '🗣️',
+        'order': 1
+    },
+    {
+        'name': 'Pensamiento crítico',
+        'description': 'Habilidad para analizar problemas y encontrar soluciones',
+        'evaluation_criteria': 'Análisis, lógica, resolución de problemas',
+        'icon': '🧠',
+        'order': 2
+    },
+    {
+        'name': 'Adaptabilidad',
+        'description': 'Flexibilidad ante cambios y nuevas situaciones',
+        'evaluation_criteria': 'Flexibilidad, manejo de cambios, aprendizaje',
+        'icon': '🔄',
+        'order': 3
+    },
+    {
+        'name': 'Trabajo en equipo',
+        'description': 'Capacidad de colaborar efectivamente con otros',
+        'evaluation_criteria': 'Colaboración, liderazgo, habilidades interpersonales',
+        'icon': '👥',
+        'order': 4
+    },
+    {
+        'name': 'Inteligencia emocional',
+        'description': 'Manejo de emociones propias y de otros',
+        'evaluation_criteria': 'Autoconocimiento, empatía, manejo de emociones',
+        'icon': '❤️',
+        'order': 5
+    },
+]
+
+
+def seed_competencies(apps, schema_editor):
+    # Las definiciones existentes (posiblemente editadas por un admin) no se tocan
+    CompetencyDefinition = apps.get_model('evaluation', 'CompetencyDefinition')
+    for competency_data in DEFAULT_COMPETENCIES:
+        CompetencyDefinition.objects.get_or_create(name=competency_data['name'], defaults=competency_data)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0005_incremental_user_analytics'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_competencies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_leaderboard(apps, schema_editor):
+    # Ranking inicial desde los reportes evaluados existentes
+    FeedbackReport = apps.get_model('evaluation', 'FeedbackReport')
+    RoleLeaderboardEntry = apps.get_model('evaluation', 'RoleLeaderboardEntry')
+    rows = (
+        FeedbackReport.objects.exclude(performance_level='').order_by()
+        .values('session__user_id', 'session__session_type')
+        .annotate(score_sum=models.Sum('average_score'), report_count=models.Count('id'))
+    )
+    RoleLeaderboardEntry.objects.bulk_create([
+        RoleLeaderboardEntry(
+            user_id=row['session__user_id'],
+            role=row['session__session_type'],
+            score_sum=row['score_sum'],
+            report_count=row['report_count'],
+            average_score=row['score_sum'] / row['report_count'],
+        )
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('evaluation', '0006_seed_competency_definitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoleLeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(max_length=20)),
+                ('score_sum', models.FloatField(default=0.0)),
+                ('report_count', models.IntegerField(default=0)),
+                ('average_score', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Entrada de Ranking',
+                'verbose_name_plural': 'Ranking por Rol',
+                'indexes': [models.Index(fields=['role', '-average_score', 'user'], name='leaderboard_role_score_idx')],
+                'unique_together': {('role', 'user')},
+            },
+        ),
+        migrations.RunPython(backfill_leaderboard, migrations.RunPython.noop),
+    ]
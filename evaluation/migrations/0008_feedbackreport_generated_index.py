@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0007_role_leaderboard'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feedbackreport',
+            index=models.Index(fields=['-generated_at', '-id'], name='feedback_generated_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:53
+
+from django.db import migrations, models
+
+# Copia de evaluation.models.LEADERBOARD_BUCKETS_PER_POINT al crear la migración
+BUCKETS_PER_POINT = 20
+
+
+def backfill_score_buckets(apps, schema_editor):
+    # Tramo de cada entrada existente e histograma inicial por rol
+    RoleLeaderboardEntry = apps.get_model('evaluation', 'RoleLeaderboardEntry')
+    RoleScoreBucket = apps.get_model('evaluation', 'RoleScoreBucket')
+    entries = []
+    for entry in RoleLeaderboardEntry.objects.only('id', 'average_score').iterator():
+        entry.score_bucket = max(int(entry.average_score * BUCKETS_PER_POINT), 0)
+        entries.append(entry)
+    RoleLeaderboardEntry.objects.bulk_update(entries, ['score_bucket'], batch_size=1000)
+    RoleScoreBucket.objects.bulk_create([
+        RoleScoreBucket(role=row['role'], bucket=row['score_bucket'], entry_count=row['entry_count'])
+        for row in RoleLeaderboardEntry.objects.order_by().values('role', 'score_bucket')
+        .annotate(entry_count=models.Count('id'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0008_feedbackreport_generated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoleScoreBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(max_length=20)),
+                ('bucket', models.IntegerField()),
+                ('entry_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Tramo de Ranking',
+                'verbose_name_plural': 'Histograma del Ranking',
+            },
+        ),
+        migrations.AddField(
+            model_name='roleleaderboardentry',
+            name='score_bucket',
+            field=models.IntegerField(default=0, help_text='leaderboard_bucket(average_score)'),
+        ),
+        migrations.AddIndex(
+            model_name='roleleaderboardentry',
+            index=models.Index(fields=['role', 'score_bucket', 'average_score'], name='leaderboard_role_bucket_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='rolescorebucket',
+            unique_together={('role', 'bucket')},
+        ),
+        migrations.RunPython(backfill_score_buckets, migrations.RunPython.noop),
+    ]
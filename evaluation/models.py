@@ -1,3 +1,6 @@
+import time
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -42,6 +45,10 @@ class FeedbackReport(models.Model):
         verbose_name = "Reporte de Feedback"
         verbose_name_plural = "Reportes de Feedback"
         ordering = ['-generated_at']
+        indexes = [
+            # Historial y charts de progreso: reportes más recientes primero
+            models.Index(fields=['-generated_at', '-id'], name='feedback_generated_idx'),
+        ]
     
     def __str__(self):
         return f"Feedback: {self.session.title} - {self.average_score:.1f}/10"
@@ -59,6 +66,46 @@ class FeedbackReport(models.Model):
         else:
             return "danger"
 
+class EvaluationJob(models.Model):
+    """
+    ⚙️ PROPÓSITO: Trabajo de evaluación en segundo plano (uno por sesión)
+    📝 QUÉ HACE: Registra estado, intentos y último error de la llamada de feedback a Gemini;
+    la relación uno a uno con la sesión hace que encolar sea idempotente
+    """
+    STATUS_CHOICES = [
+        ('queued', 'En cola'),
+        ('running', 'En proceso'),
+        ('succeeded', 'Completada'),
+        ('failed', 'Fallida'),
+    ]
+
+    session = models.OneToOneField('interview_trainer.InterviewSession', on_delete=models.CASCADE, related_name='evaluation_job')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Trabajo de Evaluación"
+        verbose_name_plural = "Trabajos de Evaluación"
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"Evaluación sesión {self.session_id}: {self.status} ({self.attempts} intentos)"
+
+    def as_status(self):
+        """Estado público del trabajo para la API"""
+        return {
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
 class UserAnalytics(models.Model):
     """
     📈 PROPÓSITO: Analytics y progreso del usuario
@@ -67,6 +114,7 @@ class UserAnalytics(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='analytics')
     total_sessions_evaluated = models.IntegerField(default=0)
     average_overall_score = models.FloatField(default=0)
+    total_overall_score = models.FloatField(default=0.0, help_text='Suma de average_score de los reportes (agregado incremental)')
     strongest_competency = models.CharField(max_length=100, blank=True)
     weakest_competency = models.CharField(max_length=100, blank=True)
     total_questions_answered = models.IntegerField(default=0)
@@ -88,9 +136,10 @@ class UserAnalytics(models.Model):
         """
         📊 PROPÓSITO: Retorna tendencia de progreso (mejorando/estable/bajando)
         """
+        # Sin los reportes provisionales del temporizador (ver analytics.evaluated_reports)
         reports = FeedbackReport.objects.filter(
             session__user=self.user
-        ).order_by('-generated_at')[:5]
+        ).exclude(performance_level='').order_by('-generated_at')[:5]
         
         if reports.count() < 2:
             return "insuficiente"
@@ -105,6 +154,102 @@ class UserAnalytics(models.Model):
         else:
             return "estable"
 
+class UserCompetencyStat(models.Model):
+    """
+    📊 PROPÓSITO: Suma y cantidad de puntajes por competencia y usuario
+    📝 QUÉ HACE: Agregado incremental para obtener la competencia más fuerte/débil
+    sin recorrer todo el historial de CompetencyScore
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='competency_stats')
+    competency_name = models.CharField(max_length=100)
+    score_sum = models.IntegerField(default=0)
+    score_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['user', 'competency_name']
+        verbose_name = "Estadística de Competencia"
+        verbose_name_plural = "Estadísticas de Competencias"
+
+    @property
+    def average(self):
+        return self.score_sum / self.score_count if self.score_count else 0.0
+
+    def __str__(self):
+        return f"{self.user_id} - {self.competency_name}: {self.average:.1f} ({self.score_count})"
+
+# 📊 Tramos del histograma de promedios del ranking: 20 por punto (0.05), hasta 201 por rol
+LEADERBOARD_BUCKETS_PER_POINT = 20
+
+def leaderboard_bucket(average_score):
+    """Tramo del histograma en el que cae un promedio."""
+    return max(int(average_score * LEADERBOARD_BUCKETS_PER_POINT), 0)
+
+class RoleLeaderboardEntry(models.Model):
+    """
+    🏆 PROPÓSITO: Ranking materializado por rol (una fila por usuario y tipo de entrevista)
+    📝 QUÉ HACE: Guarda suma, cantidad y promedio de los reportes del usuario en ese rol;
+    se actualiza al guardar cada evaluación. El índice (rol, promedio) sirve el top sin
+    agrupar todos los reportes; la posición de un usuario sale del histograma por tramos
+    (RoleScoreBucket, ver rank()).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    role = models.CharField(max_length=20)  # InterviewSession.session_type
+    score_sum = models.FloatField(default=0.0)
+    report_count = models.IntegerField(default=0)
+    average_score = models.FloatField(default=0.0)
+    score_bucket = models.IntegerField(default=0, help_text='leaderboard_bucket(average_score)')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['role', 'user']
+        indexes = [
+            models.Index(fields=['role', '-average_score', 'user'], name='leaderboard_role_score_idx'),
+            models.Index(fields=['role', 'score_bucket', 'average_score'], name='leaderboard_role_bucket_idx'),
+        ]
+        verbose_name = "Entrada de Ranking"
+        verbose_name_plural = "Ranking por Rol"
+
+    def rank(self):
+        """
+        Posición (1 = mejor); empates comparten posición, como Rank() en SQL.
+        Suma las entradas de los tramos superiores del histograma (como mucho
+        10 * LEADERBOARD_BUCKETS_PER_POINT filas) y cuenta solo las de su propio tramo
+        que lo superan: el coste no depende de la posición del usuario.
+        """
+        above = RoleScoreBucket.objects.filter(
+            role=self.role, bucket__gt=self.score_bucket,
+        ).aggregate(total=models.Sum('entry_count'))['total'] or 0
+        within = RoleLeaderboardEntry.objects.filter(
+            role=self.role, score_bucket=self.score_bucket, average_score__gt=self.average_score,
+        ).count()
+        return above + within + 1
+
+    def __str__(self):
+        return f"{self.role} - {self.user_id}: {self.average_score:.2f} ({self.report_count})"
+
+class RoleScoreBucket(models.Model):
+    """
+    📊 PROPÓSITO: Histograma de promedios del ranking por rol
+    📝 QUÉ HACE: Cuántas entradas de RoleLeaderboardEntry tienen cada score_bucket.
+    ⚠️  IMPORTANTE: Se mantiene en la misma transacción que las entradas
+    (apply_report_to_leaderboard, rebuild_role_leaderboard y el borrado de usuarios)
+    """
+    role = models.CharField(max_length=20)
+    bucket = models.IntegerField()
+    entry_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['role', 'bucket']
+        verbose_name = "Tramo de Ranking"
+        verbose_name_plural = "Histograma del Ranking"
+
+    def __str__(self):
+        return f"{self.role} - {self.bucket}: {self.entry_count}"
+
+# 🗂️ Cache en memoria del proceso para las competencias activas. El TTL acota el
+# desfase en otros procesos cuando un admin edita las definiciones.
+_active_competencies_cache = {'items': None, 'expires_at': 0.0}
+
 class CompetencyDefinition(models.Model):
     """
     📖 PROPÓSITO: Definiciones y criterios de evaluación para cada competencia
@@ -128,50 +273,19 @@ class CompetencyDefinition(models.Model):
     @classmethod
     def get_default_competencies(cls):
         """
-        🎯 PROPÓSITO: Retorna las competencias por defecto
+        🎯 PROPÓSITO: Retorna las competencias activas (en orden)
+        📝 QUÉ HACE: Las definiciones por defecto se siembran en la migración 0006; aquí
+        solo se leen, desde un cache del proceso que se invalida al editarlas
+        ⚠️  IMPORTANTE: Devuelve una lista compartida: no modificar las instancias
         """
-        defaults = [
-            {
-                'name': 'Comunicación',
-                'description': 'Capacidad de expresar ideas de forma clara y efectiva',
-                'evaluation_criteria': 'Claridad, estructura, capacidad de expresar ideas',
-                'icon': '🗣️',
-                'order': 1
-            },
-            {
-                'name': 'Pensamiento crítico',
-                'description': 'Habilidad para analizar problemas y encontrar soluciones',
-                'evaluation_criteria': 'Análisis, lógica, resolución de problemas',
-                'icon': '🧠',
-                'order': 2
-            },
-            {
-                'name': 'Adaptabilidad',
-                'description': 'Flexibilidad ante cambios y nuevas situaciones',
-                'evaluation_criteria': 'Flexibilidad, manejo de cambios, aprendizaje',
-                'icon': '🔄',
-                'order': 3
-            },
-            {
-                'name': 'Trabajo en equipo',
-                'description': 'Capacidad de colaborar efectivamente con otros',
-                'evaluation_criteria': 'Colaboración, liderazgo, habilidades interpersonales',
-                'icon': '👥',
-                'order': 4
-            },
-            {
-                'name': 'Inteligencia emocional',
-                'description': 'Manejo de emociones propias y de otros',
-                'evaluation_criteria': 'Autoconocimiento, empatía, manejo de emociones',
-                'icon': '❤️',
-                'order': 5
-            }
-        ]
-        
-        for competency_data in defaults:
-            cls.objects.get_or_create(
-                name=competency_data['name'],
-                defaults=competency_data
-            )
-        
-        return cls.objects.filter(is_active=True).order_by('order')
+        now = time.monotonic()
+        cached = _active_competencies_cache
+        if cached['items'] is None or now >= cached['expires_at']:
+            cached['items'] = list(cls.objects.filter(is_active=True).order_by('order', 'name'))
+            cached['expires_at'] = now + getattr(settings, 'COMPETENCY_CACHE_TTL', 300)
+        return cached['items']
+
+    @classmethod
+    def clear_cache(cls):
+        """♻️ Descarta el cache de competencias activas (lo llaman los signals al editar)."""
+        _active_competencies_cache['items'] = None
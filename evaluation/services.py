@@ -1,15 +1,24 @@
 import logging
 from typing import Dict, List
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
 from interview_trainer.models import InterviewSession, ChatMessage
-from interview_trainer.services import GeminiService
+from interview_trainer.services import get_gemini_service
+from .analytics import apply_report_to_analytics, apply_report_to_leaderboard, evaluated_reports
 from .models import CompetencyScore, FeedbackReport, UserAnalytics, CompetencyDefinition
 from django.utils import timezone
-from asgiref.sync import sync_to_async
+from asgiref.sync import async_to_sync, sync_to_async
 
 logger = logging.getLogger(__name__)
 
+
+class EvaluationNotEligible(ValueError):
+    """
+    🚫 La sesión no cumple las reglas para evaluarse (faltan preguntas o respuestas, o ya
+    está evaluada). Reintentar no lo arregla; cualquier otro error sí puede ser transitorio.
+    """
+
+
 class EvaluationService:
     """
     🎯 PROPÓSITO: Servicio especializado en evaluación y feedback
@@ -17,64 +26,75 @@ class EvaluationService:
     """
     
     def __init__(self):
-        self.gemini_service = GeminiService()
+        self.gemini_service = get_gemini_service()
     
+    # Para evaluación necesitamos al menos 7 preguntas y 6 respuestas del usuario
+    # (el usuario responde a 6 preguntas, la 7ma es la despedida)
+    MIN_QUESTIONS = 7
+    MIN_USER_RESPONSES = 6
+
     async def can_generate_evaluation(self, session: InterviewSession) -> Dict:
         """
         ✅ PROPÓSITO: Verifica si una sesión puede ser evaluada (7 preguntas)
+        📝 QUÉ HACE: Se llama en cada turno del chat, así que primero descarta sin DB
+        (reporte ya cargado o contador de preguntas en memoria por debajo del mínimo)
+        y si no, resuelve reporte, preguntas y respuestas en una sola consulta
+        ⚠️  IMPORTANTE: questions_asked solo crece y ChatMessage.save() actualiza la
+        instancia de sesión en memoria, así que el descarte en memoria es seguro
         """
-        # Verificar si ya existe evaluación
-        has_feedback = await sync_to_async(
-            lambda: hasattr(session, 'feedback_report') and session.feedback_report
-        )()
-        
-        if has_feedback:
+        min_questions = self.MIN_QUESTIONS
+        min_user_responses = self.MIN_USER_RESPONSES
+
+        # Verificar si ya existe evaluación (solo si la relación ya está cargada); el reporte
+        # provisional del temporizador (sin performance_level) no cuenta como evaluación
+        report = getattr(session, 'feedback_report', None) if InterviewSession.feedback_report.is_cached(session) else None
+        if report is not None and report.performance_level:
             return {
                 'can_generate': False,
                 'reason': 'Ya existe evaluación',
                 'existing': True
             }
-        
-        questions_count = await self._count_session_questions(session)
-        user_responses = await sync_to_async(
-            lambda: session.messages.filter(is_user=True).count()
-        )()
-        
-        # Para evaluación necesitamos al menos 7 preguntas y 6 respuestas del usuario
-        # (el usuario responde a 6 preguntas, la 7ma es la despedida)
-        min_questions = 7
-        min_user_responses = 6
 
-        can_evaluate = questions_count >= min_questions and user_responses >= min_user_responses
-        
+        if session.questions_asked < min_questions:
+            return self._eligibility(session.questions_asked, None, min_questions, min_user_responses)
+
+        state = await InterviewSession.objects.filter(id=session.id).annotate(
+            user_responses=models.Count('messages', filter=models.Q(messages__is_user=True)),
+            has_feedback=models.Exists(
+                FeedbackReport.objects.filter(session=models.OuterRef('pk')).exclude(performance_level='')
+            ),
+        ).values('questions_asked', 'user_responses', 'has_feedback').afirst()
+
+        if state is None:
+            raise InterviewSession.DoesNotExist(f"Sesión {session.id} no encontrada")
+
+        if state['has_feedback']:
+            return {
+                'can_generate': False,
+                'reason': 'Ya existe evaluación',
+                'existing': True
+            }
+
+        return self._eligibility(state['questions_asked'], state['user_responses'], min_questions, min_user_responses)
+
+    @staticmethod
+    def _eligibility(questions_count, user_responses, min_questions, min_user_responses) -> Dict:
+        # user_responses=None: descartado antes de contar (faltan preguntas)
+        can_evaluate = (
+            user_responses is not None
+            and questions_count >= min_questions
+            and user_responses >= min_user_responses
+        )
+        shown_responses = '?' if user_responses is None else user_responses
         return {
             'can_generate': can_evaluate,
             'questions_count': questions_count,
             'user_responses': user_responses,
             'min_required_questions': min_questions,
             'min_required_responses': min_user_responses,
-            'reason': f'✅ Listo: {questions_count} preguntas, {user_responses} respuestas' if can_evaluate else f'❌ Necesita: {min_questions} preguntas y {min_user_responses} respuestas (actual: {questions_count}/{user_responses})'
+            'reason': f'✅ Listo: {questions_count} preguntas, {user_responses} respuestas' if can_evaluate else f'❌ Necesita: {min_questions} preguntas y {min_user_responses} respuestas (actual: {questions_count}/{shown_responses})'
         }
     
-    async def _count_session_questions(self, session: InterviewSession) -> int:
-        """
-        🔢 PROPÓSITO: Cuenta las preguntas realizadas por Lumo
-        ⚠️  IMPORTANTE: Usa la misma lógica que el servicio de entrevista
-        """
-        ai_messages = await sync_to_async(
-            lambda: list(session.messages.filter(is_user=False).order_by('timestamp'))
-        )()
-        
-        question_count = 0
-        
-        for message in ai_messages:
-            content = message.content
-            # No contar mensajes de finalización
-            if "completado las 7 preguntas" not in content.lower():
-                question_count += 1
-        
-        return question_count
-    
     def _is_welcome_message(self, message) -> bool:
         """
         🎯 PROPÓSITO: Detecta si un mensaje es el saludo inicial de bienvenida
@@ -98,24 +118,27 @@ class EvaluationService:
         # Verificar si se puede evaluar
         can_eval = await self.can_generate_evaluation(session)
         if not can_eval['can_generate']:
-            raise ValueError(can_eval['reason'])
+            raise EvaluationNotEligible(can_eval['reason'])
         
         messages = await sync_to_async(
             lambda: list(session.messages.order_by('timestamp'))
         )()
         
         if len(messages) < 5:
-            raise ValueError("Sesión insuficiente para evaluación (mínimo 5 mensajes)")
+            raise EvaluationNotEligible("Sesión insuficiente para evaluación (mínimo 5 mensajes)")
         
         # Usar GeminiService para generar el análisis
         feedback_data = await self.gemini_service.generate_feedback_and_scores(session, messages)
         
         # Procesar y guardar resultados
-        return await self._save_evaluation_results(session, feedback_data, can_eval['questions_count'])
+        return await self._save_evaluation_results(session, feedback_data, messages)
     
-    async def _save_evaluation_results(self, session: InterviewSession, feedback_data: Dict, questions_count: int) -> Dict:
+    async def _save_evaluation_results(self, session: InterviewSession, feedback_data: Dict, messages: List) -> Dict:
         """
         💾 PROPÓSITO: Guarda resultados de evaluación en base de datos
+        📝 QUÉ HACE: Calcula todo en memoria (promedio, duración, gestión del tiempo) y
+        escribe en un solo salto a hilo y una transacción: INSERT del reporte completo,
+        bulk_create de los puntajes y UPDATE set-based de los analytics del usuario
         """
         try:
             # Calcular promedio y métricas
@@ -123,43 +146,22 @@ class EvaluationService:
             average_score = sum(comp['score'] for comp in scores.values()) / len(scores)
             performance_level = self._get_performance_level(average_score)
             
-            # Calcular duración de sesión
-            session_duration = await self._calculate_session_duration(session)
-            
-            # Crear reporte principal usando sync_to_async
-            feedback_report = await sync_to_async(FeedbackReport.objects.create)(
-                session=session,
-                overall_feedback=feedback_data['overall_feedback'],
-                average_score=average_score,
-                performance_level=performance_level,
-                session_duration_minutes=session_duration
-            )
+            # Calcular duración de sesión con los mensajes ya cargados
+            session_duration = self._session_duration_minutes(messages)
 
-            # ---- Evaluación de gestión del tiempo: calcular y guardar ----
+            # ---- Evaluación de gestión del tiempo (cálculo puro sobre la sesión) ----
             try:
                 # Importar la función de evaluación (local import para evitar ciclos)
                 from .views import evaluate_time_management
-                feedback_text, score = evaluate_time_management(session)
-                feedback_report.time_evaluation_enabled = True if score is not None else False
-                feedback_report.time_management_score = score
-                feedback_report.feedback_time = feedback_text or ''
-                await sync_to_async(feedback_report.save)()
+                feedback_time, time_score = evaluate_time_management(session)
             except Exception as e:
                 logger.warning(f"No se pudo calcular la evaluación de tiempo al guardar el reporte: {e}")
-            
-            # Crear puntajes de competencias
-            competency_scores = []
-            for comp_name, comp_data in scores.items():
-                comp_score = await sync_to_async(CompetencyScore.objects.create)(
-                    session=session,
-                    competency_name=comp_name,
-                    score=comp_data['score'],
-                    feedback=comp_data['feedback']
-                )
-                competency_scores.append(comp_score)
-            
-            # Actualizar analytics del usuario
-            await self._update_user_analytics(session.user)
+                feedback_time, time_score = '', None
+
+            feedback_report, competency_scores = await sync_to_async(self._write_evaluation_results)(
+                session, feedback_data, average_score, performance_level,
+                session_duration, feedback_time, time_score,
+            )
             
             return {
                 'success': True,
@@ -167,12 +169,59 @@ class EvaluationService:
                 'competency_scores': competency_scores,
                 'average_score': average_score,
                 'performance_level': performance_level,
-                'session_duration': session_duration
+                'session_duration': feedback_report.session_duration_minutes
             }
             
         except Exception as e:
             logger.error(f"Error guardando evaluación: {str(e)}")
             raise e
+
+    def _write_evaluation_results(self, session, feedback_data, average_score, performance_level,
+                                  session_duration, feedback_time, time_score):
+        """
+        🧱 PROPÓSITO: Escritura atómica de la evaluación (reporte, puntajes y analytics)
+        ⚠️  IMPORTANTE: Si algo falla no queda un reporte sin puntajes: el reintento del
+        trabajo de evaluación vuelve a empezar desde cero
+        """
+        with transaction.atomic():
+            try:
+                # Se escribe primero (sin leer antes): la transacción toma el lock de escritura
+                # desde la primera sentencia, también en SQLite
+                with transaction.atomic():
+                    feedback_report = FeedbackReport.objects.create(
+                        session=session,
+                        overall_feedback=feedback_data['overall_feedback'],
+                        average_score=average_score,
+                        performance_level=performance_level,
+                        session_duration_minutes=session_duration,
+                        time_evaluation_enabled=time_score is not None,
+                        time_management_score=time_score,
+                        feedback_time=feedback_time or '',
+                    )
+            except IntegrityError:
+                # El temporizador ya cerró la sesión: se completa su reporte provisional
+                # (la duración y la gestión del tiempo de finish_timer se conservan)
+                feedback_report = FeedbackReport.objects.select_for_update().get(session=session, performance_level='')
+                feedback_report.overall_feedback = feedback_data['overall_feedback']
+                feedback_report.average_score = average_score
+                feedback_report.performance_level = performance_level
+                feedback_report.generated_at = timezone.now()
+                feedback_report.save(update_fields=[
+                    'overall_feedback', 'average_score', 'performance_level', 'generated_at',
+                ])
+            competency_scores = CompetencyScore.objects.bulk_create([
+                CompetencyScore(
+                    session=session,
+                    competency_name=comp_name,
+                    score=comp_data['score'],
+                    feedback=comp_data['feedback']
+                )
+                for comp_name, comp_data in feedback_data['competency_scores'].items()
+            ])
+            # Actualizar analytics del usuario (delta incremental, no re-agregación)
+            apply_report_to_analytics(session.user_id, feedback_report, competency_scores, session.questions_asked)
+            apply_report_to_leaderboard(session.user_id, session.session_type, average_score)
+        return feedback_report, competency_scores
     
     def _get_performance_level(self, average_score: float) -> str:
         """
@@ -187,105 +236,23 @@ class EvaluationService:
         else:
             return "Necesita Mejora"
     
-    async def _calculate_session_duration(self, session: InterviewSession) -> int:
+    @staticmethod
+    def _session_duration_minutes(messages) -> int:
         """
-        ⏱️ PROPÓSITO: Calcula duración de la sesión en minutos
+        ⏱️ PROPÓSITO: Calcula duración de la sesión en minutos (mensajes en orden cronológico)
         """
-        messages_count = await sync_to_async(
-            lambda: session.messages.count()
-        )()
-        
-        if messages_count < 2:
+        if len(messages) < 2:
             return 0
         
-        first_message = await sync_to_async(
-            lambda: session.messages.order_by('timestamp').first()
-        )()
-        
-        last_message = await sync_to_async(
-            lambda: session.messages.order_by('timestamp').last()
-        )()
-        
-        duration = last_message.timestamp - first_message.timestamp
+        duration = messages[-1].timestamp - messages[0].timestamp
         return max(1, duration.seconds // 60)
     
-    async def _update_user_analytics(self, user: User):
-        """
-        📈 PROPÓSITO: Actualiza analytics del usuario
-        """
-        analytics, created = await sync_to_async(UserAnalytics.objects.get_or_create)(user=user)
-        
-        # Recalcular estadísticas usando sync_to_async para queries complejas
-        user_reports_count = await sync_to_async(
-            lambda: FeedbackReport.objects.filter(session__user=user).count()
-        )()
-        
-        if user_reports_count > 0:
-            analytics.total_sessions_evaluated = user_reports_count
-            
-            # Calcular promedio de puntajes
-            avg_score = await sync_to_async(
-                lambda: FeedbackReport.objects.filter(session__user=user).aggregate(
-                    avg_score=models.Avg('average_score')
-                )['avg_score']
-            )()
-            analytics.average_overall_score = avg_score or 0
-            
-            # Calcular totales
-            total_questions = await sync_to_async(
-                lambda: FeedbackReport.objects.filter(session__user=user).aggregate(
-                    total_questions=models.Sum('questions_analyzed')
-                )['total_questions']
-            )()
-            analytics.total_questions_answered = total_questions or 0
-            
-            total_time = await sync_to_async(
-                lambda: FeedbackReport.objects.filter(session__user=user).aggregate(
-                    total_time=models.Sum('session_duration_minutes')
-                )['total_time']
-            )()
-            analytics.total_session_time_minutes = total_time or 0
-
-            # Estadísticas acumuladas de gestión del tiempo
-            time_stats = await sync_to_async(
-                lambda: FeedbackReport.objects.filter(session__user=user).aggregate(
-                    count=models.Count('time_management_score'),
-                    sum=models.Sum('time_management_score'),
-                    avg=models.Avg('time_management_score')
-                )
-            )()
-            time_count = time_stats.get('count') or 0
-            time_sum = time_stats.get('sum') or 0.0
-            time_avg = time_stats.get('avg') or 0.0
-            analytics.total_time_management_evaluations = time_count
-            analytics.total_time_management_score = float(time_sum) if time_sum is not None else 0.0
-            analytics.average_time_management_score = float(time_avg) if time_avg is not None else 0.0
-            
-            # Encontrar competencia más fuerte y más débil
-            competency_scores_exist = await sync_to_async(
-                lambda: CompetencyScore.objects.filter(session__user=user).exists()
-            )()
-            
-            if competency_scores_exist:
-                competency_avgs = await sync_to_async(
-                    lambda: list(CompetencyScore.objects.filter(session__user=user)
-                                 .values('competency_name')
-                                 .annotate(avg_score=models.Avg('score'))
-                                 .order_by('-avg_score'))
-                )()
-                
-                if competency_avgs:
-                    analytics.strongest_competency = competency_avgs[0]['competency_name']
-                    analytics.weakest_competency = competency_avgs[-1]['competency_name']
-            
-            await sync_to_async(analytics.save)()
-    
     def get_user_progress(self, user: User) -> Dict:
         """
         📈 PROPÓSITO: Obtiene progreso y analytics del usuario (simplificado)
         """
-        # Calcular directamente desde FeedbackReport
-        user_reports = FeedbackReport.objects.filter(session__user=user)
+        # Calcular directamente desde los reportes evaluados (sin los provisionales del temporizador)
+        user_reports = evaluated_reports().filter(session__user=user)
         
         if not user_reports.exists():
             return {
@@ -368,9 +335,11 @@ class EvaluationService:
     def get_session_evaluation(self, session: InterviewSession) -> Dict:
         """
         📋 PROPÓSITO: Obtiene evaluación existente de una sesión
+        ⚠️  IMPORTANTE: El reporte provisional de finish_timer no es una evaluación: mientras
+        el trabajo sigue en cola la sesión se trata como no evaluada
         """
         try:
-            feedback_report = session.feedback_report
+            feedback_report = evaluated_reports().get(session=session)
             competency_scores = session.competency_scores.all()
             
             # Preparar datos para gráficos
@@ -396,7 +365,7 @@ class EvaluationService:
         except FeedbackReport.DoesNotExist:
             return {
                 'exists': False,
-                'can_generate': self.can_generate_evaluation(session)
+                'can_generate': async_to_sync(self.can_generate_evaluation)(session)
             }
 
 class ReportGenerator:
@@ -409,14 +378,14 @@ class ReportGenerator:
         """
         📊 PROPÓSITO: Genera reporte resumen del usuario (simplificado)
         """
-        user_reports = FeedbackReport.objects.filter(session__user=user)
+        user_reports = evaluated_reports().filter(session__user=user)
         if not user_reports.exists():
             return {'error': 'No hay datos suficientes'}
         
-        recent_sessions = user_reports.order_by('-generated_at')[:5]
+        recent_sessions = list(user_reports.select_related('session').order_by('-generated_at')[:5])
         
         # Análisis de progreso
-        if recent_sessions.count() >= 2:
+        if len(recent_sessions) >= 2:
             latest_score = recent_sessions[0].average_score
             previous_scores = [r.average_score for r in recent_sessions[1:]]
             previous_avg = sum(previous_scores) / len(previous_scores)
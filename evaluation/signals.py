@@ -0,0 +1,47 @@
+from django.db import transaction
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from interview_trainer.models import InterviewSession
+from .analytics import shift_score_buckets
+from .analytics_cache import invalidate_user_data
+from .models import CompetencyDefinition, CompetencyScore, FeedbackReport
+
+
+def _invalidate_on_commit(user_id):
+    # Tras el commit: una lectura concurrente no puede volver a cachear datos sin confirmar
+    transaction.on_commit(lambda: invalidate_user_data(user_id))
+
+
+@receiver(post_save, sender=FeedbackReport)
+def feedback_report_saved(sender, instance, **kwargs):
+    _invalidate_on_commit(instance.session.user_id)
+
+
+@receiver(post_save, sender=CompetencyScore)
+def competency_score_saved(sender, instance, **kwargs):
+    # bulk_create no emite post_save: la evaluación invalida por el FeedbackReport
+    # que se crea en la misma transacción
+    _invalidate_on_commit(instance.session.user_id)
+
+
+@receiver(post_save, sender=InterviewSession)
+def interview_session_created(sender, instance, created, **kwargs):
+    if created:
+        _invalidate_on_commit(instance.user_id)
+
+
+@receiver(post_save, sender=CompetencyDefinition)
+@receiver(post_delete, sender=CompetencyDefinition)
+def competency_definition_changed(sender, **kwargs):
+    transaction.on_commit(CompetencyDefinition.clear_cache)
+
+
+@receiver(pre_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    # El CASCADE borra sus entradas del ranking con un DELETE directo: descontarlas del histograma
+    entries = instance.leaderboard_entries.values_list('role', 'score_bucket')
+    shift_score_buckets(Counter({key: -count for key, count in Counter(entries).items()}))
@@ -0,0 +1,147 @@
+import logging
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from interview_trainer.models import InterviewSession
+from interview_trainer.tasks import dispatch_task, dispatch_task_later, on_worker_ready, shared_task
+from .analytics import evaluated_reports
+from .models import EvaluationJob
+from .services import EvaluationNotEligible, EvaluationService
+
+logger = logging.getLogger(__name__)
+
+
+def _backoff_seconds(attempt):
+    # 10s, 20s, 40s, ... (EVALUATION_JOB_BACKOFF_SECONDS * 2^(intento-1))
+    base = getattr(settings, 'EVALUATION_JOB_BACKOFF_SECONDS', 10)
+    return base * (2 ** max(attempt - 1, 0))
+
+
+def enqueue_evaluation(session_id, retry_failed=False):
+    """
+    📬 PROPÓSITO: Encola la evaluación de una sesión (idempotente por sesión)
+    📝 QUÉ HACE: Crea el EvaluationJob si no existe y lo despacha; si ya hay uno
+    (en cola, en proceso o terminado) no vuelve a encolarlo. Con retry_failed=True un
+    trabajo fallido vuelve a la cola desde cero. Devuelve (job, encolado).
+    """
+    job, created = EvaluationJob.objects.get_or_create(session_id=session_id)
+    if not created and retry_failed and job.status == 'failed':
+        # UPDATE condicional: dos peticiones simultáneas no lo reencolan dos veces
+        created = EvaluationJob.objects.filter(id=job.id, status='failed').update(
+            status='queued', attempts=0, last_error='', next_attempt_at=None,
+            finished_at=None, updated_at=timezone.now(),
+        ) == 1
+        job.refresh_from_db()
+    if created:
+        dispatch_task(run_evaluation_job, session_id)
+        logger.info(f"📬 Evaluación encolada para sesión {session_id}")
+    return job, created
+
+
+def requeue_stale_jobs(stale_minutes=15):
+    """Vuelve a encolar los trabajos 'running' sin cambios (el proceso murió a mitad)."""
+    now = timezone.now()
+    return EvaluationJob.objects.filter(
+        status='running', updated_at__lt=now - timedelta(minutes=stale_minutes),
+    ).update(status='queued', next_attempt_at=None, updated_at=now)
+
+
+def recover_evaluation_jobs():
+    """
+    ♻️ PROPÓSITO: Retoma las evaluaciones pendientes al arrancar un worker
+    📝 QUÉ HACE: Los reintentos locales (threading.Timer) y los trabajos en curso se
+    pierden si el proceso se reinicia. Reencola los 'running' atascados y despacha todos
+    los 'queued': los vencidos ya y el resto al llegar su next_attempt_at.
+    ⚠️  IMPORTANTE: Despachar de más es seguro: run_evaluation_job reserva cada trabajo
+    con un UPDATE condicional. Devuelve (reencolados, despachados).
+    """
+    recovered = requeue_stale_jobs(getattr(settings, 'EVALUATION_JOB_STALE_MINUTES', 15))
+    now = timezone.now()
+    dispatched = 0
+    pending = EvaluationJob.objects.filter(status='queued').values_list('session_id', 'next_attempt_at')
+    for session_id, next_attempt_at in pending.iterator():
+        delay = (next_attempt_at - now).total_seconds() if next_attempt_at else 0
+        if delay > 0:
+            dispatch_task_later(delay, run_evaluation_job, session_id)
+        else:
+            dispatch_task(run_evaluation_job, session_id)
+        dispatched += 1
+    if recovered or dispatched:
+        logger.info(f"♻️ Evaluaciones retomadas: {recovered} atascadas, {dispatched} despachadas")
+    return recovered, dispatched
+
+
+def _finish(job, status, error=''):
+    job.status = status
+    job.last_error = error
+    job.next_attempt_at = None
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'last_error', 'next_attempt_at', 'finished_at', 'updated_at'])
+
+
+@shared_task(bind=True)
+def run_evaluation_job(self, session_id):
+    """
+    ⚙️ PROPÓSITO: Ejecuta la evaluación de una sesión fuera de la petición del chat
+    📝 QUÉ HACE: Reserva el trabajo (queued -> running), genera el feedback con Gemini y
+    guarda el reporte. Los errores transitorios se reintentan con backoff exponencial
+    hasta EVALUATION_JOB_MAX_ATTEMPTS; solo EvaluationNotEligible marca el trabajo como
+    fallido sin reintentar.
+    """
+    # Solo trabajos vencidos: un despacho duplicado (recuperación + temporizador) no
+    # adelanta un reintento que aún espera su backoff
+    due = Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now() + timedelta(seconds=1))
+    claimed = EvaluationJob.objects.filter(due, session_id=session_id, status='queued').update(
+        status='running', attempts=F('attempts') + 1, updated_at=timezone.now(),
+    )
+    if not claimed:
+        logger.info(f"⚙️ Evaluación de sesión {session_id} ya reservada, terminada o sin vencer, se omite")
+        return {'success': False, 'error': 'Already claimed'}
+
+    job = EvaluationJob.objects.get(session_id=session_id)
+
+    # El reporte provisional de finish_timer (sin performance_level) no es una evaluación
+    if evaluated_reports().filter(session_id=session_id).exists():
+        _finish(job, 'succeeded')
+        return {'success': True, 'existing': True}
+
+    try:
+        # select_related: el guardado async usa session.user sin consultas perezosas
+        session = InterviewSession.objects.select_related('user').get(id=session_id)
+        result = async_to_sync(EvaluationService().generate_session_evaluation)(session)
+    except EvaluationNotEligible as exc:
+        # No elegible (p. ej. faltan respuestas): reintentar no lo arregla
+        logger.warning(f"⚠️ Evaluación de sesión {session_id} no elegible: {exc}")
+        _finish(job, 'failed', str(exc))
+        return {'success': False, 'error': str(exc)}
+    except Exception as exc:
+        max_attempts = getattr(settings, 'EVALUATION_JOB_MAX_ATTEMPTS', 4)
+        if job.attempts >= max_attempts:
+            logger.exception(f"❌ Evaluación de sesión {session_id} falló tras {job.attempts} intentos: {exc}")
+            _finish(job, 'failed', str(exc))
+            return {'success': False, 'error': str(exc)}
+
+        delay = _backoff_seconds(job.attempts)
+        logger.warning(f"🔁 Evaluación de sesión {session_id} falló (intento {job.attempts}), reintento en {delay}s: {exc}")
+        job.status = 'queued'
+        job.last_error = str(exc)
+        job.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        job.save(update_fields=['status', 'last_error', 'next_attempt_at', 'updated_at'])
+        dispatch_task_later(delay, run_evaluation_job, session_id)
+        return {'success': False, 'error': str(exc), 'retry_in': delay}
+
+    _finish(job, 'succeeded')
+    logger.info(f"✅ Evaluación de sesión {session_id} completada: {result['average_score']:.1f}/10")
+    return {
+        'success': True,
+        'average_score': result['average_score'],
+        'performance_level': result['performance_level'],
+    }
+
+
+# Al arrancar un worker (Celery o el pool local) se retoman los trabajos pendientes
+on_worker_ready(recover_evaluation_jobs)
@@ -1,3 +1,256 @@
+import html
+import re
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.signals import request_started
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from interview_trainer.cleanup import delete_user_sessions
+from interview_trainer.models import InterviewSession
+from .analytics import rebuild_role_leaderboard, rebuild_user_analytics
+from .models import FeedbackReport, RoleLeaderboardEntry, RoleScoreBucket, UserAnalytics, UserCompetencyStat
+from . import tasks
+from .services import EvaluationService, ReportGenerator
+from .tasks import enqueue_evaluation, run_evaluation_job
+
+
+def setUpModule():
+    # Sin pool local: la recuperación de trabajos no debe correr contra la base de pruebas
+    request_started.disconnect(dispatch_uid='interview_trainer.start_local_worker')
+
+
+class EvaluationTestCase(TestCase):
+    def setUp(self):
+        self.service = EvaluationService()
+
+    def create_session(self, user, session_type='it', questions_asked=7, total_time_used=0):
+        return InterviewSession.objects.create(
+            user=user, session_type=session_type, title='Entrevista',
+            questions_asked=questions_asked, total_time_used=total_time_used,
+        )
+
+    def evaluate(self, session, scores, minutes=20, time_score=None):
+        """Guarda la evaluación por el mismo camino que el trabajo de evaluación."""
+        average = sum(scores.values()) / len(scores)
+        feedback_data = {
+            'overall_feedback': 'Buen desempeño',
+            'competency_scores': {name: {'score': score, 'feedback': ''} for name, score in scores.items()},
+        }
+        report, _ = self.service._write_evaluation_results(
+            session, feedback_data, average, self.service._get_performance_level(average),
+            minutes, '', time_score,
+        )
+        return report
+
+
+def analytics_snapshot():
+    analytics = {
+        row.pop('user_id'): {key: round(value, 6) if isinstance(value, float) else value for key, value in row.items()}
+        for row in UserAnalytics.objects.values(
+            'user_id', 'total_sessions_evaluated', 'total_overall_score', 'average_overall_score',
+            'total_questions_answered', 'total_session_time_minutes', 'total_time_management_evaluations',
+            'total_time_management_score', 'average_time_management_score',
+            'strongest_competency', 'weakest_competency',
+        )
+    }
+    stats = set(UserCompetencyStat.objects.values_list('user_id', 'competency_name', 'score_sum', 'score_count'))
+    return analytics, stats
+
+
+class IncrementalAnalyticsTests(EvaluationTestCase):
+    def test_incremental_analytics_match_full_rebuild(self):
+        ana = User.objects.create_user('ana')
+        luis = User.objects.create_user('luis')
+
+        self.evaluate(self.create_session(ana), {'Comunicación': 8, 'Liderazgo': 6}, minutes=18, time_score=7.5)
+        self.evaluate(self.create_session(ana, questions_asked=8), {'Comunicación': 4, 'Resolución de problemas': 9})
+        # El temporizador cerró la sesión antes de la evaluación: se completa su reporte provisional
+        timed = self.create_session(ana, total_time_used=1500)
+        timed.finish_timer()
+        self.evaluate(timed, {'Liderazgo': 6, 'Resolución de problemas': 5})
+        # ... y finish_timer sobre un reporte ya contado solo aplica la diferencia de tiempo
+        timed.total_time_used = 2100
+        timed.finish_timer(interrupted=True)
+        # Un reporte provisional sin evaluación no cuenta
+        self.create_session(ana, total_time_used=600).finish_timer()
+        self.evaluate(self.create_session(luis, session_type='hr'), {'Comunicación': 3}, minutes=12, time_score=4.0)
+
+        incremental = analytics_snapshot()
+        self.assertEqual(incremental[0][ana.id]['total_sessions_evaluated'], 3)
+        self.assertEqual(incremental[0][ana.id]['total_questions_answered'], 22)
+
+        self.assertEqual(rebuild_user_analytics(), 2)
+        self.assertEqual(analytics_snapshot(), incremental)
+
+
+class EvaluationStatusTests(EvaluationTestCase):
+    def test_provisional_timer_report_is_not_returned_as_the_evaluation(self):
+        user = User.objects.create_user('ana')
+        self.client.force_login(user)
+        session = self.create_session(user, total_time_used=900)
+        session.finish_timer()
+        with mock.patch.object(tasks, 'dispatch_task') as dispatch:
+            job, queued = enqueue_evaluation(session.id)
+        self.assertTrue(queued)
+        dispatch.assert_called_once_with(run_evaluation_job, session.id)
+        url = reverse('evaluation_api:api_get_evaluation', args=[session.id])
+
+        # Mientras el trabajo sigue en cola el chat debe seguir consultando (202)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(response.json()['exists'])
+        self.assertEqual(response.json()['job']['status'], 'queued')
+
+        self.evaluate(session, {'Comunicación': 8, 'Liderazgo': 6})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['average_score'], 7.0)
+        self.assertEqual(response.json()['performance_level'], 'Bueno')
+
+class ProgressSummaryTests(EvaluationTestCase):
+    def test_provisional_timer_reports_do_not_count(self):
+        user = User.objects.create_user('ana')
+        self.evaluate(self.create_session(user), {'Comunicación': 6}, minutes=30)
+        self.evaluate(self.create_session(user), {'Comunicación': 8}, minutes=30)
+        # Sesiones cerradas por el temporizador y aún sin evaluar (puntaje 0, sin nivel)
+        for _ in range(2):
+            self.create_session(user, total_time_used=1800).finish_timer()
+
+        progress = self.service.get_user_progress(user)
+        self.assertEqual(progress['total_sessions'], 2)
+        self.assertEqual(progress['average_score'], 7.0)
+        self.assertEqual(progress['total_time_hours'], 1.0)
+        self.assertEqual(len(progress['progress_trend']), 2)
+
+        summary = ReportGenerator().generate_user_summary_report(user)
+        self.assertEqual(summary['total_sessions'], 2)
+        self.assertEqual(summary['average_score'], 7.0)
+        self.assertEqual([r.average_score for r in summary['recent_sessions']], [8.0, 6.0])
+        # Con los provisionales contados, los dos últimos 0/10 daban 'bajando'
+        self.assertNotEqual(UserAnalytics.objects.get(user=user).get_performance_trend(), 'bajando')
+
+def leaderboard_snapshot():
+    return {
+        (user_id, role): (round(score_sum, 6), report_count, round(average, 6), bucket)
+        for user_id, role, score_sum, report_count, average, bucket in RoleLeaderboardEntry.objects.values_list(
+            'user_id', 'role', 'score_sum', 'report_count', 'average_score', 'score_bucket',
+        )
+    }
+
+
+def bucket_snapshot():
+    return {
+        (role, bucket): count
+        for role, bucket, count in RoleScoreBucket.objects.values_list('role', 'bucket', 'entry_count')
+        if count
+    }
+
+
+class RoleLeaderboardTests(EvaluationTestCase):
+    def assertHistogramMatchesEntries(self):
+        counts = {}
+        for role, bucket in RoleLeaderboardEntry.objects.values_list('role', 'score_bucket'):
+            counts[(role, bucket)] = counts.get((role, bucket), 0) + 1
+        self.assertEqual(bucket_snapshot(), counts)
+        for entry in RoleLeaderboardEntry.objects.all():
+            above = RoleLeaderboardEntry.objects.filter(role=entry.role, average_score__gt=entry.average_score).count()
+            self.assertEqual(entry.rank(), above + 1)
+
+    def test_incremental_leaderboard_matches_full_rebuild_and_ranks(self):
+        ana, luis, marta, pedro = (User.objects.create_user(name) for name in ('ana', 'luis', 'marta', 'pedro'))
+        self.evaluate(self.create_session(ana), {'Comunicación': 9})
+        self.evaluate(self.create_session(ana), {'Comunicación': 7})
+        self.evaluate(self.create_session(ana, session_type='hr'), {'Comunicación': 2})
+        self.evaluate(self.create_session(luis), {'Comunicación': 6, 'Liderazgo': 8})
+        self.evaluate(self.create_session(marta), {'Comunicación': 7})
+        self.evaluate(self.create_session(pedro), {'Comunicación': 5})
+        # El reporte provisional del temporizador no entra en el ranking
+        self.create_session(pedro, total_time_used=600).finish_timer()
+
+        incremental, buckets = leaderboard_snapshot(), bucket_snapshot()
+        self.assertEqual(incremental[(ana.id, 'it')], (16.0, 2, 8.0, 160))
+        self.assertHistogramMatchesEntries()
+
+        self.assertEqual(rebuild_role_leaderboard(batch_size=2), 5)
+        self.assertEqual(leaderboard_snapshot(), incremental)
+        self.assertEqual(bucket_snapshot(), buckets)
+
+        # Empates comparten posición (luis y marta con 7.0)
+        ranks = {entry.user_id: entry.rank() for entry in RoleLeaderboardEntry.objects.filter(role='it')}
+        self.assertEqual(ranks, {ana.id: 1, luis.id: 2, marta.id: 2, pedro.id: 4})
+        self.assertEqual(RoleLeaderboardEntry.objects.get(user=ana, role='hr').rank(), 1)
+
+    def test_histogram_follows_bucket_changes_rebuilds_and_user_deletion(self):
+        users = [User.objects.create_user(f'user{i}') for i in range(6)]
+        for i, user in enumerate(users):
+            self.evaluate(self.create_session(user), {'Comunicación': 3 + i, 'Liderazgo': 9 - (i % 3)})
+        # Nuevos reportes mueven las entradas de tramo (también dentro del mismo tramo)
+        self.evaluate(self.create_session(users[0]), {'Comunicación': 10})
+        self.evaluate(self.create_session(users[5]), {'Comunicación': 1})
+        self.evaluate(self.create_session(users[2]), {'Comunicación': 6, 'Liderazgo': 7})
+        self.assertHistogramMatchesEntries()
+
+        # Borrar una sesión evaluada reconstruye solo las entradas de ese usuario
+        latest = InterviewSession.objects.filter(user=users[0]).latest('id')
+        delete_user_sessions(users[0], [latest.id])
+        self.assertHistogramMatchesEntries()
+
+        users[3].delete()
+        self.assertFalse(RoleLeaderboardEntry.objects.filter(user_id=users[3].id).exists())
+        self.assertHistogramMatchesEntries()
+
+
+class EvaluationHistoryTests(EvaluationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('ana')
+        self.client.force_login(self.user)
+        self.url = reverse('evaluation:evaluation_history')
+        reports = [self.evaluate(self.create_session(self.user), {'Comunicación': score}) for score in (4, 5, 6, 7, 8)]
+        # Tres reportes con el mismo generated_at: el id desempata entre páginas
+        now = timezone.now()
+        FeedbackReport.objects.filter(id__in=[r.id for r in reports[1:4]]).update(generated_at=now)
+        FeedbackReport.objects.filter(id=reports[0].id).update(generated_at=now - timedelta(hours=1))
+        FeedbackReport.objects.filter(id=reports[4].id).update(generated_at=now + timedelta(hours=1))
+        self.expected = [reports[4].id, reports[3].id, reports[2].id, reports[1].id, reports[0].id]
+        # Un reporte provisional del temporizador no aparece en el historial
+        self.create_session(self.user, total_time_used=600).finish_timer()
+
+    def older_link(self, response):
+        match = re.search(r'href="([^"]*cursor=[^"]*)"', response.content.decode())
+        return html.unescape(match.group(1)) if match else None
+
+    def test_older_links_cover_every_report_once_across_ties(self):
+        seen, pages, url = [], [], f'{self.url}?limit=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTemplateUsed(response, 'evaluation/evaluation_history.html')
+            context = response.context
+            self.assertEqual(context['total_evaluations'], 5)
+            seen.extend(report.id for report in context['feedback_reports'])
+            url = self.older_link(response)
+            pages.append((context['has_more'], url is not None))
+            if url:
+                self.assertIn(f"cursor={context['next_cursor']}", url)
+                self.assertIn('limit=2', url)
+
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(pages, [(True, True), (True, True), (False, False)])
+        self.assertEqual(response.context['latest_score'], 8.0)
+
+    def test_exact_last_page_has_no_next_cursor(self):
+        response = self.client.get(self.url, {'limit': 5})
+        self.assertEqual([report.id for report in response.context['feedback_reports']], self.expected)
+        self.assertFalse(response.context['has_more'])
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertIsNone(self.older_link(response))
 
-# Create your tests here.
+    def test_invalid_cursor_or_limit_redirects_to_first_page(self):
+        for params in ({'cursor': 'no-es-un-cursor'}, {'cursor': 'Zm9vfGJhcg'}, {'limit': 'abc'}):
+            with self.subTest(params=params):
+                self.assertRedirects(self.client.get(self.url, params), self.url, fetch_redirect_response=False)
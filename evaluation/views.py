@@ -3,10 +3,15 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from interview_trainer.models import InterviewSession
+from interview_trainer.pagination import encode_cursor, keyset_before, page_size
+from django.db.models import Avg, Count, Max
 from .services import EvaluationService, ReportGenerator
-from .models import FeedbackReport, UserAnalytics, CompetencyDefinition
-from django.db.models import Avg, Window, F
-from django.db.models.functions import Rank
+from .models import FeedbackReport, UserAnalytics, CompetencyDefinition, RoleLeaderboardEntry
+from .analytics import competency_analysis_data, evaluated_reports
+from .analytics_cache import get_user_data, get_user_progress_cached
+
+# Usuarios que se muestran en el ranking por rol
+RANKING_TOP_SIZE = 20
 
 
 def evaluate_time_management(session):
@@ -125,16 +130,16 @@ def user_dashboard(request):
     """
     📈 PROPÓSITO: Dashboard principal de analytics del usuario
     """
-    evaluation_service = EvaluationService()
-    report_generator = ReportGenerator()
-    
-    # Obtener datos del usuario
-    analytics = evaluation_service.get_user_progress(request.user)
+    # Obtener datos del usuario (cache por usuario, se invalida con cada evaluación)
+    analytics = get_user_progress_cached(request.user)
     
     # Obtener resumen si hay datos
     summary = None
     if analytics['total_sessions'] > 0:
-        summary = report_generator.generate_user_summary_report(request.user)
+        summary = get_user_data(
+            request.user.id, 'summary_report',
+            lambda _: ReportGenerator().generate_user_summary_report(request.user),
+        )
     
     # Obtener competencias definidas
     competencies = CompetencyDefinition.get_default_competencies()
@@ -153,45 +158,15 @@ def competency_analysis(request):
     """
     🎯 PROPÓSITO: Análisis detallado de competencias del usuario
     """
-    evaluation_service = EvaluationService()
-    
     # Obtener analytics básicos
-    analytics = evaluation_service.get_user_progress(request.user)
+    analytics = get_user_progress_cached(request.user)
     
     if analytics['total_sessions'] == 0:
         messages.info(request, 'Necesitas completar al menos una entrevista para ver el análisis de competencias.')
         return redirect('interview_trainer:select_interview_type')
     
-    # Obtener análisis detallado de competencias
-    from .models import CompetencyScore
-    from django.db.models import Avg, Count, Max, Min
-    
-    competency_analysis = CompetencyScore.objects.filter(
-        session__user=request.user
-    ).values('competency_name').annotate(
-        avg_score=Avg('score'),
-        max_score=Max('score'),
-        min_score=Min('score'),
-        total_evaluations=Count('id')
-    ).order_by('-avg_score')
-    
-    # Obtener evolución temporal por competencia
-    competency_evolution = {}
-    for comp_data in competency_analysis:
-        comp_name = comp_data['competency_name']
-        comp_scores = CompetencyScore.objects.filter(
-            session__user=request.user,
-            competency_name=comp_name
-        ).order_by('created_at')
-        
-        competency_evolution[comp_name] = [
-            {
-                'score': score.score,
-                'date': score.created_at.strftime('%d/%m'),
-                'session_title': score.session.title
-            }
-            for score in comp_scores
-        ]
+    # Análisis y evolución de todas las competencias en una sola consulta
+    competency_analysis, competency_evolution, _ = competency_analysis_data(request.user.id)
     
     context = {
         'analytics': analytics,
@@ -205,26 +180,52 @@ def competency_analysis(request):
 def evaluation_history(request):
     """
     📋 PROPÓSITO: Historial de todas las evaluaciones del usuario
+    📝 QUÉ HACE: Estadísticas con un único aggregate() y listado paginado por cursor
+    (?cursor=), con solo las columnas que muestra la página
     """
-    # Obtener todas las evaluaciones del usuario
-    feedback_reports = FeedbackReport.objects.filter(
-        session__user=request.user
-    ).order_by('-generated_at').select_related('session')
+    feedback_reports = evaluated_reports().filter(session__user=request.user)
     
-    # Calcular estadísticas
-    total_evaluations = feedback_reports.count()
-    if total_evaluations > 0:
-        avg_score = sum(report.average_score for report in feedback_reports) / total_evaluations
-        best_score = max(report.average_score for report in feedback_reports)
-        latest_score = feedback_reports.first().average_score if feedback_reports else 0
+    # Calcular estadísticas en la base de datos
+    stats = feedback_reports.aggregate(
+        total_evaluations=Count('id'),
+        avg_score=Avg('average_score'),
+        best_score=Max('average_score'),
+    )
+    
+    try:
+        limit = page_size(request)
+        page = keyset_before(feedback_reports, 'generated_at', request.GET.get('cursor'))
+    except ValueError:
+        return redirect('evaluation:evaluation_history')
+    
+    reports = list(
+        page.select_related('session')
+        .only(
+            'id', 'average_score', 'performance_level', 'generated_at', 'session_duration_minutes',
+            'session__id', 'session__title', 'session__session_type', 'session__created_at',
+        )
+        .order_by('-generated_at', '-id')[:limit + 1]
+    )
+    has_more = len(reports) > limit
+    reports = reports[:limit]
+    
+    # El último puntaje es la primera fila de la primera página
+    if not request.GET.get('cursor'):
+        latest_score = reports[0].average_score if reports else 0
     else:
-        avg_score = best_score = latest_score = 0
+        latest_score = (
+            feedback_reports.order_by('-generated_at', '-id').values_list('average_score', flat=True).first() or 0
+        )
     
     context = {
-        'feedback_reports': feedback_reports,
-        'total_evaluations': total_evaluations,
-        'avg_score': round(avg_score, 1),
-        'best_score': round(best_score, 1),
+        'feedback_reports': reports,
+        'has_more': has_more,
+        'next_cursor': encode_cursor(reports[-1].generated_at, reports[-1].id) if has_more else None,
+        'is_first_page': not request.GET.get('cursor'),
+        'page_size': limit,
+        'total_evaluations': stats['total_evaluations'],
+        'avg_score': round(stats['avg_score'] or 0, 1),
+        'best_score': round(stats['best_score'] or 0, 1),
         'latest_score': round(latest_score, 1),
     }
     
@@ -234,45 +235,58 @@ def evaluation_history(request):
 def global_ranking(request, role_slug='it'):
     """
     🏆 PROPÓSITO: Muestra el ranking global de usuarios para un rol específico.
+    📝 QUÉ HACE: Lee el ranking materializado (RoleLeaderboardEntry): el top 20 sale del
+    índice (rol, promedio) y, si el usuario no está en el top, su posición sale del
+    histograma por tramos (ver RoleLeaderboardEntry.rank).
     """
     # Obtener todos los tipos de entrevista para el selector
     all_roles = InterviewSession.INTERVIEW_TYPES
 
-    # Filtrar reportes de feedback para el rol seleccionado
-    feedback_reports = FeedbackReport.objects.filter(
-        session__session_type=role_slug
-    ).select_related('session__user')
-
-    # Calcular el puntaje promedio por usuario para ese rol
-    user_scores = feedback_reports.values(
-        'session__user__username', 'session__user_id'
-    ).annotate(
-        average_score=Avg('average_score')
-    ).order_by('-average_score')
-
-    # Añadir el ranking usando Window functions
-    ranked_users = user_scores.annotate(
-        rank=Window(
-            expression=Rank(),
-            order_by=F('average_score').desc()
-        )
+    top_entries = list(
+        RoleLeaderboardEntry.objects.filter(role=role_slug)
+        .select_related('user').only('user_id', 'user__username', 'average_score')
+        .order_by('-average_score', 'user_id')[:RANKING_TOP_SIZE]
     )
 
+    # Posiciones del top (empates comparten posición, como Rank())
+    ranked_users = []
+    for position, entry in enumerate(top_entries, start=1):
+        if ranked_users and entry.average_score == ranked_users[-1]['average_score']:
+            rank = ranked_users[-1]['rank']
+        else:
+            rank = position
+        ranked_users.append({
+            'user_id': entry.user_id,
+            'username': entry.user.username,
+            'average_score': entry.average_score,
+            'rank': rank,
+        })
+
     # Obtener la posición del usuario actual
-    current_user_rank = None
-    for user in ranked_users:
-        if user['session__user_id'] == request.user.id:
-            current_user_rank = user
-            break
+    current_user_rank = next((row for row in ranked_users if row['user_id'] == request.user.id), None)
+    current_user_in_top = current_user_rank is not None
+    if current_user_rank is None:
+        entry = (
+            RoleLeaderboardEntry.objects.filter(role=role_slug, user=request.user)
+            .only('role', 'average_score', 'score_bucket').first()
+        )
+        if entry is not None:
+            current_user_rank = {
+                'user_id': request.user.id,
+                'username': request.user.username,
+                'average_score': entry.average_score,
+                'rank': entry.rank(),
+            }
 
     # Obtener el nombre legible del rol
     selected_role_name = dict(all_roles).get(role_slug, 'General')
 
     context = {
-        'ranked_users': ranked_users[:20],  # Top 20
+        'ranked_users': ranked_users,  # Top 20
         'current_user_rank': current_user_rank,
         'all_roles': all_roles,
         'selected_role': role_slug,
         'selected_role_name': selected_role_name,
+        'current_user_in_top': current_user_in_top,
     }
     return render(request, 'evaluation/global_ranking.html', context)
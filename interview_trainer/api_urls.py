@@ -5,12 +5,18 @@ app_name = 'interview_trainer_api'
 
 urlpatterns = [
     path('send-message/', api_views.send_message, name='api_send_message'),
+    path('send-message/stream/', api_views.send_message_stream, name='api_send_message_stream'),
     path('sessions/', api_views.get_sessions, name='api_get_sessions'),
     path('sessions/<int:session_id>/messages/', api_views.get_session_messages, name='api_get_session_messages'),
     path('sessions/<int:session_id>/timer/', api_views.session_timer_status, name='api_session_timer_status'),
     path('sessions/<int:session_id>/timer/tick/', api_views.session_timer_tick, name='api_session_timer_tick'),
     path('messages/<int:message_id>/', api_views.get_message, name='api_get_message'),
+    path('messages/<int:message_id>/audio/', api_views.get_message_audio, name='api_get_message_audio'),
+    path('messages/<int:message_id>/audio/stream/', api_views.stream_message_audio, name='api_stream_message_audio'),
     path('sessions/<int:session_id>/delete/', api_views.delete_session, name='delete_session'),
     path('sessions/delete/', api_views.delete_sessions_bulk, name='delete_sessions_bulk'),
     path('sessions/delete-all/', api_views.delete_all_sessions, name='delete_all_sessions'),
+
+    # Métricas de la caché de audio TTS (staff)
+    path('tts-cache/metrics/', api_views.get_tts_cache_metrics, name='api_tts_cache_metrics'),
 ]
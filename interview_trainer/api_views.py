@@ -1,68 +1,77 @@
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified, HttpResponseRedirect,
+    JsonResponse, StreamingHttpResponse,
+)
+from django.views.decorators.http import require_http_methods
+from django.db.models import Count, F
 from .models import InterviewSession, ChatMessage, UserProfile
-from .services import GeminiService
+from .services import get_gemini_service
+from .decorators import async_api_view
+from .audio_encoding import VariantNotAvailable, negotiate_variant
+from .history import aget_history_window
+from .cleanup import delete_user_sessions
+from .pagination import encode_cursor, etag_matches, json_etag, keyset_before, page_size
+from .tts_cache import tts_cache
+from .tasks import attach_streamed_tts, claim_tts, dispatch_task, generate_and_save_tts
+from evaluation.analytics_cache import invalidate_user_data
 from asgiref.sync import sync_to_async
-from django.core.files.base import ContentFile
+from django.urls import reverse
 import asyncio
+import json
 import logging
-import time
 import mimetypes
+import os
+import re
+import zlib
 from django.utils import timezone
 
 # Importar servicio de evaluación para generación automática
 try:
     from evaluation.services import EvaluationService
+    from evaluation.tasks import enqueue_evaluation
     EVALUATION_AVAILABLE = True
 except ImportError:
     EVALUATION_AVAILABLE = False
     
 logger = logging.getLogger(__name__)
 
-# Funciones async para operaciones de base de datos
-@sync_to_async
-def create_user_message(session, content):
-    return ChatMessage.objects.create(
+# Mensajes por página del historial del chat (una sesión completa suele caber en una)
+MESSAGES_PAGE_SIZE = 50
+
+# Funciones async para operaciones de base de datos (ORM async nativo)
+async def create_user_message(session, content):
+    return await ChatMessage.objects.acreate(
         session=session,
         is_user=True,
         content=content
     )
 
-@sync_to_async
-def create_ai_message(session, content):
-    return ChatMessage.objects.create(
+async def create_ai_message(session, content, tts_voice=None):
+    return await ChatMessage.objects.acreate(
         session=session,
         is_user=False,
-        content=content
+        content=content,
+        tts_voice=tts_voice,
+        tts_status='pending' if tts_voice else ''
     )
 
-@sync_to_async
-def get_conversation_history(session):
-    """Obtener historial de conversación excluyendo el último mensaje"""
-    all_messages = list(session.messages.order_by('timestamp'))
-    conversation_history = []
-    
-    # Todos los mensajes excepto el último (que será el mensaje actual del usuario)
-    for msg in all_messages[:-1]:
-        conversation_history.append({
-            'is_user': msg.is_user,
-            'content': msg.content
-        })
-    
-    return conversation_history
-
-@sync_to_async
-def update_user_profile(user):
-    profile, created = UserProfile.objects.get_or_create(user=user)
-    profile.total_sessions = InterviewSession.objects.filter(user=user).count()
-    profile.save()
+async def update_user_profile(user):
+    profile, created = await UserProfile.objects.aget_or_create(user=user)
+    profile.total_sessions = await InterviewSession.objects.filter(user=user).acount()
+    await profile.asave()
     return profile
 
 async def handle_evaluation_generation(session):
-    """Maneja la generación automática de evaluación"""
+    """
+    Encola la evaluación automática cuando la sesión llega a las 7 preguntas.
+    ⚡ La llamada de feedback a Gemini corre en segundo plano (EvaluationJob): el último
+    turno del chat responde tan rápido como cualquier otro.
+    """
     if not EVALUATION_AVAILABLE:
         return None
         
@@ -73,29 +82,16 @@ async def handle_evaluation_generation(session):
         can_eval = await evaluation_service.can_generate_evaluation(session)
         
         if can_eval['can_generate']:
-            logger.info(f"🎯 Generando evaluación automática para sesión {session.id}")
-            
-            # Verificar si ya existe evaluación usando sync_to_async
-            has_evaluation = await sync_to_async(
-                lambda: hasattr(session, 'feedback_report') and session.feedback_report
-            )()
-            
-            if not has_evaluation:
-                # Generar evaluación automáticamente
-                evaluation_result = await evaluation_service.generate_session_evaluation(session)
-                
-                if evaluation_result['success']:
-                    evaluation_data = {
-                        'evaluation_generated': True,
-                        'average_score': evaluation_result['average_score'],
-                        'performance_level': evaluation_result['performance_level']
-                    }
-                    logger.info(f"✅ Evaluación generada: {evaluation_result['average_score']}/10")
-                    return evaluation_data
-                else:
-                    logger.error(f"❌ Error generando evaluación: {evaluation_result.get('error', 'Unknown')}")
-            else:
-                logger.info(f"📊 Evaluación ya existe para sesión {session.id}")
+            job, created = await sync_to_async(enqueue_evaluation)(session.id)
+            if created:
+                logger.info(f"🎯 Evaluación automática encolada para sesión {session.id}")
+            return {
+                'evaluation_queued': True,
+                'status': job.status,
+                'status_url': reverse('evaluation_api:api_get_evaluation', args=[session.id]),
+            }
+        elif can_eval.get('existing'):
+            logger.info(f"📊 Evaluación ya existe para sesión {session.id}")
         else:
             logger.info(f"⏳ Sesión {session.id} no lista para evaluación: {can_eval['reason']}")
         
@@ -105,201 +101,344 @@ async def handle_evaluation_generation(session):
         logger.error(f"❌ Error en evaluación automática: {str(e)}")
         return {'evaluation_error': str(e)}
 
-async def process_message_async(user, message, session_id, voice_name=None):
-    """Procesa el mensaje de forma asíncrona"""
+async def prepare_turn(user, message, session_id):
+    """
+    Guarda el mensaje del usuario y devuelve (sesión, mensaje, historial, preguntas hechas)
+    para Gemini. El historial es solo la ventana reciente que usa el prompt.
+    """
+    # Obtener sesión con el ORM async
+    session = await InterviewSession.objects.aget(id=session_id, user=user)
+    
+    # Guardar mensaje del usuario
+    user_message = await create_user_message(session, message)
+    
+    # Ventana reciente del historial (sin el mensaje actual); las preguntas hechas
+    # vienen del contador persistido en la sesión
+    conversation_history = await aget_history_window(session.id, exclude_id=user_message.id)
+    questions_asked = session.questions_asked
+    
+    # Debug logging
+    logger.info(f"📤 Enviando a Gemini:")
+    logger.info(f"   • Mensaje actual: '{message[:50]}...'")
+    logger.info(f"   • Historial: {len(conversation_history)} mensajes, {questions_asked} preguntas hechas")
+    if conversation_history:
+        last_sender = 'Usuario' if conversation_history[-1]['is_user'] else 'Lumo'
+        logger.info(f"   • Último en historial: {last_sender}")
+    else:
+        logger.info(f"   • Historial vacío")
+    
+    return session, user_message, conversation_history, questions_asked
+
+def message_audio_url(message):
+    """URL del endpoint que sirve el audio del mensaje (None si aún no existe)"""
+    if not message.audio_file:
+        return None
+    return reverse('interview_trainer_api:api_get_message_audio', args=[message.id])
+
+def serialize_ai_message(message):
+    """Datos públicos de un mensaje de la IA, incluido el estado de su audio"""
+    return {
+        'id': message.id,
+        'content': message.content,
+        'timestamp': message.timestamp.isoformat(),
+        'audio_url': message_audio_url(message),
+        'tts_status': message.tts_status,
+        'tts_voice': message.tts_voice,
+        'status_url': reverse('interview_trainer_api:api_get_message', args=[message.id]),
+        'audio_stream_url': reverse('interview_trainer_api:api_stream_message_audio', args=[message.id]),
+    }
+
+async def complete_turn(user, session, user_message, ai_response, voice_name=None, audio_delivery='queued'):
+    """Guarda la respuesta de la IA, encola el TTS y arma el resultado del turno
+
+    audio_delivery='stream': no se encola el TTS; el cliente abre audio_stream_url
+    y el audio se sintetiza mientras se reproduce.
+    """
+    # Guardar respuesta de IA (el audio queda pendiente)
+    chosen_voice = voice_name or 'Leda'
+    ai_message = await create_ai_message(session, ai_response, tts_voice=chosen_voice)
+    
+    # 🔊 El TTS corre en segundo plano: la respuesta de texto no espera la síntesis.
+    # El cliente consulta /api/messages/<id>/ hasta que tts_status sea 'ready'.
     try:
-        # Obtener sesión usando sync_to_async
-        session = await sync_to_async(
-            lambda: InterviewSession.objects.get(id=session_id, user=user)
-        )()
-        
-        # Guardar mensaje del usuario
-        user_message = await create_user_message(session, message)
-        
-        # Obtener historial de conversación
-        conversation_history = await get_conversation_history(session)
+        if audio_delivery != 'stream':
+            await sync_to_async(dispatch_task, thread_sensitive=False)(
+                generate_and_save_tts, ai_message.id, voice_name=chosen_voice
+            )
+    except Exception as ex:
+        logger.warning(f"⚠️ No se pudo encolar TTS: {ex}")
+        ai_message.tts_status = 'failed'
+        await ai_message.asave(update_fields=['tts_status'])
         
-        # Debug logging
-        logger.info(f"📤 Enviando a Gemini:")
-        logger.info(f"   • Mensaje actual: '{message[:50]}...'")
-        logger.info(f"   • Historial: {len(conversation_history)} mensajes")
-        if conversation_history:
-            last_sender = 'Usuario' if conversation_history[-1]['is_user'] else 'Lumo'
-            logger.info(f"   • Último en historial: {last_sender}")
-        else:
-            logger.info(f"   • Historial vacío")
+    # Manejar evaluación automática
+    evaluation_data = await handle_evaluation_generation(session)
+    
+    # Actualizar perfil de usuario
+    await update_user_profile(user)
+    
+    return {
+        'success': True,
+        'session_id': session.id,
+        'user_message': {
+            'id': user_message.id,
+            'content': user_message.content,
+            'timestamp': user_message.timestamp.isoformat()
+        },
+        'ai_response': serialize_ai_message(ai_message),
+        'evaluation': evaluation_data
+    }
+
+async def process_message_async(user, message, session_id, voice_name=None, audio_delivery='queued'):
+    """Procesa el mensaje de forma asíncrona"""
+    try:
+        session, user_message, conversation_history, questions_asked = await prepare_turn(user, message, session_id)
         
         # Generar respuesta
-        gemini_service = GeminiService()
-        ai_response = await gemini_service.generate_response(
+        ai_response = await get_gemini_service().generate_response(
             message=message,
             conversation_history=conversation_history,
-            interview_type=session.session_type
+            interview_type=session.session_type,
+            questions_asked=questions_asked,
         )
         
-        # Guardar respuesta de IA
-        ai_message = await create_ai_message(session, ai_response)
-        
-        # ✅ NUEVO: Función helper para guardar audio de forma síncrona
-        @sync_to_async
-        def save_audio_file(msg, audio_bytes, voice):
-            """Guarda el archivo de audio en el mensaje"""
-            mime = 'audio/wav'
-            ext = '.wav'
-            filename = f"session_{session.id}_msg_{msg.id}_{int(time.time())}{ext}"
-            msg.audio_file.save(filename, ContentFile(audio_bytes))
-            msg.tts_voice = voice
-            msg.save()
-            return msg.audio_file.url
-        
-        # Generar TTS inmediatamente
-        try:
-            chosen_voice = voice_name or 'Leda'
-            tts_result = gemini_service.text_to_speech(ai_response, voice_name=chosen_voice)
-            
-            if tts_result and tts_result.get('audio_bytes'):
-                import base64
-                audio_base64 = base64.b64encode(tts_result['audio_bytes']).decode('utf-8')
-                
-                # ✅ Guardar audio usando sync_to_async
-                try:
-                    audio_url = await save_audio_file(
-                        ai_message, 
-                        tts_result['audio_bytes'], 
-                        tts_result.get('voice_name') or chosen_voice
-                    )
-                    logger.info(f"✅ TTS guardado en modelo para mensaje {ai_message.id} voice={chosen_voice}")
-                except Exception as save_ex:
-                    logger.exception("❌ No se pudo guardar el audio en ChatMessage: %s", save_ex)
-            else:
-                audio_base64 = None
-                
-        except Exception as ex:
-            logger.warning(f"⚠️ No se pudo generar TTS: {ex}")
-            tts_result = None
-            audio_base64 = None
-            
-        # Manejar evaluación automática
-        evaluation_data = await handle_evaluation_generation(session)
-        
-        # Actualizar perfil de usuario
-        await update_user_profile(user)
-        
-        return {
-            'success': True,
-            'session_id': session.id,
-            'user_message': {
-                'id': user_message.id,
-                'content': user_message.content,
-                'timestamp': user_message.timestamp.isoformat()
-            },
-            'ai_response': {
-                'id': ai_message.id,
-                'content': ai_message.content,
-                'timestamp': ai_message.timestamp.isoformat(),
-                'audio_url': ai_message.audio_file.url if ai_message.audio_file else None,
-                'audio_data': {
-                    'base64': audio_base64,
-                    'mime_type': tts_result.get('mime_type') if tts_result else None,
-                    'voice_name': tts_result.get('voice_name') if tts_result else (voice_name or 'Leda')
-                } if audio_base64 else None
-            },
-            'evaluation': evaluation_data
-        }
+        return await complete_turn(
+            user, session, user_message, ai_response,
+            voice_name=voice_name, audio_delivery=audio_delivery,
+        )
         
     except Exception as e:
         logger.error(f"❌ Error en process_message_async: {str(e)}")
         raise e
 
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def send_message(request):
+def sse_event(event, data):
+    """Formatea un evento server-sent events con datos JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@async_api_view(['POST'])
+async def send_message(request):
     """
     💬 PROPÓSITO: API para enviar mensajes al chat
     📝 QUÉ HACE: Recibe mensaje del usuario, lo envía a Gemini, guarda respuesta
-    ✅ CAMBIO: Ya no necesita API key del usuario
+    ⚡ CAMBIO: Vista ASGI nativa; no crea un event loop por petición ni retiene un hilo
     """
     try:
-        message = request.data.get('message', '').strip()
+        message = (request.data.get('message') or '').strip()
         session_id = request.data.get('session_id')
         voice_name = request.data.get('voice_name') or 'Leda'
+        audio_delivery = request.data.get('audio_delivery') or 'queued'
         
         if not message:
-            return Response({'error': 'Mensaje vacío'}, status=status.HTTP_400_BAD_REQUEST)
+            return JsonResponse({'error': 'Mensaje vacío'}, status=status.HTTP_400_BAD_REQUEST)
         
         if not session_id:
-            return Response({'error': 'ID de sesión requerido'}, status=status.HTTP_400_BAD_REQUEST)
+            return JsonResponse({'error': 'ID de sesión requerido'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Procesar mensaje de forma asíncrona
+        # Procesar mensaje en el event loop del servidor
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            result = loop.run_until_complete(
-                process_message_async(request.user, message, session_id, voice_name=voice_name)
+            result = await process_message_async(
+                request.user, message, session_id,
+                voice_name=voice_name, audio_delivery=audio_delivery,
             )
-            loop.close()
-            
-            return Response(result)
+            return JsonResponse(result)
             
         except Exception as e:
-            return Response({
+            return JsonResponse({
                 'error': f'Error generando respuesta: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
     except Exception as e:
-        return Response({
+        return JsonResponse({
             'error': f'Error procesando solicitud: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@async_api_view(['POST'])
+async def send_message_stream(request):
+    """
+    🌊 PROPÓSITO: Igual que send_message pero enviando la respuesta token a token (SSE)
+    📝 QUÉ HACE: Emite eventos `start`, `token` (texto parcial) y `done` (resultado completo);
+    el ChatMessage de la IA se guarda al terminar el stream
+    """
+    message = (request.data.get('message') or '').strip()
+    session_id = request.data.get('session_id')
+    voice_name = request.data.get('voice_name') or 'Leda'
+    audio_delivery = request.data.get('audio_delivery') or 'queued'
+
+    if not message:
+        return JsonResponse({'error': 'Mensaje vacío'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not session_id:
+        return JsonResponse({'error': 'ID de sesión requerido'}, status=status.HTTP_400_BAD_REQUEST)
+
+    user = request.user
+    try:
+        session, user_message, conversation_history, questions_asked = await prepare_turn(user, message, session_id)
+    except InterviewSession.DoesNotExist:
+        return JsonResponse({'error': 'Sesión no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+
+    async def event_stream():
+        yield sse_event('start', {
+            'session_id': session.id,
+            'user_message': {
+                'id': user_message.id,
+                'content': user_message.content,
+                'timestamp': user_message.timestamp.isoformat()
+            }
+        })
+        tokens = get_gemini_service().generate_response_stream(
+            message=message,
+            conversation_history=conversation_history,
+            interview_type=session.session_type,
+            questions_asked=questions_asked,
+        )
+        try:
+            parts = []
+            try:
+                async for text in tokens:
+                    parts.append(text)
+                    yield sse_event('token', {'text': text})
+            finally:
+                # También si el cliente se desconecta: el hilo deja de leer el stream del modelo
+                await tokens.aclose()
+
+            ai_response = ''.join(parts).strip() or 'Error procesando respuesta de IA'
+            result = await complete_turn(
+                user, session, user_message, ai_response,
+                voice_name=voice_name, audio_delivery=audio_delivery,
+            )
+            yield sse_event('done', result)
+        except Exception as e:
+            logger.error(f"❌ Error en send_message_stream: {str(e)}")
+            yield sse_event('error', {'error': f'Error generando respuesta: {str(e)}'})
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Evita que proxies como nginx acumulen el stream antes de enviarlo
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_sessions(request):
     """
-    📋 PROPÓSITO: API para obtener lista de sesiones del usuario
+    📋 PROPÓSITO: API para obtener lista de sesiones del usuario (paginada)
+    📝 QUÉ HACE: Una consulta por página: conteo de mensajes, estado y puntaje de la
+    evaluación vienen como anotaciones. Paginación por cursor (?cursor=&limit=) y
+    ETag/If-None-Match para que el sidebar pueda consultar sin descargar de nuevo.
     """
-    sessions = InterviewSession.objects.filter(user=request.user)
-    
+    try:
+        limit = page_size(request)
+        sessions = keyset_before(
+            InterviewSession.objects.filter(user=request.user), 'created_at', request.GET.get('cursor')
+        )
+    except ValueError as e:
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = list(
+        sessions.order_by('-created_at', '-id')
+        .values(
+            'id', 'title', 'session_type', 'created_at', 'is_completed', 'questions_asked',
+            evaluation_score=F('feedback_report__average_score'),
+            performance_level=F('feedback_report__performance_level'),
+        )
+        .annotate(message_count=Count('messages'))[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
     sessions_data = []
-    for session in sessions:
+    for row in rows:
+        # Los reportes provisionales del temporizador no tienen nivel: aún no hay evaluación
+        evaluated = bool(row['performance_level'])
         sessions_data.append({
-            'id': session.id,
-            'title': session.title,
-            'session_type': session.session_type,
-            'created_at': session.created_at.isoformat(),
-            'message_count': session.messages.count()
+            'id': row['id'],
+            'title': row['title'],
+            'session_type': row['session_type'],
+            'created_at': row['created_at'].isoformat(),
+            'message_count': row['message_count'],
+            'questions_asked': row['questions_asked'],
+            'is_completed': row['is_completed'],
+            'evaluation_score': round(row['evaluation_score'], 2) if evaluated else None,
+            'performance_level': row['performance_level'] if evaluated else None,
         })
-    
-    return Response({'sessions': sessions_data})
+
+    payload = {
+        'sessions': sessions_data,
+        'has_more': has_more,
+        'next_cursor': encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more else None,
+    }
+    etag = json_etag(payload)
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if etag_matches(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(payload, headers=headers)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_session_messages(request, session_id):
     """
-    💬 PROPÓSITO: API para obtener mensajes de una sesión específica
+    💬 PROPÓSITO: API para obtener mensajes de una sesión específica (paginada)
+    📝 QUÉ HACE: Sin cursor devuelve la última página; ?after_id= solo los mensajes
+    nuevos y ?before_id= la página anterior (siempre en orden cronológico).
+    Proyección values() sin instanciar modelos y ETag/If-None-Match (304).
     """
-    session = get_object_or_404(InterviewSession, id=session_id, user=request.user)
-    messages = session.messages.all()
-    
-    messages_data = []
-    for message in messages:
-        messages_data.append({
-            'id': message.id,
-            'is_user': message.is_user,
-            'content': message.content,
-            'timestamp': message.timestamp.isoformat()
-            ,
-            'audio_url': message.audio_file.url if message.audio_file else None,
-            'tts_voice': message.tts_voice if hasattr(message, 'tts_voice') else None
-        })
-    
-    return Response({
-        'session': {
-            'id': session.id,
-            'title': session.title,
-            'session_type': session.session_type,
-        },
-        'messages': messages_data
-    })
+    session = InterviewSession.objects.filter(id=session_id, user=request.user).values(
+        'id', 'title', 'session_type'
+    ).first()
+    if session is None:
+        raise Http404("Sesión no encontrada")
+
+    try:
+        limit = page_size(request, default=MESSAGES_PAGE_SIZE)
+        after_id = int(request.GET['after_id']) if request.GET.get('after_id') else None
+        before_id = int(request.GET['before_id']) if request.GET.get('before_id') else None
+    except ValueError:
+        return Response({'success': False, 'error': 'Parámetros de paginación inválidos'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    messages = ChatMessage.objects.filter(session_id=session_id).values(
+        'id', 'is_user', 'content', 'timestamp', 'audio_file', 'tts_voice', 'tts_status'
+    )
+    if after_id is not None:
+        # Mensajes nuevos: ascendente desde el cursor
+        rows = list(messages.filter(id__gt=after_id).order_by('id')[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+    else:
+        # Última página (o la anterior a before_id): descendente y luego se invierte
+        if before_id is not None:
+            messages = messages.filter(id__lt=before_id)
+        rows = list(messages.order_by('-id')[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit][::-1]
+
+    messages_data = [
+        {
+            'id': row['id'],
+            'is_user': row['is_user'],
+            'content': row['content'],
+            'timestamp': row['timestamp'].isoformat(),
+            'audio_url': (
+                reverse('interview_trainer_api:api_get_message_audio', args=[row['id']]) if row['audio_file'] else None
+            ),
+            'tts_voice': row['tts_voice'],
+            'tts_status': row['tts_status'],
+        }
+        for row in rows
+    ]
+
+    payload = {
+        'session': session,
+        'messages': messages_data,
+        # after_id: quedan más mensajes nuevos; si no, quedan mensajes anteriores
+        'has_more': has_more,
+        'first_id': rows[0]['id'] if rows else before_id,
+        'last_id': rows[-1]['id'] if rows else after_id,
+    }
+    etag = json_etag(payload)
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if etag_matches(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(payload, headers=headers)
 
 
 @api_view(['GET'])
@@ -313,13 +452,232 @@ def get_message(request, message_id):
             'is_user': message.is_user,
             'content': message.content,
             'timestamp': message.timestamp.isoformat(),
-            'audio_url': message.audio_file.url if message.audio_file else None,
-            'tts_voice': message.tts_voice if hasattr(message, 'tts_voice') else None
+            'audio_url': message_audio_url(message),
+            'tts_voice': message.tts_voice if hasattr(message, 'tts_voice') else None,
+            'tts_status': message.tts_status
         })
     except Exception as e:
         logger.exception('Error en get_message: %s', e)
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+AUDIO_CHUNK_SIZE = 64 * 1024
+
+def _parse_range(header, size):
+    """
+    Interpreta un Range de un solo tramo. Devuelve (inicio, fin) inclusivos,
+    None si no aplica (sin cabecera o multi-rango) o False si no es satisfacible.
+    """
+    match = _RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Sufijo: los últimos N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _iter_file_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(AUDIO_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+@require_http_methods(['GET', 'HEAD'])
+def get_message_audio(request, message_id):
+    """
+    🔊 PROPÓSITO: Sirve el audio TTS de un mensaje
+    📝 QUÉ HACE: Soporta peticiones Range (206) para que el navegador empiece a
+    reproducir y pueda saltar sin descargar todo, y ETag/If-None-Match (304).
+    Sirve la variante pedida (?format=ogg|mp3|wav o Accept) si existe; si no, el WAV.
+    Un ?format= que no se puede cumplir responde 406 en lugar de otro formato
+    ⚠️  IMPORTANTE: El audio de un mensaje no cambia nunca, así que se marca como
+    inmutable en la caché privada del navegador
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'detail': 'Las credenciales de autenticación no se proveyeron.'}, status=403)
+
+    message = get_object_or_404(ChatMessage, id=message_id, session__user=request.user)
+    if not message.audio_file:
+        raise Http404('El mensaje no tiene audio')
+    try:
+        path, encoder = negotiate_variant(
+            message.audio_file.path,
+            requested=request.GET.get('format'),
+            accept=request.headers.get('Accept', ''),
+        )
+        stat = os.stat(path)
+    except VariantNotAvailable:
+        return JsonResponse({'detail': f"El audio no está disponible en formato {request.GET.get('format')}."}, status=406)
+    except (NotImplementedError, FileNotFoundError):
+        raise Http404('Audio no disponible')
+
+    size = stat.st_size
+    # Sin mtime: los hardlinks comparten inodo con la caché TTS, que lo toca en cada acierto
+    name_hash = zlib.crc32(os.path.basename(path).encode())
+    etag = f'"{message.id}-{encoder.format}-{size:x}-{name_hash:08x}"'
+    headers = {
+        'ETag': etag,
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': 'private, max-age=31536000, immutable',
+        'Vary': 'Accept',
+    }
+
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+        for key, value in headers.items():
+            response[key] = value
+        return response
+
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    byte_range = None
+    # If-Range: si el archivo cambió desde que el cliente empezó, se envía completo
+    if request.headers.get('If-Range', etag) == etag:
+        byte_range = _parse_range(request.headers.get('Range'), size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        body = [] if request.method == 'HEAD' else _iter_file_range(path, start, length)
+        response = StreamingHttpResponse(body, status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(length)
+    elif request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = str(size)
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+
+    for key, value in headers.items():
+        response[key] = value
+    return response
+
+def _audio_redirect(message, request):
+    url = message_audio_url(message)
+    if request.META.get('QUERY_STRING'):
+        url = f"{url}?{request.META['QUERY_STRING']}"
+    return HttpResponseRedirect(url)
+
+def _save_streamed_tts(message_id, text, voice_name, audio_chunks, mime_type):
+    """Persiste el audio recibido por streaming y marca el mensaje como listo"""
+    tts = get_gemini_service().persist_tts_audio(text, voice_name, audio_chunks, mime_type)
+    attach_streamed_tts(ChatMessage.objects.get(id=message_id), tts, voice_name)
+
+def _release_tts(message_id):
+    """Suelta el claim del mensaje: otra petición (o la tarea) podrá sintetizarlo"""
+    ChatMessage.objects.filter(id=message_id, tts_status='processing').update(tts_status='pending')
+
+def _requeue_tts(message_id, voice_name):
+    """La síntesis por streaming falló: se completa en segundo plano"""
+    _release_tts(message_id)
+    dispatch_task(generate_and_save_tts, message_id, voice_name=voice_name)
+
+@async_api_view(['GET'])
+async def stream_message_audio(request, message_id):
+    """
+    🌊 PROPÓSITO: Reproduce el audio TTS de un mensaje mientras Gemini lo sintetiza
+    📝 QUÉ HACE: Reenvía cada fragmento PCM en cuanto llega, detrás de una cabecera WAV
+    progresiva (tamaño máximo), así el audio empieza a sonar en pocos cientos de ms.
+    Al terminar guarda el archivo completo (caché TTS + chat_audio) y marca el mensaje
+    como listo; las variantes comprimidas (ffmpeg) se generan en segundo plano para no
+    ocupar el hilo síncrono compartido. Si el audio ya existe, redirige al endpoint normal.
+    ⚠️  IMPORTANTE: Solo un trabajador sintetiza cada mensaje (claim_tts); si la tarea
+    en segundo plano ya lo está haciendo se responde 409 y el cliente consulta el estado.
+    Si el cliente se desconecta se deja de sintetizar y el mensaje vuelve a 'pending' sin
+    encolar nada; solo un error real de síntesis relanza la tarea en segundo plano
+    """
+    try:
+        message = await ChatMessage.objects.aget(id=message_id, session__user=request.user, is_user=False)
+    except ChatMessage.DoesNotExist:
+        return JsonResponse({'error': 'Mensaje no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+    if message.audio_file:
+        return _audio_redirect(message, request)
+
+    if not await sync_to_async(claim_tts)(message.id):
+        return JsonResponse({
+            'tts_status': message.tts_status,
+            'status_url': reverse('interview_trainer_api:api_get_message', args=[message.id]),
+        }, status=status.HTTP_409_CONFLICT)
+
+    gemini = get_gemini_service()
+    voice_name = message.tts_voice or 'Zephyr'
+    text = message.content
+
+    # Frases ya sintetizadas: no hace falta streaming
+    cached = await sync_to_async(gemini.cached_tts_audio, thread_sensitive=False)(text, voice_name)
+    if cached:
+        await sync_to_async(attach_streamed_tts)(message, cached, voice_name)
+        return _audio_redirect(message, request)
+
+    async def audio_stream():
+        audio_chunks = []
+        mime_type = None
+        completed = False
+        disconnected = False
+        chunks = gemini._stream_blocking(gemini.iter_tts_chunks, text, voice_name)
+        try:
+            async for data, chunk_mime in chunks:
+                if mime_type is None:
+                    mime_type = chunk_mime
+                    if 'audio/L' in mime_type:
+                        yield gemini.wav_header(mime_type)
+                audio_chunks.append(data)
+                yield data
+            completed = bool(audio_chunks)
+        except (asyncio.CancelledError, GeneratorExit):
+            # El cliente se fue: nadie va a escuchar este audio
+            disconnected = True
+            raise
+        except Exception as e:
+            logger.error(f"❌ Error en streaming TTS del mensaje {message.id}: {str(e)}")
+        finally:
+            # Corta el hilo productor: deja de leer el stream de Gemini
+            await chunks.aclose()
+            try:
+                if completed:
+                    await sync_to_async(_save_streamed_tts)(message.id, text, voice_name, audio_chunks, mime_type)
+                elif disconnected:
+                    await sync_to_async(_release_tts)(message.id)
+                else:
+                    await sync_to_async(_requeue_tts)(message.id, voice_name)
+            except Exception as e:
+                logger.exception(f"❌ No se pudo guardar el audio del mensaje {message.id}: {str(e)}")
+                await ChatMessage.objects.filter(id=message.id).aupdate(tts_status='failed')
+
+    response = StreamingHttpResponse(audio_stream(), content_type='audio/wav')
+    response['Cache-Control'] = 'no-store'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_tts_cache_metrics(request):
+    """
+    📊 PROPÓSITO: Métricas de la caché de audio TTS (solo staff)
+    """
+    return Response({'success': True, 'metrics': tts_cache.stats()})
+
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def delete_session(request, session_id):
@@ -327,21 +685,21 @@ def delete_session(request, session_id):
     🗑️ PROPÓSITO: API para eliminar una sesión específica
     """
     try:
-        session = get_object_or_404(InterviewSession, id=session_id, user=request.user)
-        
-        # Guardar información antes de eliminar
+        session = get_object_or_404(InterviewSession.objects.only('id', 'title'), id=session_id, user=request.user)
         session_title = session.title
-        messages_count = session.messages.count()
-        
-        # Eliminar sesión (CASCADE eliminará mensajes automáticamente)
-        session.delete()
+
+        # Borrado por lotes; los audios se eliminan en segundo plano
+        deleted = delete_user_sessions(request.user, [session.id])
+        invalidate_user_data(request.user.id)
         
         return Response({
             'success': True,
             'message': f'Sesión "{session_title}" eliminada exitosamente',
-            'deleted_messages': messages_count
+            'deleted_messages': deleted['messages']
         })
         
+    except Http404:
+        raise
     except Exception as e:
         return Response({
             'success': False,
@@ -363,23 +721,15 @@ def delete_sessions_bulk(request):
                 'error': 'No se proporcionaron IDs de sesiones'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Filtrar solo las sesiones del usuario
-        sessions = InterviewSession.objects.filter(
-            id__in=session_ids, 
-            user=request.user
-        )
-        
-        deleted_count = sessions.count()
-        total_messages = sum(session.messages.count() for session in sessions)
-        
-        # Eliminar sesiones
-        sessions.delete()
+        # Solo sesiones del usuario; conteo con un aggregate y borrado por lotes
+        deleted = delete_user_sessions(request.user, session_ids)
+        invalidate_user_data(request.user.id)
         
         return Response({
             'success': True,
-            'message': f'Se eliminaron {deleted_count} sesiones y {total_messages} mensajes',
-            'deleted_sessions': deleted_count,
-            'deleted_messages': total_messages
+            'message': f"Se eliminaron {deleted['sessions']} sesiones y {deleted['messages']} mensajes",
+            'deleted_sessions': deleted['sessions'],
+            'deleted_messages': deleted['messages']
         })
         
     except Exception as e:
@@ -395,18 +745,14 @@ def delete_all_sessions(request):
     🗑️ PROPÓSITO: API para eliminar TODAS las sesiones del usuario
     """
     try:
-        sessions = InterviewSession.objects.filter(user=request.user)
-        total_sessions = sessions.count()
-        total_messages = sum(session.messages.count() for session in sessions)
-        
-        # Eliminar todas las sesiones
-        sessions.delete()
+        deleted = delete_user_sessions(request.user)
+        invalidate_user_data(request.user.id)
         
         return Response({
             'success': True,
-            'message': f'Se eliminaron {total_sessions} sesiones y {total_messages} mensajes',
-            'deleted_sessions': total_sessions,
-            'deleted_messages': total_messages
+            'message': f"Se eliminaron {deleted['sessions']} sesiones y {deleted['messages']} mensajes",
+            'deleted_sessions': deleted['sessions'],
+            'deleted_messages': deleted['messages']
         })
         
     except Exception as e:
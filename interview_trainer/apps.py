@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
 
 
 class InterviewTrainerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'interview_trainer'
+
+    def ready(self):
+        from .db import configure_sqlite
+        from .tasks import start_local_worker
+        connection_created.connect(configure_sqlite, dispatch_uid='interview_trainer.configure_sqlite')
+        request_started.connect(start_local_worker, dispatch_uid='interview_trainer.start_local_worker')
@@ -0,0 +1,194 @@
+import logging
+import os
+import shutil
+import subprocess
+import uuid
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AudioEncoder:
+    """
+    🎚️ PROPÓSITO: Etapa de codificación del audio TTS (interfaz común)
+    📝 QUÉ HACE: Convierte el WAV sintetizado en otro formato y lo guarda junto a él,
+    con el mismo nombre base y otra extensión (respuesta_1.wav -> respuesta_1.ogg)
+    """
+    format = 'wav'
+    ext = '.wav'
+    mime_type = 'audio/wav'
+
+    def available(self):
+        return True
+
+    def variant_path(self, source_path):
+        return os.path.splitext(source_path)[0] + self.ext
+
+    def encode(self, source_path):
+        """Codifica source_path y devuelve la ruta del archivo resultante (o None si falla)."""
+        return source_path
+
+
+class FfmpegEncoder(AudioEncoder):
+    """
+    🎛️ PROPÓSITO: Codificador comprimido usando el binario local de ffmpeg
+    ⚠️  IMPORTANTE: Si ffmpeg no está instalado el encoder queda no disponible
+    y el audio se sirve solo en WAV
+    """
+
+    def __init__(self, format, ext, mime_type, muxer, codec_args):
+        self.format = format
+        self.ext = ext
+        self.mime_type = mime_type
+        self.muxer = muxer
+        self.codec_args = list(codec_args)
+
+    @property
+    def binary(self):
+        return shutil.which(getattr(settings, 'FFMPEG_BINARY', 'ffmpeg'))
+
+    def available(self):
+        return self.binary is not None
+
+    def encode(self, source_path):
+        binary = self.binary
+        if binary is None:
+            return None
+
+        dest_path = self.variant_path(source_path)
+        tmp_path = f"{dest_path}.{uuid.uuid4().hex}.tmp"
+        command = [
+            binary, '-hide_banner', '-loglevel', 'error', '-nostdin', '-y',
+            '-i', source_path,
+            *self.codec_args,
+            '-f', self.muxer, tmp_path,
+        ]
+        try:
+            subprocess.run(
+                command,
+                check=True,
+                capture_output=True,
+                timeout=getattr(settings, 'TTS_ENCODE_TIMEOUT', 30),
+            )
+            os.replace(tmp_path, dest_path)
+            return dest_path
+        except (OSError, subprocess.SubprocessError) as exc:
+            stderr = getattr(exc, 'stderr', b'') or b''
+            logger.warning(f"⚠️ Falló la codificación {self.format} de {source_path}: {exc} {stderr[-300:]!r}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+
+
+WAV_ENCODER = AudioEncoder()
+
+
+class VariantNotAvailable(LookupError):
+    """El cliente pidió un formato (?format=) que no existe para este audio."""
+
+# 🗂️ Registro de encoders: voz mono a 24 kHz, bitrates pensados para habla
+ENCODERS = {
+    'ogg': FfmpegEncoder(
+        'ogg', '.ogg', 'audio/ogg', 'ogg',
+        ['-ac', '1', '-c:a', 'libopus', '-b:a', '24k', '-application', 'voip'],
+    ),
+    'mp3': FfmpegEncoder(
+        'mp3', '.mp3', 'audio/mpeg', 'mp3',
+        ['-ac', '1', '-c:a', 'libmp3lame', '-b:a', '48k'],
+    ),
+    'wav': WAV_ENCODER,
+}
+
+
+def get_encoder(format):
+    return ENCODERS.get(format)
+
+
+def configured_formats():
+    """Formatos comprimidos a generar (TTS_AUDIO_FORMATS), en orden de preferencia."""
+    return [fmt for fmt in getattr(settings, 'TTS_AUDIO_FORMATS', []) if fmt in ENCODERS and fmt != 'wav']
+
+
+def keeps_wav():
+    """
+    True si el WAV se conserva como respaldo junto a las variantes comprimidas
+    ('wav' en TTS_AUDIO_FORMATS, como en la configuración por defecto).
+    """
+    return 'wav' in getattr(settings, 'TTS_AUDIO_FORMATS', [])
+
+
+def encoder_for_path(path):
+    """Encoder correspondiente a la extensión del archivo (WAV si no se reconoce)."""
+    ext = os.path.splitext(path)[1].lower()
+    return next((encoder for encoder in ENCODERS.values() if encoder.ext == ext), WAV_ENCODER)
+
+
+def preferred_format(formats):
+    """
+    Primer formato de TTS_AUDIO_FORMATS presente en `formats`. None si no hay ninguno o
+    si 'wav' va antes en la lista: en ambos casos el mensaje sigue apuntando al WAV.
+    """
+    for fmt in getattr(settings, 'TTS_AUDIO_FORMATS', []):
+        if fmt == 'wav':
+            return None
+        if fmt in formats:
+            return fmt
+    return None
+
+
+def encode_variants(source_path):
+    """
+    🎚️ PROPÓSITO: Genera las variantes comprimidas configuradas de un WAV
+    📝 QUÉ HACE: Corre en segundo plano (nunca en la petición) y solo codifica las
+    variantes que aún no existen junto al WAV, así un audio se codifica una sola vez.
+    Devuelve {formato: ruta} de todas las variantes disponibles.
+    """
+    variants, created = {}, []
+    for fmt in configured_formats():
+        encoder = ENCODERS[fmt]
+        path = encoder.variant_path(source_path)
+        if os.path.exists(path):
+            variants[fmt] = path
+            continue
+        if not encoder.available():
+            continue
+        path = encoder.encode(source_path)
+        if path:
+            variants[fmt] = path
+            created.append(fmt)
+    if created:
+        original = os.path.getsize(source_path)
+        sizes = ', '.join(f"{fmt}={os.path.getsize(variants[fmt])}" for fmt in created)
+        logger.info(f"🎚️ Audio codificado ({os.path.basename(source_path)}): wav={original}, {sizes}")
+    return variants
+
+
+def negotiate_variant(source_path, requested=None, accept=''):
+    """
+    🤝 PROPÓSITO: Elige qué variante servir a un cliente
+    📝 QUÉ HACE: Prioridad: ?format= explícito, luego tipos audio/* explícitos en Accept
+    (en el orden de TTS_AUDIO_FORMATS); si ninguna existe en disco, el WAV (lo reproduce
+    cualquier cliente) y si tampoco está, el archivo guardado del mensaje.
+    Devuelve (ruta, encoder).
+    ⚠️  IMPORTANTE: Un ?format= explícito nunca recibe otro formato comprimido en su lugar:
+    si no existe ni la variante ni el WAV se lanza VariantNotAvailable (406)
+    """
+    candidates = []
+    if requested:
+        candidates.append(requested)
+    accepted = {part.split(';')[0].strip().lower() for part in (accept or '').split(',')}
+    candidates.extend(fmt for fmt, encoder in ENCODERS.items() if encoder.mime_type in accepted)
+
+    for fmt in [*candidates, WAV_ENCODER.format]:
+        encoder = ENCODERS.get(fmt)
+        if encoder is None:
+            continue
+        path = encoder.variant_path(source_path)
+        if os.path.exists(path):
+            return path, encoder
+
+    encoder = encoder_for_path(source_path)
+    if requested and encoder.format != requested:
+        raise VariantNotAvailable(requested)
+    return source_path, encoder
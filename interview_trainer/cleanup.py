@@ -0,0 +1,104 @@
+import logging
+import os
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .audio_encoding import ENCODERS
+from .models import ChatMessage, InterviewSession
+from .tasks import delete_media_files, dispatch_task
+
+logger = logging.getLogger(__name__)
+
+# Sesiones por lote al borrar: acota el tamaño de cada IN (...) y de cada transacción
+SESSION_DELETE_BATCH = 500
+
+# Carpetas de MEDIA_ROOT con audio TTS asociado (o asociable) a mensajes
+AUDIO_DIRS = ('chat_audio', 'tts')
+
+
+def audio_file_names(name):
+    """Nombre del audio de un mensaje más sus variantes comprimidas (.ogg, .mp3, ...)."""
+    stem = os.path.splitext(name)[0]
+    return [name] + sorted({stem + encoder.ext for encoder in ENCODERS.values()} - {name})
+
+
+def delete_user_sessions(user, session_ids=None):
+    """
+    🗑️ PROPÓSITO: Elimina sesiones de un usuario sin cargar sus mensajes en memoria
+    📝 QUÉ HACE: Cuenta mensajes con un único aggregate, borra por lotes con DELETE
+    ... WHERE session_id IN (...) y manda el borrado de los audios a segundo plano.
+    Si se borraron sesiones evaluadas, reconstruye las analytics y el ranking del usuario.
+    Devuelve {'sessions': n, 'messages': m}.
+    """
+    sessions = InterviewSession.objects.filter(user=user)
+    if session_ids is not None:
+        sessions = sessions.filter(id__in=session_ids)
+
+    ids = list(sessions.values_list('id', flat=True))
+    if not ids:
+        return {'sessions': 0, 'messages': 0}
+
+    selected = InterviewSession.objects.filter(id__in=ids)
+    totals = selected.aggregate(
+        messages=Count('messages'),
+        evaluated=Count('feedback_report', filter=~Q(feedback_report__performance_level=''), distinct=True),
+    )
+    audio_names = list(
+        ChatMessage.objects.filter(session_id__in=ids)
+        .exclude(audio_file='').exclude(audio_file__isnull=True)
+        .values_list('audio_file', flat=True)
+    )
+
+    for start in range(0, len(ids), SESSION_DELETE_BATCH):
+        # Sin receivers de borrado en estos modelos, Django borra cada tabla
+        # relacionada con un solo DELETE por lote (sin instanciar filas)
+        InterviewSession.objects.filter(id__in=ids[start:start + SESSION_DELETE_BATCH]).delete()
+
+    if audio_names:
+        dispatch_task(delete_media_files, audio_names)
+
+    if totals['evaluated']:
+        from evaluation.analytics import rebuild_role_leaderboard, rebuild_user_analytics
+        rebuild_user_analytics(user.id)
+        rebuild_role_leaderboard(user.id)
+
+    logger.info(f"🗑️ {len(ids)} sesiones y {totals['messages']} mensajes eliminados (usuario {user.id})")
+    return {'sessions': len(ids), 'messages': totals['messages']}
+
+
+def _walk_storage(directory):
+    try:
+        subdirs, files = default_storage.listdir(directory)
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    for filename in files:
+        yield f"{directory}/{filename}"
+    for subdir in subdirs:
+        yield from _walk_storage(f"{directory}/{subdir}")
+
+
+def find_orphan_audio(min_age=timedelta(hours=24)):
+    """
+    🔍 PROPÓSITO: Audios en chat_audio/ y tts/ que ningún mensaje referencia
+    📝 QUÉ HACE: Compara los archivos (y sus variantes por nombre base) con los
+    audio_file de ChatMessage. Solo considera archivos más viejos que min_age para no
+    tocar audios que se están guardando en este momento.
+    """
+    referenced = {
+        os.path.splitext(name)[0]
+        for name in ChatMessage.objects.exclude(audio_file='').exclude(audio_file__isnull=True)
+        .values_list('audio_file', flat=True).iterator()
+    }
+    cutoff = timezone.now() - min_age
+    orphans = []
+    for directory in AUDIO_DIRS:
+        for name in _walk_storage(directory):
+            if os.path.splitext(name)[0] in referenced:
+                continue
+            if default_storage.get_modified_time(name) > cutoff:
+                continue
+            orphans.append(name)
+    return orphans
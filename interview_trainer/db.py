@@ -0,0 +1,17 @@
+from django.conf import settings
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    🗄️ PROPÓSITO: Ajustes de SQLite para escrituras concurrentes (turnos del chat,
+    evaluaciones y ticks del temporizador al mismo tiempo)
+    📝 QUÉ HACE: Al abrir cada conexión activa WAL (los lectores no bloquean al escritor),
+    synchronous=NORMAL (seguro con WAL) y el busy_timeout configurado
+    """
+    if connection.vendor != 'sqlite' or not getattr(settings, 'SQLITE_WAL', True):
+        return
+    timeout_ms = int(connection.settings_dict.get('OPTIONS', {}).get('timeout', 5) * 1000)
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={timeout_ms}')
@@ -0,0 +1,64 @@
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import JsonResponse
+
+
+async def ais_authenticated(request):
+    """
+    🔐 PROPÓSITO: Resuelve request.user desde una vista async
+    📝 QUÉ HACE: La carga del usuario toca la sesión/DB, así que se hace en un hilo;
+    después request.user queda cacheado y puede usarse sin más consultas
+    """
+    return await sync_to_async(lambda: request.user.is_authenticated)()
+
+
+def async_api_view(http_method_names):
+    """
+    ⚡ PROPÓSITO: Equivalente async de @api_view + IsAuthenticated para vistas ASGI nativas
+    📝 QUÉ HACE: Valida método y autenticación, y expone el cuerpo JSON en request.data
+    ⚠️  IMPORTANTE: DRF 3.14 no soporta vistas async; el CSRF lo aplica CsrfViewMiddleware
+    """
+    allowed = [method.upper() for method in http_method_names]
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in allowed:
+                return JsonResponse(
+                    {'detail': f'Método "{request.method}" no permitido.'},
+                    status=405,
+                    headers={'Allow': ', '.join(allowed)},
+                )
+
+            if not await ais_authenticated(request):
+                return JsonResponse(
+                    {'detail': 'Las credenciales de autenticación no se proveyeron.'},
+                    status=403,
+                )
+
+            if request.content_type == 'application/json' and request.body:
+                try:
+                    request.data = json.loads(request.body)
+                except ValueError:
+                    return JsonResponse({'error': 'JSON inválido'}, status=400)
+            else:
+                request.data = request.POST
+
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def async_login_required(view):
+    """
+    🔐 PROPÓSITO: Equivalente async de @login_required (Django 4.2 solo lo trae síncrono)
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if not await ais_authenticated(request):
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,32 @@
+import logging
+
+from django.db.models.functions import Left
+
+from .models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+# Mensajes de contexto que usa el prompt y longitud a la que se recortan
+HISTORY_WINDOW = 6
+HISTORY_SNIPPET_CHARS = 150
+
+
+async def aget_history_window(session_id, exclude_id=None, size=HISTORY_WINDOW):
+    """
+    🪟 PROPÓSITO: Últimos mensajes de la sesión para el prompt de Gemini
+    📝 QUÉ HACE: Una consulta con LIMIT sobre values(); el contenido ya viene recortado
+    desde la DB (un carácter de más para saber si hay que añadir '...')
+    ⚠️  IMPORTANTE: El coste por turno es constante aunque la sesión crezca
+    """
+    queryset = ChatMessage.objects.filter(session_id=session_id)
+    if exclude_id is not None:
+        queryset = queryset.exclude(id=exclude_id)
+    rows = [
+        row async for row in queryset
+        .annotate(snippet=Left('content', HISTORY_SNIPPET_CHARS + 1))
+        .order_by('-timestamp', '-id')
+        .values('is_user', 'snippet')[:size]
+    ]
+    rows.reverse()
+    return [{'is_user': row['is_user'], 'content': row['snippet']} for row in rows]
+
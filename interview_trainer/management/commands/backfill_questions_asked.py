@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from interview_trainer.models import CLOSING_MESSAGE_MARKER, ChatMessage, InterviewSession
+
+
+class Command(BaseCommand):
+    help = 'Recalcula InterviewSession.questions_asked a partir de los mensajes guardados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--session-id', type=int, help='Recalcular solo esta sesión')
+        parser.add_argument('--dry-run', action='store_true', help='Mostrar cambios sin guardarlos')
+
+    def handle(self, *args, **options):
+        # Preguntas = mensajes de IA que no son el mensaje de cierre (misma regla que ChatMessage.save)
+        questions = (
+            ChatMessage.objects
+            .filter(session=OuterRef('pk'), is_user=False)
+            .exclude(content__icontains=CLOSING_MESSAGE_MARKER)
+            .values('session')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        expected = Coalesce(Subquery(questions, output_field=IntegerField()), Value(0))
+
+        sessions = InterviewSession.objects.all()
+        if options.get('session_id'):
+            sessions = sessions.filter(id=options['session_id'])
+
+        stale = sessions.annotate(expected=expected).exclude(questions_asked=expected)
+        total = stale.count()
+        self.stdout.write(f"🔢 Sesiones con contador desactualizado: {total}")
+
+        if options['dry_run']:
+            for session in stale.values('id', 'questions_asked', 'expected')[:50]:
+                self.stdout.write(f"   ID {session['id']}: {session['questions_asked']} -> {session['expected']}")
+            return
+
+        # Un único UPDATE ... SET questions_asked = (subconsulta) para todas las sesiones
+        updated = sessions.filter(id__in=stale.values('id')).update(questions_asked=expected)
+        self.stdout.write(self.style.SUCCESS(f"✅ {updated} sesiones actualizadas"))
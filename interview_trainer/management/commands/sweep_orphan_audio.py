@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from interview_trainer.cleanup import find_orphan_audio
+from interview_trainer.tasks import delete_media_files
+
+
+class Command(BaseCommand):
+    help = 'Elimina audios de chat_audio/ y tts/ que ya no pertenecen a ningún mensaje'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age-hours', type=float, default=24,
+                            help='Solo archivos sin modificar durante al menos este tiempo')
+        parser.add_argument('--dry-run', action='store_true', help='Listar archivos sin borrarlos')
+
+    def handle(self, *args, **options):
+        orphans = find_orphan_audio(min_age=timedelta(hours=options['min_age_hours']))
+        self.stdout.write(f"🔍 Audios huérfanos: {len(orphans)}")
+
+        if options['dry_run']:
+            for name in orphans:
+                self.stdout.write(f"  - {name}")
+            return
+
+        result = delete_media_files(orphans)
+        self.stdout.write(self.style.SUCCESS(f"🧹 Archivos eliminados: {result['removed']}"))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interview_trainer', '0006_interviewsession_end_time_interviewsession_is_paused_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='tts_status',
+            field=models.CharField(blank=True, choices=[('', 'Sin audio'), ('pending', 'Pendiente'), ('ready', 'Listo'), ('failed', 'Fallido')], default='', max_length=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interview_trainer', '0007_chatmessage_tts_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chatmessage',
+            name='tts_status',
+            field=models.CharField(blank=True, choices=[('', 'Sin audio'), ('pending', 'Pendiente'), ('processing', 'Sintetizando'), ('ready', 'Listo'), ('failed', 'Fallido')], default='', max_length=10),
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.apps import apps
@@ -40,6 +41,10 @@ class InterviewSession(models.Model):
     
     class Meta:
         ordering = ['-created_at']  # Más recientes primero
+        indexes = [
+            # Listado paginado por cursor de las sesiones de un usuario
+            models.Index(fields=['user', '-created_at', '-id'], name='session_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.title}"
@@ -127,6 +132,9 @@ class InterviewSession(models.Model):
             }
         )
 
+        previous_minutes = feedback_report.session_duration_minutes
+        previous_time_score = feedback_report.time_management_score
+
         # Si la entrevista fue interrumpida, desactivar evaluación de tiempo
         if interrupted:
             feedback_report.time_evaluation_enabled = False
@@ -151,6 +159,17 @@ class InterviewSession(models.Model):
         feedback_report.generated_at = now
         feedback_report.save()
 
+        # Si el reporte ya estaba contado en las analytics, aplicar solo la diferencia
+        if not created and feedback_report.performance_level:
+            from evaluation.analytics import apply_report_time_change
+            apply_report_time_change(
+                self.user_id, previous_minutes, session_minutes,
+                previous_time_score, feedback_report.time_management_score,
+            )
+
+# Texto que identifica el mensaje de cierre de Lumo (no cuenta como pregunta)
+CLOSING_MESSAGE_MARKER = "completado las 7 preguntas"
+
 class ChatMessage(models.Model):
     """
     💬 PROPÓSITO: Almacena cada mensaje individual del chat
@@ -164,10 +183,45 @@ class ChatMessage(models.Model):
     audio_file = models.FileField(upload_to='chat_audio/', null=True, blank=True)
     # Nombre de la voz utilizada para TTS (opcional)
     tts_voice = models.CharField(max_length=100, null=True, blank=True)
+    # Estado del audio TTS generado en segundo plano
+    TTS_STATUS_CHOICES = [
+        ('', 'Sin audio'),
+        ('pending', 'Pendiente'),
+        ('processing', 'Sintetizando'),
+        ('ready', 'Listo'),
+        ('failed', 'Fallido'),
+    ]
+    tts_status = models.CharField(max_length=10, choices=TTS_STATUS_CHOICES, default='', blank=True)
     
     class Meta:
         ordering = ['timestamp']  # Cronológico
+        indexes = [
+            # Ventana de historial del prompt y páginas de mensajes por sesión
+            models.Index(fields=['session', 'timestamp', 'id'], name='chatmsg_session_ts_idx'),
+        ]
     
+    @property
+    def counts_as_question(self):
+        """Cada mensaje de la IA es una pregunta, salvo el mensaje de cierre"""
+        return not self.is_user and CLOSING_MESSAGE_MARKER not in (self.content or '').lower()
+
+    def save(self, *args, **kwargs):
+        """
+        🔢 Al crear un mensaje de la IA incrementa InterviewSession.questions_asked con F()
+        en la misma transacción: el contador nunca se desincroniza con los mensajes
+        """
+        if self._state.adding and self.counts_as_question:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                InterviewSession.objects.filter(id=self.session_id).update(
+                    questions_asked=F('questions_asked') + 1
+                )
+            # Mantener al día la instancia de sesión en memoria, si está cargada
+            if ChatMessage.session.is_cached(self):
+                self.session.questions_asked += 1
+            return
+        super().save(*args, **kwargs)
+
     def __str__(self):
         sender = "Usuario" if self.is_user else "IA"
         audio_marker = " [audio]" if self.audio_file else ""
@@ -0,0 +1,58 @@
+import base64
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def page_size(request, default=DEFAULT_PAGE_SIZE):
+    """Tamaño de página desde ?limit= (acotado a MAX_PAGE_SIZE); ValueError si no es un entero."""
+    return max(1, min(int(request.GET.get('limit', default)), MAX_PAGE_SIZE))
+
+
+def encode_cursor(timestamp, pk):
+    """🔖 Cursor opaco con la posición (fecha, id) del último elemento de la página."""
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Devuelve (fecha, id) del cursor; ValueError si está mal formado."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, pk = raw.rsplit('|', 1)
+        parsed = parse_datetime(timestamp)
+        if parsed is None:
+            raise ValueError(timestamp)
+        return parsed, int(pk)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError(f"Cursor inválido: {cursor}") from exc
+
+
+def keyset_before(queryset, field, cursor):
+    """
+    🔑 PROPÓSITO: Paginación por clave (keyset) en orden (-field, -id)
+    📝 QUÉ HACE: Filtra los elementos posteriores al cursor con un WHERE sobre el índice,
+    así el coste de una página no crece con el número de páginas anteriores (sin OFFSET)
+    """
+    if not cursor:
+        return queryset
+    timestamp, pk = decode_cursor(cursor)
+    return queryset.filter(Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, 'id__lt': pk}))
+
+
+def json_etag(payload):
+    """🏷️ ETag fuerte calculado sobre el JSON de la respuesta."""
+    body = json.dumps(payload, sort_keys=True, cls=DjangoJSONEncoder).encode()
+    return f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+
+def etag_matches(request, etag):
+    """True si el cliente ya tiene esta versión (If-None-Match)."""
+    header = request.headers.get('If-None-Match', '')
+    return header.strip() == '*' or etag in [tag.strip() for tag in header.split(',')]
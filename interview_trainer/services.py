@@ -7,9 +7,128 @@ import os
 import mimetypes
 import uuid
 import struct
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .tts_cache import tts_cache
+from .models import CLOSING_MESSAGE_MARKER
 
 logger = logging.getLogger(__name__)
 
+TEXT_MODEL_NAME = 'models/gemini-2.0-flash'
+TTS_MODEL_NAME = 'gemini-2.5-pro-preview-tts'
+
+
+class GeminiClientRegistry:
+    """
+    🏭 PROPÓSITO: Registro por proceso de clientes y modelos de Gemini
+    📝 QUÉ HACE: Configura genai una sola vez, reutiliza GenerativeModel, el cliente
+    de TTS y el pool de hilos entre peticiones (mismos canales HTTP/gRPC)
+    ⚠️  IMPORTANTE: Es thread-safe. Los servicios se cachean por (api_key, modelo): si
+    GEMINI_API_KEY cambia se construye uno nuevo; en tests usar reset() para empezar de cero
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._configured_key = None
+        self._models = {}
+        self._tts_client = None
+        self._executor = None
+        self._services = {}
+
+    def _ensure_configured(self, api_key):
+        # Si la API key cambió (p. ej. override_settings en tests) se descarta lo cacheado
+        if self._configured_key != api_key:
+            genai.configure(api_key=api_key)
+            self._configured_key = api_key
+            self._models = {}
+            self._tts_client = None
+            self._services = {}
+
+    def get_model(self, model_name=TEXT_MODEL_NAME):
+        """Devuelve el GenerativeModel compartido (None si no hay API key)."""
+        api_key = settings.GEMINI_API_KEY
+        if not api_key:
+            return None
+        with self._lock:
+            self._ensure_configured(api_key)
+            model = self._models.get(model_name)
+            if model is None:
+                model = genai.GenerativeModel(model_name)
+                self._models[model_name] = model
+                logger.info(f"✅ Usando modelo: {model_name}")
+            return model
+
+    def get_tts_client(self):
+        """Devuelve el cliente compartido de google.genai para TTS (None si no disponible)."""
+        api_key = settings.GEMINI_API_KEY
+        if not api_key:
+            return None
+        with self._lock:
+            self._ensure_configured(api_key)
+            if self._tts_client is None:
+                try:
+                    from google import genai as ggenai
+                except Exception:
+                    logger.warning("google.genai no disponible; omitiendo TTS.")
+                    return None
+                self._tts_client = ggenai.Client(api_key=api_key)
+            return self._tts_client
+
+    def get_executor(self):
+        """
+        🧵 Pool acotado para las llamadas bloqueantes al SDK (GEMINI_MAX_CONCURRENCY hilos).
+        El cliente async del SDK (grpc.aio) queda atado al primer event loop que lo usa,
+        así que delegamos las llamadas síncronas a hilos: funciona con cualquier loop.
+        """
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=getattr(settings, 'GEMINI_MAX_CONCURRENCY', 32),
+                        thread_name_prefix='gemini',
+                    )
+        return self._executor
+
+    def get_service(self, model_name=TEXT_MODEL_NAME):
+        """Devuelve el GeminiService compartido para la API key actual y el modelo."""
+        key = (settings.GEMINI_API_KEY, model_name)
+        service = self._services.get(key)
+        if service is None:
+            with self._lock:
+                service = self._services.get(key)
+                if service is None:
+                    service = GeminiService(model_name)
+                    self._services[key] = service
+        return service
+
+    def reset(self):
+        """🧹 Descarta clientes, modelos, pool y servicio (hook para tests)."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._configured_key = None
+            self._models = {}
+            self._tts_client = None
+            self._executor = None
+            self._services = {}
+
+
+gemini_registry = GeminiClientRegistry()
+
+
+def get_gemini_service():
+    """
+    🤖 PROPÓSITO: Punto de entrada para obtener el GeminiService del proceso
+    📝 QUÉ HACE: Evita reconfigurar genai y reconstruir modelos en cada petición
+    """
+    return gemini_registry.get_service()
+
+
+def get_gemini_executor():
+    return gemini_registry.get_executor()
+
 class GeminiService:
     """
     🤖 PROPÓSITO: Maneja toda la comunicación con Google Gemini
@@ -17,16 +136,14 @@ class GeminiService:
     🔑 CAMBIO: Ahora usa TU API key centralizada
     """
     
-    def __init__(self):
+    def __init__(self, model_name=TEXT_MODEL_NAME):
         # 🔑 USA TU API KEY CENTRALIZADA (no la del usuario)
+        # Clientes y modelos vienen del registro compartido del proceso
         self.api_key = settings.GEMINI_API_KEY
-        if self.api_key:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel('models/gemini-2.0-flash')
-            logger.info("✅ Usando modelo: models/gemini-2.0-flash")
-        else:
+        self.model_name = model_name
+        self.model = gemini_registry.get_model(model_name)
+        if not self.model:
             logger.error("❌ API Key de Gemini no configurada")
-            self.model = None
     
     def _extract_response_text(self, response):
         """
@@ -43,6 +160,27 @@ class GeminiService:
             except Exception as e:
                 logger.error(f"❌ Error extrayendo texto de respuesta: {e}")
                 return "Error procesando respuesta de IA"
+
+    async def _run_blocking(self, func, *args, **kwargs):
+        """
+        ⚡ PROPÓSITO: Ejecuta una llamada bloqueante sin detener el event loop
+        📝 QUÉ HACE: La delega al pool acotado de Gemini y espera el resultado
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            get_gemini_executor(),
+            functools.partial(func, *args, **kwargs),
+        )
+
+    async def _generate_content(self, prompt, generation_config):
+        """
+        🤖 PROPÓSITO: Versión no bloqueante de model.generate_content
+        """
+        return await self._run_blocking(
+            self.model.generate_content,
+            prompt,
+            generation_config=generation_config,
+        )
     
     def get_system_prompt(self, interview_type='operations'):
         """
@@ -134,7 +272,7 @@ FORMATO EJEMPLO:
 Genera SOLO el saludo inicial:"""
 
             # Generar mensaje inicial
-            response = self.model.generate_content(
+            response = await self._generate_content(
                 initial_prompt,
                 generation_config=genai.types.GenerationConfig(
                     temperature=0.7,  # Menos creativo para ser más directo
@@ -154,32 +292,84 @@ Genera SOLO el saludo inicial:"""
     def _count_ai_questions(self, conversation_history):
         """
         🔢 PROPÓSITO: Contar las preguntas que ha hecho Lumo en la conversación
-        📝 QUÉ HACE: Analiza el historial y cuenta mensajes de IA que contienen preguntas
+        📝 QUÉ HACE: Respaldo para llamadas sin sesión; con sesión se usa
+        InterviewSession.questions_asked, que se mantiene al guardar cada mensaje
         ⚠️  IMPORTANTE: Cuenta mensajes de IA como preguntas (1 pregunta = 1 mensaje de IA)
         """
-        if not conversation_history:
-            return 0
-            
-        ai_message_count = 0
-        
-        for msg in conversation_history:
-            if not msg.get('is_user'):  # Es mensaje de la IA
-                ai_message_count += 1
-        
-        # Cada mensaje de IA cuenta como una pregunta
-        # (Excepto mensajes de finalización que contienen "completado las 10 preguntas")
-        question_count = 0
-        for msg in conversation_history:
-            if not msg.get('is_user'):  # Es mensaje de la IA
-                content = msg.get('content', '')
-                # No contar mensajes de finalización
-                if "completado las 7 preguntas" not in content.lower():
-                    question_count += 1
-        
-        logger.info(f"🔢 AI messages: {ai_message_count}, Questions counted: {question_count}")
+        question_count = sum(
+            1 for msg in conversation_history or []
+            if not msg.get('is_user') and CLOSING_MESSAGE_MARKER not in msg.get('content', '').lower()
+        )
+        logger.info(f"🔢 Questions counted: {question_count}")
         return question_count
 
-    async def generate_response(self, message, conversation_history=None, interview_type='operations'):
+    CLOSING_MESSAGE = (
+        "¡Excelente! 🎉 Hemos completado las 7 preguntas de esta entrevista. "
+        "Ha sido un placer conocerte y escuchar sobre tu experiencia profesional. "
+        "Muchas gracias por tu tiempo y por compartir tus conocimientos conmigo. "
+        "¡Te deseo mucho éxito en tu proceso de selección! 🌟\n\n"
+        "La entrevista ha finalizado. Puedes revisar tu evaluación en el panel de ver estadísticas."
+    )
+
+    def _build_response_prompt(self, message, conversation_history=None, interview_type='operations', questions_asked=None):
+        """
+        🧩 PROPÓSITO: Construye el prompt de la siguiente pregunta
+        📝 QUÉ HACE: Devuelve None si ya se hicieron las 7 preguntas (toca el cierre).
+        Si no se pasa questions_asked se cuentan recorriendo el historial completo.
+        """
+        # Límite de preguntas establecido en 7
+        if questions_asked is None:
+            questions_asked = self._count_ai_questions(conversation_history or [])
+        max_questions = 7
+
+        # Si ya se hicieron las 7 preguntas, no hay prompt: se envía el mensaje de cierre
+        if questions_asked >= max_questions:
+            logger.info("🚨 LÍMITE ALCANZADO: Finalizando entrevista")
+            return None
+
+        # Construir el prompt para la pregunta actual
+        pregunta_num = questions_asked + 1
+        system_prompt = self.get_system_prompt(interview_type)
+        department_names = {
+            'operations': 'Operaciones y Producción',
+            'sales_marketing': 'Ventas y Marketing', 
+            'finance': 'Finanzas y Administración',
+            'hr': 'Recursos Humanos (Talento Humano)',
+            'it': 'Tecnología de la Información (TI / IT)',
+            'rd': 'Investigación y Desarrollo (I+D)',
+            'customer_support': 'Atención al Cliente y Soporte',
+            'management': 'Dirección General y Estratégica',
+            'health': 'Salud y Medicina'
+        }
+        department_name = department_names.get(interview_type, 'Operaciones y Producción')
+
+        # Prompt para la pregunta actual
+        pregunta_context = f"\n🔢 Pregunta {pregunta_num}/7\n"
+        session_context = f"\n🎯 SESIÓN: {department_name}{pregunta_context}"
+
+        # Agregar historial de conversación (solo últimos 6 mensajes para contexto)
+        full_context = f"{system_prompt}{session_context}"
+        if conversation_history:
+            full_context += "CONTEXTO RECIENTE:\n"
+            recent_history = conversation_history[-6:] if len(conversation_history) > 6 else conversation_history
+            for msg in recent_history:
+                sender = "Candidato" if msg.get('is_user') else "Lumo"
+                content = msg.get('content', '')[:150] + '...' if len(msg.get('content', '')) > 150 else msg.get('content', '')
+                full_context += f"{sender}: {content}\n"
+            full_context += "\n"
+        full_context += f"Candidato: {message}\nRespuesta breve de Lumo (incluye 'Pregunta {pregunta_num}/7' al inicio):"
+        return full_context
+
+    @staticmethod
+    def _response_generation_config():
+        return genai.types.GenerationConfig(
+            temperature=0.6,
+            top_k=30,
+            top_p=0.8,
+            max_output_tokens=150,
+        )
+
+    async def generate_response(self, message, conversation_history=None, interview_type='operations', questions_asked=None):
         """
         🎯 PROPÓSITO: Genera respuesta de la IA con contexto dinámico y límite de 7 preguntas
         """
@@ -187,68 +377,114 @@ Genera SOLO el saludo inicial:"""
             raise ValueError("API key de Gemini no configurada")
         
         try:
-            # Límite de preguntas establecido en 7
-            questions_asked = self._count_ai_questions(conversation_history or [])
-            max_questions = 7
-
-            # Si ya se hicieron las 7 preguntas, envía el mensaje de cierre
-            if questions_asked >= max_questions:
-                logger.info("🚨 LÍMITE ALCANZADO: Finalizando entrevista")
-                return (
-                    "¡Excelente! 🎉 Hemos completado las 7 preguntas de esta entrevista. "
-                    "Ha sido un placer conocerte y escuchar sobre tu experiencia profesional. "
-                    "Muchas gracias por tu tiempo y por compartir tus conocimientos conmigo. "
-                    "¡Te deseo mucho éxito en tu proceso de selección! 🌟\n\n"
-                    "La entrevista ha finalizado. Puedes revisar tu evaluación en el panel de ver estadísticas."
-                )
-
-            # Construir el prompt para la pregunta actual
-            pregunta_num = questions_asked + 1
-            system_prompt = self.get_system_prompt(interview_type)
-            department_names = {
-                'operations': 'Operaciones y Producción',
-                'sales_marketing': 'Ventas y Marketing', 
-                'finance': 'Finanzas y Administración',
-                'hr': 'Recursos Humanos (Talento Humano)',
-                'it': 'Tecnología de la Información (TI / IT)',
-                'rd': 'Investigación y Desarrollo (I+D)',
-                'customer_support': 'Atención al Cliente y Soporte',
-                'management': 'Dirección General y Estratégica',
-                'health': 'Salud y Medicina'
-            }
-            department_name = department_names.get(interview_type, 'Operaciones y Producción')
-
-            # Prompt para la pregunta actual
-            pregunta_context = f"\n🔢 Pregunta {pregunta_num}/7\n"
-            session_context = f"\n🎯 SESIÓN: {department_name}{pregunta_context}"
-
-            # Agregar historial de conversación (solo últimos 6 mensajes para contexto)
-            full_context = f"{system_prompt}{session_context}"
-            if conversation_history:
-                full_context += "CONTEXTO RECIENTE:\n"
-                recent_history = conversation_history[-6:] if len(conversation_history) > 6 else conversation_history
-                for msg in recent_history:
-                    sender = "Candidato" if msg.get('is_user') else "Lumo"
-                    content = msg.get('content', '')[:150] + '...' if len(msg.get('content', '')) > 150 else msg.get('content', '')
-                    full_context += f"{sender}: {content}\n"
-                full_context += "\n"
-            full_context += f"Candidato: {message}\nRespuesta breve de Lumo (incluye 'Pregunta {pregunta_num}/7' al inicio):"
+            full_context = self._build_response_prompt(message, conversation_history, interview_type, questions_asked)
+            if full_context is None:
+                return self.CLOSING_MESSAGE
 
             # Generar respuesta
-            response = self.model.generate_content(
+            response = await self._generate_content(
                 full_context,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.6,
-                    top_k=30,
-                    top_p=0.8,
-                    max_output_tokens=150,
-                )
+                generation_config=self._response_generation_config()
             )
             return self._extract_response_text(response)
         except Exception as e:
             logger.error(f"Error generando respuesta con Gemini: {str(e)}")
             raise e
 
+    async def _stream_blocking(self, func, *args, **kwargs):
+        """
+        🌊 PROPÓSITO: Consume un iterador síncrono del SDK sin bloquear el event loop
+        📝 QUÉ HACE: Lo recorre en el pool de Gemini y entrega cada elemento por una cola
+        ⚠️  IMPORTANTE: Si el consumidor se va antes del final (cliente desconectado,
+        cancelación o aclose()) el hilo deja de leer el stream en el siguiente fragmento y
+        libera su plaza del pool. Quien lo envuelva debe cerrarlo con aclose()
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        finished = object()
+        cancel = threading.Event()
+
+        def emit(item):
+            if cancel.is_set():
+                return
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                # El event loop ya se cerró: nadie va a leer el resto
+                cancel.set()
+
+        def produce():
+            iterator = None
+            try:
+                iterator = iter(func(*args, **kwargs))
+                for item in iterator:
+                    if cancel.is_set():
+                        break
+                    emit(item)
+            except Exception as exc:
+                emit(exc)
+            finally:
+                if cancel.is_set() and hasattr(iterator, 'close'):
+                    # Cierra el generador y, con él, la respuesta en curso del SDK
+                    try:
+                        iterator.close()
+                    except Exception as exc:
+                        logger.debug(f"Stream de Gemini cerrado con error: {exc}")
+                emit(finished)
+
+        producer = loop.run_in_executor(get_gemini_executor(), produce)
+        completed = False
+        try:
+            while True:
+                item = await queue.get()
+                if item is finished:
+                    completed = True
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            if completed:
+                await producer
+            else:
+                # Sin esperar al hilo: se detiene solo al ver la señal
+                cancel.set()
+
+    async def generate_response_stream(self, message, conversation_history=None, interview_type='operations', questions_asked=None):
+        """
+        🌊 PROPÓSITO: Igual que generate_response pero entregando el texto por fragmentos
+        📝 QUÉ HACE: Usa generate_content(stream=True) y produce cada trozo en cuanto llega
+        ⚠️  IMPORTANTE: Cerrarlo con aclose() corta también la lectura del stream del modelo
+        """
+        if not self.model:
+            raise ValueError("API key de Gemini no configurada")
+
+        full_context = self._build_response_prompt(message, conversation_history, interview_type, questions_asked)
+        if full_context is None:
+            yield self.CLOSING_MESSAGE
+            return
+
+        chunks = self._stream_blocking(
+            self.model.generate_content,
+            full_context,
+            generation_config=self._response_generation_config(),
+            stream=True,
+        )
+        try:
+            async for chunk in chunks:
+                try:
+                    text = chunk.text
+                except Exception:
+                    # Fragmentos sin texto (p. ej. solo metadatos de seguridad)
+                    continue
+                if text:
+                    yield text
+        except Exception as e:
+            logger.error(f"Error en streaming de respuesta con Gemini: {str(e)}")
+            raise e
+        finally:
+            await chunks.aclose()
+
     async def generate_response_with_tts(self,message,conversation_history=None,interview_type='operations',voice_name="Leda",):
         """
         1. Llama a generate_response para obtener el texto.
@@ -263,7 +499,7 @@ Genera SOLO el saludo inicial:"""
         )
 
         # 2) audio de la respuesta
-        tts_result = self.text_to_speech(reply_text, voice_name=voice_name)
+        tts_result = await self.text_to_speech_async(reply_text, voice_name=voice_name)
 
         audio_url = None
         if tts_result:
@@ -369,7 +605,7 @@ REQUISITOS:
 - JSON sin errores de sintaxis"""
 
             # Generar evaluación con configuración específica para JSON
-            response = self.model.generate_content(
+            response = await self._generate_content(
                 feedback_prompt,
                 generation_config=genai.types.GenerationConfig(
                     temperature=0.3,  # Más bajo para consistencia y brevedad
@@ -386,95 +622,132 @@ REQUISITOS:
             logger.error(f"Error generando feedback: {str(e)}")
             raise e
 
-    def text_to_speech(self, text: str, voice_name: str = "Zephyr"):
+    async def text_to_speech_async(self, text: str, voice_name: str = "Zephyr"):
         """
-        Genera audio usando Gemini y lo guarda en MEDIA_ROOT/tts/<archivo>.wav
+        🔊 PROPÓSITO: Versión no bloqueante de text_to_speech para vistas async
         """
-        try:
-            try:
-                from google import genai as ggenai
-                types = ggenai.types
-            except Exception:
-                logger.warning("google.genai no disponible; omitiendo TTS.")
-                return None
-
-            api_key = self.api_key or ""
-            if not api_key:
-                logger.warning("GEMINI API key no configurada; omitiendo TTS.")
-                return None
-
-            client = ggenai.Client(api_key=api_key)
-            model = "gemini-2.5-pro-preview-tts"
-
-            contents = [
-                types.Content(
-                    role="user",
-                    parts=[types.Part.from_text(text=text)]
-                )
-            ]
+        return await self._run_blocking(self.text_to_speech, text, voice_name=voice_name)
 
-            generate_content_config = types.GenerateContentConfig(
-                response_modalities=["audio"],
-                speech_config=types.SpeechConfig(
-                    voice_config=types.VoiceConfig(
-                        prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                            voice_name=voice_name
-                        )
+    def iter_tts_chunks(self, text: str, voice_name: str = "Zephyr"):
+        """
+        🌊 PROPÓSITO: Produce el audio de Gemini TTS fragmento a fragmento
+        📝 QUÉ HACE: Genera tuplas (bytes, mime_type) en cuanto llegan del stream del SDK
+        (normalmente PCM crudo audio/L16); no guarda nada en disco
+        """
+        if not self.api_key:
+            logger.warning("GEMINI API key no configurada; omitiendo TTS.")
+            return
+
+        # Cliente compartido: reutiliza la conexión HTTP entre llamadas
+        client = gemini_registry.get_tts_client()
+        if client is None:
+            return
+        from google.genai import types
+
+        contents = [
+            types.Content(
+                role="user",
+                parts=[types.Part.from_text(text=text)]
+            )
+        ]
+
+        generate_content_config = types.GenerateContentConfig(
+            response_modalities=["audio"],
+            speech_config=types.SpeechConfig(
+                voice_config=types.VoiceConfig(
+                    prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                        voice_name=voice_name
                     )
                 )
             )
+        )
 
-            audio_chunks = []
-            mime_type = None
+        for chunk in client.models.generate_content_stream(
+            model=TTS_MODEL_NAME,
+            contents=contents,
+            config=generate_content_config,
+        ):
+            if not getattr(chunk, "candidates", None):
+                continue
+            candidate = chunk.candidates[0]
+            if not getattr(candidate, "content", None) or not getattr(candidate.content, "parts", None):
+                continue
+
+            part = candidate.content.parts[0]
+            inline = getattr(part, "inline_data", None)
+            if inline and getattr(inline, "data", None):
+                yield inline.data, inline.mime_type or "audio/wav"
+
+    def persist_tts_audio(self, text, voice_name, audio_chunks, mime_type):
+        """
+        💾 PROPÓSITO: Guarda el audio completo de una síntesis
+        📝 QUÉ HACE: Une los fragmentos, añade cabecera WAV si es PCM crudo y lo guarda
+        en la caché TTS (o en MEDIA_ROOT/tts/ si la caché está deshabilitada)
+        """
+        raw_audio = b"".join(audio_chunks)
+        guessed_ext = mimetypes.guess_extension(mime_type) or ".wav"
+
+        if mime_type and "audio/L" in mime_type:
+            raw_audio = self.convert_to_wav(raw_audio, mime_type)
+            guessed_ext = ".wav"
+            mime_type = "audio/wav"
+
+        # Guardar en la caché direccionada por contenido
+        file_path = tts_cache.put(text, voice_name, TTS_MODEL_NAME, raw_audio, guessed_ext)
+        if file_path is None:
+            # Caché deshabilitada: guardar en MEDIA_ROOT/tts/ como antes
+            tts_dir = os.path.join(settings.MEDIA_ROOT, "tts")
+            os.makedirs(tts_dir, exist_ok=True)
+            file_path = os.path.join(tts_dir, f"{uuid.uuid4().hex}{guessed_ext}")
+            with open(file_path, "wb") as f:
+                f.write(raw_audio)
 
-            for chunk in client.models.generate_content_stream(
-                model=model,
-                contents=contents,
-                config=generate_content_config,
-            ):
-                if not getattr(chunk, "candidates", None):
-                    continue
-                candidate = chunk.candidates[0]
-                if not getattr(candidate, "content", None) or not getattr(candidate.content, "parts", None):
-                    continue
+        return {
+            "url": f"{settings.MEDIA_URL}{tts_cache.relative_name(file_path)}",
+            "file_path": file_path,
+            "mime_type": mime_type,
+            "voice_name": voice_name,
+            "size": len(raw_audio),
+            "from_cache": False,
+        }
+
+    def cached_tts_audio(self, text, voice_name):
+        """🗄️ Resultado de text_to_speech desde la caché, o None si no hay acierto."""
+        cached = tts_cache.get(text, voice_name, TTS_MODEL_NAME)
+        if not cached:
+            return None
+        return {
+            "url": f"{settings.MEDIA_URL}{tts_cache.relative_name(cached['path'])}",
+            "file_path": cached['path'],
+            "mime_type": mimetypes.guess_type(cached['path'])[0] or "audio/wav",
+            "voice_name": voice_name,
+            "size": cached['size'],
+            "from_cache": True,
+        }
+
+    def text_to_speech(self, text: str, voice_name: str = "Zephyr"):
+        """
+        Genera audio usando Gemini y lo guarda en la caché TTS (MEDIA_ROOT/tts_cache/).
+        Si el mismo texto ya se sintetizó con la misma voz y modelo, no llama a Gemini.
+        Devuelve la ruta del archivo (no los bytes): quien lo necesite lo enlaza o lo lee.
+        """
+        try:
+            # 🗄️ Frases repetidas (saludo, cierre...): servir desde la caché
+            cached = self.cached_tts_audio(text, voice_name)
+            if cached:
+                return cached
 
-                part = candidate.content.parts[0]
-                inline = getattr(part, "inline_data", None)
-                if inline and getattr(inline, "data", None):
-                    audio_chunks.append(inline.data)
-                    mime_type = inline.mime_type or "audio/wav"
+            audio_chunks = []
+            mime_type = None
+            for data, chunk_mime in self.iter_tts_chunks(text, voice_name):
+                audio_chunks.append(data)
+                mime_type = chunk_mime
 
             if not audio_chunks:
                 logger.warning("Gemini no devolvió audio.")
                 return None
 
-            raw_audio = b"".join(audio_chunks)
-            guessed_ext = mimetypes.guess_extension(mime_type) or ".wav"
-
-            # ✅ CORRECCIÓN: Agregar self. antes de convert_to_wav
-            if mime_type and "audio/L" in mime_type:
-                raw_audio = self.convert_to_wav(raw_audio, mime_type)
-                guessed_ext = ".wav"
-
-            # Guardar en MEDIA_ROOT/tts/
-            tts_dir = os.path.join(settings.MEDIA_ROOT, "tts")
-            os.makedirs(tts_dir, exist_ok=True)
-
-            filename = f"{uuid.uuid4().hex}{guessed_ext}"
-            file_path = os.path.join(tts_dir, filename)
-
-            with open(file_path, "wb") as f:
-                f.write(raw_audio)
-
-            audio_url = f"{settings.MEDIA_URL}tts/{filename}"
-
-            return {
-                "url": audio_url,
-                "file_path": file_path,
-                "mime_type": mime_type,
-                "voice_name": voice_name,
-                "audio_bytes": raw_audio,  # Para que api_views pueda codificar en base64
-            }
+            return self.persist_tts_audio(text, voice_name, audio_chunks, mime_type)
 
         except Exception as exc:
             logger.exception("Error solicitando TTS a Gemini: %s", exc)
@@ -515,6 +788,14 @@ REQUISITOS:
         """
         Convierte audio raw (ej: audio/L16) a formato WAV con encabezado.
         """
+        return GeminiService.wav_header(mime_type, len(audio_data)) + audio_data
+
+    @staticmethod
+    def wav_header(mime_type: str, data_size: int | None = None) -> bytes:
+        """
+        Encabezado WAV para PCM crudo. Sin data_size se usa el máximo (0xFFFFFFFF):
+        WAV "progresivo" que el navegador reproduce mientras siguen llegando datos.
+        """
         params = GeminiService.parse_audio_mime_type(mime_type)
         rate = params.get('rate') or 24000
         channels = params.get('channels') or 1
@@ -523,10 +804,11 @@ REQUISITOS:
         # Calcular tamaños
         byte_rate = rate * channels * (bits // 8)
         block_align = channels * (bits // 8)
-        data_size = len(audio_data)
+        if data_size is None:
+            data_size = 0xFFFFFFFF - 36
         
         # Construir encabezado WAV
-        wav_header = struct.pack(
+        return struct.pack(
             '<4sI4s4sIHHIIHH4sI',
             b'RIFF',
             data_size + 36,  # Tamaño del archivo - 8
@@ -542,8 +824,6 @@ REQUISITOS:
             b'data',
             data_size
         )
-        
-        return wav_header + audio_data
 
     def _parse_json_feedback_response(self, response_text: str) -> dict:
         """
@@ -1,9 +1,16 @@
 from __future__ import absolute_import, unicode_literals
+import functools
 import logging
-import mimetypes
+import os
+import shutil
+import threading
 import time
-from django.core.files.base import ContentFile
+from concurrent.futures import ThreadPoolExecutor
+from django.core.files import File
+from django.core.files.storage import default_storage
 from django.conf import settings
+from django.core.signals import request_started
+from django.db import close_old_connections
 
 # Intentar importar shared_task; si Celery no está instalado creamos un decorador no-op
 try:
@@ -13,14 +20,255 @@ except Exception:
     CELERY_AVAILABLE = False
     def shared_task(*args, **kwargs):
         def _decorator(func):
+            if kwargs.get('bind'):
+                # Sin Celery no hay instancia de tarea: se pasa None como `self`
+                @functools.wraps(func)
+                def _bound(*call_args, **call_kwargs):
+                    return func(None, *call_args, **call_kwargs)
+                return _bound
             return func
         return _decorator
 
 from .models import ChatMessage
-from .services import GeminiService
+from .services import get_gemini_service
+from .tts_cache import tts_cache
+from .audio_encoding import ENCODERS, configured_formats, encode_variants, keeps_wav, preferred_format
 
 logger = logging.getLogger(__name__)
 
+_local_executor = None
+_local_executor_lock = threading.Lock()
+_worker_ready_hooks = []
+
+
+def _use_broker():
+    return CELERY_AVAILABLE and bool(getattr(settings, 'CELERY_BROKER_URL', ''))
+
+
+def get_local_executor():
+    """
+    🧵 PROPÓSITO: Pool de hilos para trabajos en segundo plano cuando no hay broker
+    📝 QUÉ HACE: Al crearse ejecuta los hooks de arranque (on_worker_ready)
+    """
+    global _local_executor
+    if _local_executor is None:
+        with _local_executor_lock:
+            if _local_executor is not None:
+                return _local_executor
+            _local_executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'LOCAL_TASK_WORKERS', 4),
+                thread_name_prefix='lumo-task',
+            )
+        for hook in list(_worker_ready_hooks):
+            _local_executor.submit(_run_local, hook)
+    return _local_executor
+
+
+def on_worker_ready(func):
+    """
+    🚀 PROPÓSITO: Registra una función a ejecutar cuando arranca un worker
+    📝 QUÉ HACE: Con Celery se conecta a la señal worker_ready; en modo local corre en el
+    pool de hilos en cuanto este se crea (primer trabajo o primera petición del proceso)
+    """
+    _worker_ready_hooks.append(func)
+    if CELERY_AVAILABLE:
+        from celery.signals import worker_ready
+        worker_ready.connect(lambda sender=None, **kwargs: func(), weak=False)
+    if _local_executor is not None:
+        _local_executor.submit(_run_local, func)
+    return func
+
+
+def start_local_worker(**kwargs):
+    """
+    🚀 Receiver de request_started: sin broker, el pool local (y sus hooks de arranque)
+    se crea con la primera petición del proceso en lugar de esperar al primer trabajo
+    """
+    request_started.disconnect(dispatch_uid='interview_trainer.start_local_worker')
+    if not _use_broker():
+        get_local_executor()
+
+
+def _run_local(task, *args, **kwargs):
+    # Cada trabajo usa conexiones de DB propias del hilo; se liberan al terminar
+    close_old_connections()
+    try:
+        return task(*args, **kwargs)
+    except Exception as exc:
+        logger.exception("Error ejecutando tarea local %s: %s", getattr(task, '__name__', task), exc)
+    finally:
+        close_old_connections()
+
+
+def dispatch_task(task, *args, **kwargs):
+    """
+    📬 PROPÓSITO: Encola una tarea en segundo plano
+    📝 QUÉ HACE: Usa Celery si hay CELERY_BROKER_URL; si no (o si el broker falla),
+    la ejecuta en el pool de hilos local del proceso
+    """
+    if _use_broker():
+        try:
+            task.delay(*args, **kwargs)
+            return 'celery'
+        except Exception as exc:
+            logger.warning(f"⚠️ Broker no disponible, ejecutando en local: {exc}")
+
+    get_local_executor().submit(_run_local, task, *args, **kwargs)
+    return 'local'
+
+
+def _place_file(storage, source_path, name):
+    """
+    Coloca source_path en el storage con el nombre dado: hardlink si viene de la caché
+    TTS (copia si el sistema de archivos no lo permite), move si es un archivo suelto y
+    subida normal con storages remotos. Devuelve el nombre guardado.
+    """
+    try:
+        dest_path = storage.path(name)
+    except NotImplementedError:
+        with open(source_path, 'rb') as f:
+            return storage.save(name, File(f))
+
+    if os.path.abspath(source_path) == os.path.abspath(dest_path):
+        return name
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    if tts_cache.contains(source_path):
+        # El hardlink sobrevive a la expulsión LRU de la caché
+        try:
+            os.link(source_path, dest_path)
+        except FileExistsError:
+            pass
+        except OSError:
+            shutil.copyfile(source_path, dest_path)
+    else:
+        os.replace(source_path, dest_path)
+    return name
+
+
+def store_audio_file(field_file, source_path, filename):
+    """
+    💾 PROPÓSITO: Asocia un audio ya sintetizado a un FileField sin reescribir los bytes
+    📝 QUÉ HACE: Si el archivo viene de la caché TTS crea un hardlink (copia si el
+    sistema de archivos no lo permite); si es un archivo suelto lo mueve. Con storages
+    remotos (sin ruta local) sube el archivo de forma normal.
+    """
+    storage = field_file.storage
+    name = field_file.field.generate_filename(field_file.instance, filename)
+    field_file.name = _place_file(storage, source_path, storage.get_available_name(name))
+    return field_file.name
+
+
+def add_audio_variants(msg, source_path=None):
+    """
+    🎚️ PROPÓSITO: Añade al audio de un mensaje sus variantes comprimidas (ogg/mp3)
+    📝 QUÉ HACE: Si el audio viene de la caché TTS codifica una sola vez por entrada y
+    enlaza las variantes junto al archivo del mensaje; si hay alguna, el mensaje pasa a
+    apuntar a la variante preferida. Devuelve el nombre del WAV anterior o None.
+    ⚠️  IMPORTANTE: El WAV anterior sigue en disco: discard_replaced_audio lo borra tras
+    guardar solo si se quitó 'wav' de TTS_AUDIO_FORMATS
+    """
+    storage = msg.audio_file.storage
+    if not source_path or not os.path.exists(source_path):
+        try:
+            source_path = msg.audio_file.path
+        except NotImplementedError:
+            return None
+
+    if tts_cache.contains(source_path):
+        variants = tts_cache.ensure_variants(source_path)
+    else:
+        variants = encode_variants(source_path)
+
+    stem = os.path.splitext(msg.audio_file.name)[0]
+    stored = {}
+    for fmt, path in variants.items():
+        try:
+            stored[fmt] = _place_file(storage, path, stem + ENCODERS[fmt].ext)
+        except FileNotFoundError:
+            # Expulsada de la caché entre la codificación y el enlace
+            continue
+
+    primary = preferred_format(stored)
+    if primary is None:
+        return None
+    previous = msg.audio_file.name
+    msg.audio_file.name = stored[primary]
+    return previous
+
+
+def discard_replaced_audio(storage, name):
+    """Borra el WAV reemplazado por una variante, salvo que se conserve como respaldo."""
+    if name and not keeps_wav():
+        storage.delete(name)
+
+def claim_tts(message_id):
+    """
+    🔒 PROPÓSITO: Reserva la síntesis de un mensaje (pending/failed -> processing)
+    📝 QUÉ HACE: UPDATE condicional atómico; solo un trabajador (tarea en segundo plano
+    o endpoint de streaming) sintetiza cada mensaje. Devuelve True si lo obtuvo.
+    """
+    return ChatMessage.objects.filter(
+        id=message_id, tts_status__in=['', 'pending', 'failed'],
+    ).update(tts_status='processing') == 1
+
+
+def attach_tts_audio(msg, tts, voice_name=None, encode=True):
+    """
+    🔗 PROPÓSITO: Asocia el resultado de una síntesis a un ChatMessage y lo marca listo
+    📝 QUÉ HACE: Enlaza el archivo en chat_audio/ y, con encode=True, añade antes las
+    variantes comprimidas (el WAV queda de respaldo salvo que se quite de
+    TTS_AUDIO_FORMATS); guarda el mensaje con tts_status='ready'.
+    Con encode=False las variantes las añade encode_message_audio.
+    """
+    ext = os.path.splitext(tts['file_path'])[1] or '.wav'
+    filename = f"session_{msg.session_id}_msg_{msg.id}_{int(time.time())}{ext}"
+
+    store_audio_file(msg.audio_file, tts['file_path'], filename)
+    previous = add_audio_variants(msg, tts['file_path']) if encode else None
+    # Guardar nombre de voz si se devolvió
+    if tts.get('voice_name'):
+        msg.tts_voice = tts.get('voice_name')
+    else:
+        msg.tts_voice = voice_name or 'Zephyr'
+    msg.tts_status = 'ready'
+
+    msg.save(update_fields=['audio_file', 'tts_voice', 'tts_status'])
+    discard_replaced_audio(msg.audio_file.storage, previous)
+    logger.info(f"TTS guardado para mensaje {msg.id} -> {msg.audio_file.name}")
+    return msg.audio_file.name
+
+
+def attach_streamed_tts(msg, tts, voice_name=None):
+    """
+    🌊 Como attach_tts_audio pero sin esperar a ffmpeg: guarda el WAV, marca el mensaje
+    como listo y encola encode_message_audio. Es la variante que usan las vistas.
+    """
+    name = attach_tts_audio(msg, tts, voice_name, encode=False)
+    if configured_formats():
+        dispatch_task(encode_message_audio, msg.id, tts['file_path'])
+    return name
+
+
+def dispatch_task_later(delay, task, *args, **kwargs):
+    """
+    ⏰ PROPÓSITO: Encola una tarea para dentro de `delay` segundos (reintentos con backoff)
+    📝 QUÉ HACE: Con Celery usa countdown; en modo local arma un temporizador que luego
+    la manda al pool de hilos
+    ⚠️  IMPORTANTE: El temporizador local se pierde si el proceso se reinicia: el estado a
+    retomar debe quedar en la DB (ver on_worker_ready)
+    """
+    if _use_broker():
+        try:
+            task.apply_async(args=args, kwargs=kwargs, countdown=delay)
+            return 'celery'
+        except Exception as exc:
+            logger.warning(f"⚠️ Broker no disponible, reintento en local: {exc}")
+
+    timer = threading.Timer(delay, dispatch_task, args=(task, *args), kwargs=kwargs)
+    timer.daemon = True
+    timer.start()
+    return 'local'
+
 
 @shared_task(bind=True)
 def generate_and_save_tts(self, message_id, voice_name=None):
@@ -30,36 +278,70 @@ def generate_and_save_tts(self, message_id, voice_name=None):
         message_id (int): ID de ChatMessage (IA) donde guardar el audio
         voice_name (str|None): nombre de la voz a usar
     """
+    if not claim_tts(message_id):
+        # Ya está listo o lo está sintetizando otro trabajador (p. ej. el streaming)
+        logger.info(f"generate_and_save_tts: mensaje {message_id} ya reservado, se omite")
+        return {'success': False, 'error': 'Already claimed'}
+
     try:
         msg = ChatMessage.objects.get(id=message_id)
     except ChatMessage.DoesNotExist:
         logger.error(f"generate_and_save_tts: mensaje {message_id} no encontrado")
         return {'success': False, 'error': 'Message not found'}
 
-    gemini = GeminiService()
+    gemini = get_gemini_service()
     try:
         tts = gemini.text_to_speech(msg.content, voice_name=voice_name or 'Zephyr')
-        if not tts or not tts.get('audio_bytes'):
+        if not tts or not tts.get('file_path'):
             logger.warning(f"TTS no retornó audio para mensaje {message_id}")
+            msg.tts_status = 'failed'
+            msg.save(update_fields=['tts_status'])
             return {'success': False, 'error': 'No audio returned'}
 
-        raw = tts['audio_bytes']
-        mime = tts.get('mime_type', 'audio/wav')
-        ext = mimetypes.guess_extension(mime) or '.wav'
-        filename = f"session_{msg.session.id}_msg_{msg.id}_{int(time.time())}{ext}"
-
-        msg.audio_file.save(filename, ContentFile(raw))
-        # Guardar nombre de voz si se devolvió
-        if tts.get('voice_name'):
-            msg.tts_voice = tts.get('voice_name')
-        else:
-            msg.tts_voice = voice_name or 'Zephyr'
-
-        msg.save()
-
-        logger.info(f"TTS guardado para mensaje {message_id} -> {msg.audio_file.url}")
-        return {'success': True, 'audio_url': msg.audio_file.url}
+        audio_file = attach_tts_audio(msg, tts, voice_name)
+        return {'success': True, 'audio_file': audio_file}
 
     except Exception as exc:
         logger.exception("Error en generate_and_save_tts: %s", exc)
+        ChatMessage.objects.filter(id=message_id).update(tts_status='failed')
         return {'success': False, 'error': str(exc)}
+
+
+@shared_task(bind=True)
+def encode_message_audio(self, message_id, source_path=None):
+    """
+    🎚️ PROPÓSITO: Añade las variantes comprimidas a un audio ya listo, fuera de la petición
+    📝 QUÉ HACE: Lo encola el streaming de TTS, que guarda el WAV y marca el mensaje como
+    listo sin esperar a ffmpeg; después el mensaje pasa a apuntar a la variante preferida
+    """
+    msg = ChatMessage.objects.filter(id=message_id).first()
+    if msg is None or not msg.audio_file:
+        return {'success': False, 'error': 'Message not found'}
+
+    previous = add_audio_variants(msg, source_path)
+    # Condicional: si el mensaje se borró o cambió de audio mientras tanto, no se toca
+    if previous and ChatMessage.objects.filter(id=message_id, audio_file=previous).update(audio_file=msg.audio_file.name):
+        discard_replaced_audio(msg.audio_file.storage, previous)
+    return {'success': True, 'audio_file': msg.audio_file.name}
+
+
+@shared_task(bind=True)
+def delete_media_files(self, names):
+    """
+    🧹 PROPÓSITO: Borra audios de mensajes eliminados fuera de la petición
+    📝 QUÉ HACE: Para cada nombre borra el archivo y sus variantes comprimidas.
+    Los hardlinks hacia la caché TTS solo quitan el enlace: la entrada de la caché sigue.
+    """
+    from .cleanup import audio_file_names
+
+    removed = 0
+    for name in names:
+        for candidate in audio_file_names(name):
+            try:
+                if default_storage.exists(candidate):
+                    default_storage.delete(candidate)
+                    removed += 1
+            except OSError as exc:
+                logger.warning(f"⚠️ No se pudo borrar {candidate}: {exc}")
+    logger.info(f"🧹 {removed} archivos de audio eliminados")
+    return {'success': True, 'removed': removed}
@@ -1,3 +1,369 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from . import api_views, tasks
+from .api_views import _parse_range
+from .models import ChatMessage, InterviewSession
+from .services import gemini_registry, get_gemini_service
+from .audio_encoding import FfmpegEncoder
+from .tasks import claim_tts, encode_message_audio, generate_and_save_tts
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='lumo-tests-')
+PCM_MIME = 'audio/L16;codec=pcm;rate=24000'
+
+
+def setUpModule():
+    # Sin pool local: los trabajos en segundo plano se simulan dentro de cada test
+    request_started.disconnect(dispatch_uid='interview_trainer.start_local_worker')
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+def consume(response):
+    """Lee completo un StreamingHttpResponse async (ejecuta también su bloque finally)."""
+    async def read():
+        return b''.join([chunk async for chunk in response.streaming_content])
+    return async_to_sync(read)()
+
+
+def disconnect_after(response, chunks=1):
+    """Simula que el cliente se va: cancela la lectura del stream tras `chunks` fragmentos."""
+    async def read():
+        received, enough = [], asyncio.Event()
+
+        async def pump():
+            async for chunk in response.streaming_content:
+                received.append(chunk)
+                if len(received) >= chunks:
+                    enough.set()
+
+        task = asyncio.ensure_future(pump())
+        await enough.wait()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return received
+    return async_to_sync(read)()
+
+
+def slow_source(items, delay=0.01):
+    """Iterador bloqueante tipo SDK que anota cuántos elementos produjo y si se cerró."""
+    state = SimpleNamespace(produced=0, closed=threading.Event())
+
+    def source(*args, **kwargs):
+        try:
+            for item in items:
+                state.produced += 1
+                yield item
+                time.sleep(delay)
+        finally:
+            state.closed.set()
+    return source, state
+
+
+class ChatTestCase(TestCase):
+    def setUp(self):
+        # Los ids se reutilizan entre tests y la invalidación por on_commit no corre en TestCase
+        cache.clear()
+        self.user = User.objects.create_user('ana', password='x')
+        self.client.force_login(self.user)
+        self.session = InterviewSession.objects.create(user=self.user, session_type='it', title='Entrevista')
+        self.gemini = get_gemini_service()
+
+    def ai_message(self, tts_status='pending', content='Pregunta 1/7: ¿Por qué este rol?'):
+        return ChatMessage.objects.create(
+            session=self.session, is_user=False, content=content, tts_voice='Leda', tts_status=tts_status,
+        )
+
+
+class ClaimTTSTests(ChatTestCase):
+    def test_only_one_of_two_concurrent_claims_wins(self):
+        # Ambos trabajadores vieron el mensaje 'pending' antes de reservarlo
+        message = self.ai_message()
+        self.assertEqual([claim_tts(message.id), claim_tts(message.id)], [True, False])
+        message.refresh_from_db()
+        self.assertEqual(message.tts_status, 'processing')
+
+    def test_failed_synthesis_can_be_claimed_again_but_ready_cannot(self):
+        self.assertTrue(claim_tts(self.ai_message(tts_status='failed').id))
+        self.assertFalse(claim_tts(self.ai_message(tts_status='ready').id))
+
+    def test_background_job_skips_message_claimed_by_stream(self):
+        message = self.ai_message()
+        self.assertTrue(claim_tts(message.id))
+        with mock.patch.object(self.gemini, 'text_to_speech') as text_to_speech:
+            result = generate_and_save_tts(message.id, voice_name='Leda')
+        self.assertEqual(result, {'success': False, 'error': 'Already claimed'})
+        text_to_speech.assert_not_called()
+
+    def test_stream_returns_409_while_background_job_holds_claim(self):
+        message = self.ai_message()
+        self.assertTrue(claim_tts(message.id))
+        response = self.client.get(f'/api/messages/{message.id}/audio/stream/')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['tts_status'], 'processing')
+
+
+class SendMessageTTSTests(ChatTestCase):
+    def send(self, **extra):
+        payload = {'message': 'Hola', 'session_id': self.session.id, **extra}
+        generate = mock.AsyncMock(return_value='Pregunta 1/7: ¿Por qué este rol?')
+        with mock.patch.object(self.gemini, 'generate_response', generate), \
+                mock.patch.object(api_views, 'dispatch_task') as dispatch:
+            response = self.client.post('/api/send-message/', json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['ai_response'], dispatch
+
+    def test_reply_returns_before_tts_and_queues_background_job(self):
+        ai_response, dispatch = self.send()
+        self.assertEqual(ai_response['tts_status'], 'pending')
+        self.assertIsNone(ai_response['audio_url'])
+        dispatch.assert_called_once_with(generate_and_save_tts, ai_response['id'], voice_name='Leda')
+
+    def test_stream_delivery_leaves_synthesis_to_the_stream_endpoint(self):
+        ai_response, dispatch = self.send(audio_delivery='stream')
+        self.assertEqual(ai_response['tts_status'], 'pending')
+        dispatch.assert_not_called()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, TTS_AUDIO_FORMATS=['ogg', 'mp3'])
+class StreamAudioTests(ChatTestCase):
+    def stream(self, message, chunks, error=None):
+        def iter_tts_chunks(text, voice_name):
+            for chunk in chunks:
+                yield chunk, PCM_MIME
+            if error is not None:
+                raise error
+
+        with mock.patch.object(self.gemini, 'cached_tts_audio', return_value=None), \
+                mock.patch.object(self.gemini, 'iter_tts_chunks', iter_tts_chunks), \
+                mock.patch.object(api_views, 'dispatch_task') as view_dispatch, \
+                mock.patch.object(tasks, 'dispatch_task') as task_dispatch:
+            response = self.client.get(f'/api/messages/{message.id}/audio/stream/')
+            self.assertEqual(response.status_code, 200)
+            body = consume(response)
+        message.refresh_from_db()
+        return body, view_dispatch, task_dispatch
+
+    def test_failed_stream_falls_back_to_background_job(self):
+        message = self.ai_message()
+        _, view_dispatch, _ = self.stream(message, [b'\x00' * 480], error=RuntimeError('Gemini 503'))
+        self.assertEqual(message.tts_status, 'pending')
+        self.assertFalse(message.audio_file)
+        view_dispatch.assert_called_once_with(generate_and_save_tts, message.id, voice_name='Leda')
+
+    def test_completed_stream_saves_audio_and_queues_encoding(self):
+        message = self.ai_message(content='Pregunta 2/7: Cuéntame de un conflicto.')
+        body, view_dispatch, task_dispatch = self.stream(message, [b'\x00' * 480, b'\x01' * 480])
+        self.assertTrue(body.startswith(b'RIFF'))
+        self.assertEqual(message.tts_status, 'ready')
+        self.assertTrue(message.audio_file.name.endswith('.wav'))
+        view_dispatch.assert_not_called()
+        # ffmpeg no corre en la petición: las variantes se encolan
+        task_dispatch.assert_called_once()
+        self.assertIs(task_dispatch.call_args.args[0], encode_message_audio)
+        self.assertEqual(task_dispatch.call_args.args[1], message.id)
+
+    def test_client_disconnect_stops_synthesis_without_requeueing(self):
+        message = self.ai_message()
+        source, state = slow_source([(b'\x00' * 480, PCM_MIME)] * 200)
+        with mock.patch.object(self.gemini, 'cached_tts_audio', return_value=None), \
+                mock.patch.object(self.gemini, 'iter_tts_chunks', source), \
+                mock.patch.object(api_views, 'dispatch_task') as view_dispatch:
+            response = self.client.get(f'/api/messages/{message.id}/audio/stream/')
+            # Cabecera WAV + primer fragmento PCM
+            disconnect_after(response, chunks=2)
+        self.assertTrue(state.closed.wait(2))
+        self.assertLess(state.produced, 200)
+        message.refresh_from_db()
+        self.assertEqual(message.tts_status, 'pending')
+        self.assertFalse(message.audio_file)
+        view_dispatch.assert_not_called()
+
+
+class ProgresoDataTests(ChatTestCase):
+    def test_provisional_timer_report_is_a_gap_not_a_zero(self):
+        from evaluation.models import FeedbackReport
+
+        FeedbackReport.objects.create(
+            session=self.session, overall_feedback='Bien', average_score=7.0, performance_level='Bueno',
+            time_management_score=8.0,
+        )
+        timed = InterviewSession.objects.create(user=self.user, session_type='it', title='Cerrada', total_time_used=900)
+        timed.finish_timer()
+
+        data = self.client.get('/progreso/data/').json()
+        self.assertEqual(data['sessions_scores'], [7.0, None])
+        self.assertEqual(data['sessions_time_scores'], [8.0, None])
+        self.assertEqual(data['average_score'], 7.0)
+        self.assertEqual(data['average_time_score'], 8.0)
+
+
+class StreamCancellationTests(ChatTestCase):
+    def test_closing_the_stream_stops_the_producer_thread(self):
+        source, state = slow_source(range(200))
+
+        async def take_first():
+            stream = self.gemini._stream_blocking(source)
+            first = await stream.__anext__()
+            await stream.aclose()
+            return first
+
+        self.assertEqual(async_to_sync(take_first)(), 0)
+        self.assertTrue(state.closed.wait(2))
+        self.assertLess(state.produced, 200)
+
+    def test_sse_disconnect_stops_reading_the_model_stream(self):
+        source, state = slow_source([SimpleNamespace(text=f'palabra{i} ') for i in range(200)])
+        payload = {'message': 'Hola', 'session_id': self.session.id}
+        with mock.patch.object(self.gemini, 'model', SimpleNamespace(generate_content=source)):
+            response = self.client.post('/api/send-message/stream/', json.dumps(payload), content_type='application/json')
+            # Evento start + primer token
+            received = disconnect_after(response, chunks=2)
+        self.assertIn(b'palabra0', received[-1])
+        self.assertTrue(state.closed.wait(2))
+        self.assertLess(state.produced, 200)
+
+class GeminiRegistryTests(SimpleTestCase):
+    def setUp(self):
+        gemini_registry.reset()
+        self.addCleanup(gemini_registry.reset)
+        patcher = mock.patch('interview_trainer.services.genai')
+        self.genai = patcher.start()
+        self.genai.GenerativeModel.side_effect = lambda name: mock.Mock(model_name=name)
+        self.addCleanup(patcher.stop)
+
+    def test_service_is_rebuilt_when_the_api_key_changes(self):
+        with override_settings(GEMINI_API_KEY='clave-a'):
+            first = get_gemini_service()
+            self.assertIs(get_gemini_service(), first)
+        with override_settings(GEMINI_API_KEY='clave-b'):
+            second = get_gemini_service()
+            self.assertIs(get_gemini_service(), second)
+
+        self.assertIsNot(second, first)
+        self.assertEqual(second.api_key, 'clave-b')
+        self.assertIsNot(second.model, first.model)
+        self.genai.configure.assert_called_with(api_key='clave-b')
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_single_ranges(self):
+        self.assertEqual(_parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(_parse_range('bytes=500-', 1000), (500, 999))
+        self.assertEqual(_parse_range('bytes=-100', 1000), (900, 999))
+
+    def test_end_and_suffix_are_clamped_to_the_file(self):
+        self.assertEqual(_parse_range('bytes=900-5000', 1000), (900, 999))
+        self.assertEqual(_parse_range('bytes=-5000', 1000), (0, 999))
+
+    def test_unsatisfiable_ranges(self):
+        for header in ('bytes=1000-', 'bytes=-0', 'bytes=50-10'):
+            with self.subTest(header=header):
+                self.assertIs(_parse_range(header, 1000), False)
+
+    def test_missing_multi_or_malformed_ranges_are_ignored(self):
+        for header in (None, '', 'bytes=-', 'bytes=0-1,5-9', 'items=0-99', 'bytes=a-b'):
+            with self.subTest(header=header):
+                self.assertIsNone(_parse_range(header, 1000))
+
+
+class StoredAudioTestCase(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.message = self.ai_message(tts_status='ready')
+        # Nombre único: los ids se reutilizan entre tests y las variantes quedarían de otro test
+        name = f'chat_audio/test_{uuid.uuid4().hex}.wav'
+        self.path = os.path.join(MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'wb') as f:
+            f.write(bytes(range(256)) * 4)
+        self.message.audio_file.name = name
+        self.message.save(update_fields=['audio_file'])
+        self.url = f'/api/messages/{self.message.id}/audio/'
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, TTS_AUDIO_FORMATS=[])
+class MessageAudioTests(StoredAudioTestCase):
+    def test_range_request_returns_partial_content(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10, 20)))
+
+    def test_unsatisfiable_range_returns_416(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2048-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_etag_survives_cache_hit_touching_the_shared_inode(self):
+        etag = self.client.head(self.url)['ETag']
+        # tts_cache.get hace os.utime sobre el inodo que comparte con chat_audio
+        os.utime(self.path, (2_000_000_000, 2_000_000_000))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+
+def fake_encode(encoder, source_path):
+    """ffmpeg simulado: escribe la variante con su formato como contenido."""
+    path = encoder.variant_path(source_path)
+    with open(path, 'wb') as f:
+        f.write(encoder.format.encode())
+    return path
+
+
+# Sin override de TTS_AUDIO_FORMATS: el contrato se prueba con la configuración por defecto
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class AudioVariantNegotiationTests(StoredAudioTestCase):
+    def encode(self):
+        with mock.patch.object(FfmpegEncoder, 'available', return_value=True), \
+                mock.patch.object(FfmpegEncoder, 'encode', fake_encode):
+            encode_message_audio(self.message.id)
+        self.message.refresh_from_db()
+
+    def fetch(self, fmt):
+        response = self.client.get(self.url, {'format': fmt})
+        body = b''.join(response.streaming_content) if response.status_code == 200 else b''
+        return response.status_code, body
+
+    def test_wav_is_served_while_variants_are_pending(self):
+        status_code, body = self.fetch('ogg')
+        self.assertEqual(status_code, 200)
+        self.assertTrue(body.startswith(bytes(range(16))))
+
+    def test_default_settings_keep_the_wav_as_fallback(self):
+        self.encode()
+        self.assertTrue(self.message.audio_file.name.endswith('.ogg'))
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(self.fetch('ogg'), (200, b'ogg'))
+        self.assertEqual(self.fetch('mp3'), (200, b'mp3'))
+        self.assertEqual(self.fetch('wav')[1], bytes(range(256)) * 4)
+
+    @override_settings(TTS_AUDIO_FORMATS=['ogg'])
+    def test_discarded_wav_is_not_replaced_by_another_format(self):
+        self.encode()
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(self.fetch('ogg'), (200, b'ogg'))
+        self.assertEqual(self.fetch('wav')[0], 406)
+        self.assertEqual(self.fetch('mp3')[0], 406)
+        # Sin ?format= explícito se sirve la variante guardada
+        self.assertEqual(b''.join(self.client.get(self.url).streaming_content), b'ogg')
@@ -0,0 +1,223 @@
+import hashlib
+import logging
+import os
+import threading
+import unicodedata
+import uuid
+
+from django.conf import settings
+
+from .audio_encoding import ENCODERS, WAV_ENCODER, encode_variants
+
+logger = logging.getLogger(__name__)
+
+
+class TTSAudioCache:
+    """
+    🗄️ PROPÓSITO: Caché de audio TTS direccionada por contenido
+    📝 QUÉ HACE: Guarda cada síntesis en MEDIA_ROOT/<TTS_CACHE_DIR>/ con clave
+    sha256(texto normalizado, voz, modelo); las frases repetidas (saludo de respaldo,
+    cierre de las 7 preguntas, ...) se sirven sin volver a llamar a Gemini
+    ⚠️  IMPORTANTE: Tamaño acotado por TTS_CACHE_MAX_BYTES con expulsión LRU (por mtime).
+    Una entrada es el audio sintetizado más sus variantes comprimidas (mismo nombre base)
+    y se expulsa completa
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self._root = root
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None  # Se calcula de forma perezosa al primer put()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def root(self):
+        return self._root or os.path.join(settings.MEDIA_ROOT, getattr(settings, 'TTS_CACHE_DIR', 'tts_cache'))
+
+    @property
+    def max_bytes(self):
+        if self._max_bytes is not None:
+            return self._max_bytes
+        return getattr(settings, 'TTS_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'TTS_CACHE_ENABLED', True)
+
+    @staticmethod
+    def normalize_text(text):
+        """Normaliza Unicode y espacios para que variaciones triviales compartan entrada."""
+        return ' '.join(unicodedata.normalize('NFC', text or '').split())
+
+    @classmethod
+    def make_key(cls, text, voice_name, model_name):
+        payload = '\x1f'.join([cls.normalize_text(text), voice_name or '', model_name or ''])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _dir_for(self, key):
+        return os.path.join(self.root, key[:2])
+
+    @staticmethod
+    def _is_variant(name):
+        ext = os.path.splitext(name)[1].lower()
+        return any(encoder.ext == ext for encoder in ENCODERS.values() if encoder is not WAV_ENCODER)
+
+    def _find(self, key):
+        # El audio original de la entrada (las variantes comprimidas no son aciertos)
+        directory = self._dir_for(key)
+        try:
+            for entry in os.scandir(directory):
+                if (entry.name.startswith(key + '.') and not entry.name.endswith('.tmp')
+                        and not self._is_variant(entry.name)):
+                    return entry.path
+        except FileNotFoundError:
+            pass
+        return None
+
+    def contains(self, path):
+        """True si la ruta está dentro del directorio de la caché."""
+        root = os.path.abspath(self.root)
+        return os.path.commonpath([os.path.abspath(path), root]) == root
+
+    def relative_name(self, path):
+        """Ruta relativa a MEDIA_ROOT (para construir URLs o FileFields)."""
+        return os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+
+    def get(self, text, voice_name, model_name):
+        """
+        🔍 Devuelve {'key', 'path', 'size', 'ext'} si hay acierto, o None.
+        Cada acierto actualiza el mtime del archivo (orden LRU). No lee el audio:
+        el archivo se enlaza/sirve directamente desde disco.
+        """
+        if not self.enabled:
+            return None
+        key = self.make_key(text, voice_name, model_name)
+        path = self._find(key)
+        if path is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path, None)
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            # Expulsado entre el scandir y la lectura
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        logger.debug(f"🗄️ TTS cache HIT {key[:12]} (hits={self.hits}, misses={self.misses})")
+        return {
+            'key': key,
+            'path': path,
+            'size': size,
+            'ext': os.path.splitext(path)[1],
+        }
+
+    def put(self, text, voice_name, model_name, audio_bytes, ext='.wav'):
+        """💾 Guarda el audio de forma atómica y aplica el límite de tamaño. Devuelve la ruta."""
+        if not self.enabled:
+            return None
+        key = self.make_key(text, voice_name, model_name)
+        directory = self._dir_for(key)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{key}{ext}")
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(audio_bytes)
+        existed = os.path.exists(path)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total_bytes()
+            elif not existed:
+                self._total_bytes += len(audio_bytes)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+        return path
+
+    def ensure_variants(self, path):
+        """
+        🎚️ Variantes comprimidas de una entrada, codificadas solo la primera vez
+        (los aciertos siguientes enlazan los mismos archivos). Devuelve {formato: ruta}.
+        """
+        before = {fmt: os.path.exists(ENCODERS[fmt].variant_path(path)) for fmt in ENCODERS if fmt != 'wav'}
+        variants = encode_variants(path)
+        added = sum(os.path.getsize(p) for fmt, p in variants.items() if not before.get(fmt))
+        if added:
+            with self._lock:
+                if self._total_bytes is not None:
+                    self._total_bytes += added
+                    if self._total_bytes > self.max_bytes:
+                        self._evict()
+        return variants
+
+    def _iter_entries(self):
+        if not os.path.isdir(self.root):
+            return
+        for sub in os.scandir(self.root):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    yield entry
+
+    def _scan_total_bytes(self):
+        return sum(entry.stat().st_size for entry in self._iter_entries())
+
+    def _evict(self):
+        """🧹 Borra las entradas menos usadas hasta quedar por debajo del 90% del límite."""
+        entries = {}
+        for entry in self._iter_entries():
+            stat = entry.stat()
+            stem = os.path.join(os.path.dirname(entry.path), entry.name.split('.', 1)[0])
+            mtime, size, paths = entries.get(stem, (0, 0, []))
+            entries[stem] = (max(mtime, stat.st_mtime), size + stat.st_size, paths + [entry.path])
+        total = sum(size for _, size, _ in entries.values())
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for _, size, paths in sorted(entries.values()):
+            if total <= target:
+                break
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            evicted += 1
+        self._total_bytes = total
+        if evicted:
+            logger.info(f"🧹 TTS cache: {evicted} entradas expulsadas (total {total} bytes)")
+
+    def stats(self):
+        """
+        📊 Contadores de aciertos/fallos y tamaño actual.
+        Aciertos y fallos son del proceso actual; entradas y bytes se leen del disco.
+        """
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        files = list(self._iter_entries())
+        return {
+            'scope': 'process',
+            'enabled': self.enabled,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / lookups, 3) if lookups else 0.0,
+            'entries': len({entry.name.split('.', 1)[0] for entry in files}),
+            'files': len(files),
+            'bytes': sum(entry.stat().st_size for entry in files),
+            'max_bytes': self.max_bytes,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+tts_cache = TTSAudioCache()
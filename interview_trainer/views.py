@@ -9,11 +9,13 @@ from django.contrib import messages
 from urllib3 import request
 from .models import InterviewSession, ChatMessage, UserProfile
 from django.http import JsonResponse
-from .services import GeminiService
+from django.db.models import Avg, Case, F, Q, When
+from .services import get_gemini_service
+from .decorators import async_login_required
+from asgiref.sync import sync_to_async
 import asyncio
 
 logger = logging.getLogger(__name__)
-gemini_service = GeminiService()
 
 def home(request):
     """
@@ -48,18 +50,19 @@ def register(request):
     
     return render(request, 'registration/register.html', {'form': form})
 
-@login_required
-def select_interview_type(request):
+@async_login_required
+async def select_interview_type(request):
     """
     🎭 PROPÓSITO: Selección del tipo de entrevista antes de iniciar
     📝 QUÉ HACE: Permite elegir el rol del entrevistador
+    ⚡ CAMBIO: Vista async nativa; el saludo se genera sin crear un event loop por petición
     """
     if request.method == 'POST':
         interview_type = request.POST.get('interview_type', 'operations')
         session_title = request.POST.get('session_title', f'Sesión {interview_type}')
         
         # Crear nueva sesión con el tipo seleccionado
-        session = InterviewSession.objects.create(
+        session = await InterviewSession.objects.acreate(
             user=request.user,
             session_type=interview_type,
             title=session_title
@@ -67,21 +70,13 @@ def select_interview_type(request):
         
         # 🎯 GENERAR MENSAJE INICIAL DE LUMO AUTOMÁTICAMENTE
         try:
-            from .services import GeminiService
-            import asyncio
-            
-            gemini_service = GeminiService()
+            gemini_service = get_gemini_service()
             
             # ✅ USAR EL MÉTODO DEL SERVICIO
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            initial_message = loop.run_until_complete(
-                gemini_service.generate_initial_welcome(interview_type)
-            )
-            loop.close()
+            initial_message = await gemini_service.generate_initial_welcome(interview_type)
             
             # Guardar el mensaje inicial de Lumo
-            ChatMessage.objects.create(
+            await ChatMessage.objects.acreate(
                 session=session,
                 is_user=False,  # Es mensaje de la IA
                 content=initial_message
@@ -107,7 +102,7 @@ def select_interview_type(request):
             dept_name = department_names.get(interview_type, 'Operaciones y Producción')
             fallback_message = f"¡Hola! 👋 Soy Lumo, tu entrevistador especializado en {dept_name}. Me da mucho gusto conocerte y estoy emocionado de conocer más sobre tu experiencia profesional. Para comenzar, ¿podrías contarme un poco sobre ti y qué te motiva a aplicar para una posición en {dept_name}?"
             
-            ChatMessage.objects.create(
+            await ChatMessage.objects.acreate(
                 session=session,
                 is_user=False,
                 content=fallback_message
@@ -117,13 +112,14 @@ def select_interview_type(request):
         return redirect('interview_trainer:chat_session', session_id=session.id)
     
     # Obtener perfil para sugerencias
-    profile, created = UserProfile.objects.get_or_create(user=request.user)
+    profile, created = await UserProfile.objects.aget_or_create(user=request.user)
     
     context = {
         'profile': profile,
         'interview_types': InterviewSession.INTERVIEW_TYPES
     }
-    return render(request, 'interview_trainer/select_type.html', context)
+    # El render puede tocar la DB desde los templates: se ejecuta en un hilo
+    return await sync_to_async(render)(request, 'interview_trainer/select_type.html', context)
 
 @login_required
 def chat_session(request, session_id):
@@ -156,7 +152,7 @@ def chat_session(request, session_id):
                 # 🧠 4. Llamar a Gemini para texto + audio
                 # generate_response_with_tts es async, así que usamos asyncio.run
                 result = asyncio.run(
-                    gemini_service.generate_response_with_tts(
+                    get_gemini_service().generate_response_with_tts(
                         message=user_message,
                         conversation_history=conversation_history,
                         interview_type=session.interview_type if hasattr(session, "interview_type") else "operations",
@@ -273,56 +269,69 @@ def progreso_view(request):
 def progreso_data(request):
     """
     API: Devuelve datos de progreso del usuario para los charts
+    ⚠️  IMPORTANTE: Cacheado por usuario; se invalida al guardar una evaluación
+    o al crear/eliminar sesiones (ver evaluation.signals)
+    """
+    from evaluation.analytics_cache import get_user_data
+    return JsonResponse(get_user_data(request.user.id, 'progreso', _build_progreso_data))
+
+
+def _build_progreso_data(user_id):
+    """
+    📈 PROPÓSITO: Calcula las series de los charts de progreso
+    📝 QUÉ HACE: Tres consultas (sesiones + reporte, promedios recientes y
+    puntajes por sesión/competencia) que se pivotan en memoria
     """
-    user = request.user
     from evaluation.models import FeedbackReport, CompetencyScore, CompetencyDefinition
 
-    # Tomar las sesiones evaluadas más recientes (hasta 12 para una buena vista)
-    sessions = InterviewSession.objects.filter(user=user).order_by('created_at')
-    sessions = sessions.order_by('-created_at')[:12][::-1]  # ordenar cronológicamente asc
-
-    # Series de evolución por sesión (usar feedback_report.average_score cuando exista)
-    sessions_labels = []
-    sessions_scores = []
-    for s in sessions:
-        sessions_labels.append(s.created_at.strftime('%d/%m/%Y'))
-        feedback = getattr(s, 'feedback_report', None)
-        if feedback and feedback.average_score is not None:
-            sessions_scores.append(round(feedback.average_score, 2))
-        else:
-            # si no hay feedback, colocar None para que la gráfica muestre huecos
-            sessions_scores.append(None)
-    # Serie de puntajes de gestión del tiempo (por sesión)
-    sessions_time_scores = []
-    for s in sessions:
-        feedback = getattr(s, 'feedback_report', None)
-        if feedback and getattr(feedback, 'time_management_score', None) is not None:
-            sessions_time_scores.append(round(feedback.time_management_score, 2))
-        else:
-            sessions_time_scores.append(None)
+    # Tomar las sesiones más recientes (hasta 12) con su reporte en la misma consulta.
+    # El reporte provisional de finish_timer (sin performance_level) aún no es una evaluación
+    evaluated = ~Q(feedback_report__performance_level='')
+    sessions = list(
+        InterviewSession.objects.filter(user_id=user_id)
+        .order_by('-created_at')
+        .values(
+            'id', 'created_at',
+            evaluation_score=Case(When(evaluated, then=F('feedback_report__average_score'))),
+            time_score=Case(When(evaluated, then=F('feedback_report__time_management_score'))),
+        )[:12]
+    )
+    sessions.reverse()  # ordenar cronológicamente asc
+
+    # Series de evolución por sesión (None = sin feedback, la gráfica muestra huecos)
+    def rounded(value):
+        return round(value, 2) if value is not None else None
+
+    sessions_labels = [s['created_at'].strftime('%d/%m/%Y') for s in sessions]
+    sessions_scores = [rounded(s['evaluation_score']) for s in sessions]
+    sessions_time_scores = [rounded(s['time_score']) for s in sessions]
 
     # Puntaje promedio calculado sobre feedbacks existentes
-    feedbacks = FeedbackReport.objects.filter(session__user=user).order_by('-generated_at')[:50]
-    scores = [f.average_score for f in feedbacks if f.average_score is not None]
+    feedbacks = list(
+        FeedbackReport.objects.filter(session__user_id=user_id).exclude(performance_level='')
+        .order_by('-generated_at')
+        .values_list('average_score', 'time_management_score')[:50]
+    )
+    scores = [score for score, _ in feedbacks if score is not None]
     average_score = round(sum(scores) / len(scores), 2) if scores else 0
     # Promedio de gestión de tiempo global
-    time_scores = [f.time_management_score for f in feedbacks if f.time_management_score is not None]
+    time_scores = [time_score for _, time_score in feedbacks if time_score is not None]
     average_time_score = round(sum(time_scores) / len(time_scores), 2) if time_scores else 0
 
-    # Competencias: obtener definiciones activas y construir series por cada competencia
-    competencies = list(CompetencyDefinition.get_default_competencies())
-    skills_labels = [c.name for c in competencies]
-    skills_series = {c.name: [] for c in competencies}
-
-    # Para cada sesión, calcular el puntaje promedio por competencia (1-10). Si falta, None.
-    for s in sessions:
-        for comp in competencies:
-            comp_scores = CompetencyScore.objects.filter(session=s, competency_name=comp.name)
-            if comp_scores.exists():
-                avg = round(sum(cs.score for cs in comp_scores) / comp_scores.count(), 2)
-                skills_series[comp.name].append(avg)
-            else:
-                skills_series[comp.name].append(None)
+    # Competencias activas (cache del proceso, sin consultas)
+    skills_labels = [c.name for c in CompetencyDefinition.get_default_competencies()]
+
+    # Promedio por (sesión, competencia) en una sola consulta agrupada
+    averages = {
+        (row['session_id'], row['competency_name']): row['avg_score']
+        for row in CompetencyScore.objects.filter(
+            session_id__in=[s['id'] for s in sessions], competency_name__in=skills_labels,
+        ).values('session_id', 'competency_name').annotate(avg_score=Avg('score')).order_by()
+    }
+    skills_series = {
+        name: [rounded(averages.get((s['id'], name))) for s in sessions]
+        for name in skills_labels
+    }
 
     # Construir serie acumulada (running average) por competencia
     skills_series_cumulative = {}
@@ -340,7 +349,7 @@ def progreso_data(request):
                 cum.append(None if scount == 0 else round(ssum / scount, 2))
         skills_series_cumulative[name] = cum
 
-    return JsonResponse({
+    return {
         'average_score': average_score,
         'average_time_score': average_time_score,
         'sessions_labels': sessions_labels,
@@ -349,12 +358,12 @@ def progreso_data(request):
         'skills_labels': skills_labels,
         'skills_series': skills_series,
         'skills_series_cumulative': skills_series_cumulative,
-    })
+    }
 
 async def chat_tts_page(request):
     if request.method == "POST":
         message = request.POST.get("message")
-        result = await gemini_service.generate_response_with_tts(message)
+        result = await get_gemini_service().generate_response_with_tts(message)
         return render(request, "interview_trainer/chat.html", {
             "reply_text": result["reply_text"],
             "audio_url": result["audio_url"],
@@ -64,12 +64,43 @@ TEMPLATES = [
 WSGI_APPLICATION = 'lumo_project.wsgi.application'
 
 # Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite por defecto (cero configuración). En producción: DB_ENGINE=postgresql
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='lumo'),
+            'USER': config('DB_USER', default='lumo'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='127.0.0.1'),
+            'PORT': config('DB_PORT', default='5432'),
+            # Conexiones persistentes (segundos; 0 = una por petición) con chequeo antes de reutilizar
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            # Detrás de PgBouncer en modo transacción no se pueden usar cursores de servidor
+            'DISABLE_SERVER_SIDE_CURSORS': config('DB_PGBOUNCER', default=False, cast=bool),
+            'OPTIONS': {
+                'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+                'application_name': 'lumo',
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+            'OPTIONS': {
+                # Segundos que una escritura espera el lock del archivo antes de fallar
+                'timeout': config('SQLITE_BUSY_TIMEOUT', default=20, cast=int),
+            },
+        }
     }
-}
+
+# 📝 SQLite: modo WAL (lecturas concurrentes con una escritura) aplicado al conectar
+SQLITE_WAL = config('SQLITE_WAL', default=True, cast=bool)
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -124,6 +155,9 @@ CORS_ALLOW_CREDENTIALS = True
 # 🔑 TU API KEY CENTRALIZADA (solo tú la configuras)
 GEMINI_API_KEY = config('GEMINI_API_KEY', default='')
 
+# ⚡ Máximo de llamadas simultáneas a Gemini por proceso (pool de hilos acotado)
+GEMINI_MAX_CONCURRENCY = config('GEMINI_MAX_CONCURRENCY', default=32, cast=int)
+
 # Login/Logout URLs
 LOGIN_URL = '/auth/login/'
 LOGIN_REDIRECT_URL = '/'
@@ -139,6 +173,46 @@ CSRF_COOKIE_SAMESITE = 'Lax'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
-# Celery (opcional: redis por defecto)
-CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
-CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default=CELERY_BROKER_URL)
+# 🗄️ Caché de audio TTS direccionada por contenido (MEDIA_ROOT/TTS_CACHE_DIR)
+TTS_CACHE_ENABLED = config('TTS_CACHE_ENABLED', default=True, cast=bool)
+TTS_CACHE_DIR = 'tts_cache'
+TTS_CACHE_MAX_BYTES = config('TTS_CACHE_MAX_BYTES', default=200 * 1024 * 1024, cast=int)
+
+# 🎚️ Variantes comprimidas del audio TTS (requiere ffmpeg; sin él se guarda y sirve WAV).
+# El orden es el de preferencia. 'wav' conserva el WAV como respaldo para clientes que no
+# reproducen los comprimidos; quitarlo de la lista lo descarta tras codificar
+TTS_AUDIO_FORMATS = config('TTS_AUDIO_FORMATS', default='ogg,mp3,wav', cast=lambda v: [f.strip() for f in v.split(',') if f.strip()])
+FFMPEG_BINARY = config('FFMPEG_BINARY', default='ffmpeg')
+TTS_ENCODE_TIMEOUT = config('TTS_ENCODE_TIMEOUT', default=30, cast=int)
+
+# Celery (opcional). Sin CELERY_BROKER_URL los trabajos en segundo plano (TTS, etc.)
+# se ejecutan en un pool de hilos local del propio proceso.
+# Ejemplo: CELERY_BROKER_URL=redis://localhost:6379/0
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='')
+CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default=CELERY_BROKER_URL or None)
+
+# Hilos del pool local para trabajos en segundo plano cuando no hay broker
+LOCAL_TASK_WORKERS = config('LOCAL_TASK_WORKERS', default=4, cast=int)
+
+# ⚙️ Evaluación en segundo plano: reintentos con backoff exponencial
+EVALUATION_JOB_MAX_ATTEMPTS = config('EVALUATION_JOB_MAX_ATTEMPTS', default=4, cast=int)
+EVALUATION_JOB_BACKOFF_SECONDS = config('EVALUATION_JOB_BACKOFF_SECONDS', default=10, cast=int)
+# Trabajos 'running' sin cambios durante estos minutos se retoman al arrancar un worker
+EVALUATION_JOB_STALE_MINUTES = config('EVALUATION_JOB_STALE_MINUTES', default=15, cast=int)
+
+# 🗄️ Cache de Django: memoria local por defecto; para varios procesos usar un backend
+# compartido, p. ej. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# y CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='lumo-default'),
+        'KEY_PREFIX': config('CACHE_KEY_PREFIX', default='lumo'),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+    }
+}
+
+# Cache por usuario de datos de progreso/analytics (se invalida al guardar evaluaciones)
+ANALYTICS_CACHE_TIMEOUT = config('ANALYTICS_CACHE_TIMEOUT', default=300, cast=int)
+# Segundos que cada proceso reutiliza las competencias activas antes de releerlas
+COMPETENCY_CACHE_TTL = config('COMPETENCY_CACHE_TTL', default=300, cast=int)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark de escrituras concurrentes contra la base de datos configurada.
+
+Simula lo que ocurre con varios usuarios a la vez: mensajes del usuario, respuestas de
+Lumo (que además incrementan InterviewSession.questions_asked en una transacción) y
+ticks del temporizador. Cada hilo usa su propia conexión, como los workers del servidor.
+
+  - SQLite (por defecto): trabaja sobre un archivo temporal migrado y compara el
+    journal clásico (DELETE) con WAL + busy_timeout (lo que aplica interview_trainer.db).
+  - PostgreSQL (DB_ENGINE=postgresql ...): usa la base configurada con un usuario de
+    prueba que se elimina al terminar.
+
+Ejemplo de uso:
+  python scripts/bench_db_writes.py
+  python scripts/bench_db_writes.py --threads 1 4 8 16 --ops 300
+  DB_ENGINE=postgresql DB_NAME=lumo DB_USER=lumo DB_PASSWORD=... python scripts/bench_db_writes.py
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import threading
+
+# Ajustar path para que el paquete lumo_project sea importable
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lumo_project.settings')
+
+# SQLite: nunca tocar db.sqlite3; se trabaja sobre un archivo temporal
+TMP_DIR = None
+if os.environ.get('DB_ENGINE', 'sqlite') != 'postgresql':
+    TMP_DIR = tempfile.mkdtemp(prefix='lumo-bench-')
+    os.environ['DB_NAME'] = os.path.join(TMP_DIR, 'template.sqlite3')
+
+import django
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.db.models import F
+
+from interview_trainer.models import ChatMessage, InterviewSession
+
+
+def write_op(kind, session_id, n):
+    if kind == 0:
+        ChatMessage.objects.create(session_id=session_id, is_user=True, content=f'respuesta {n}')
+    elif kind == 1:
+        # Mensaje de Lumo: INSERT + UPDATE del contador en una transacción
+        ChatMessage.objects.create(session_id=session_id, is_user=False, content=f'Pregunta {n}/7')
+    else:
+        # Tick del temporizador
+        InterviewSession.objects.filter(id=session_id).update(total_time_used=F('total_time_used') + 1)
+
+
+def worker(index, session_ids, ops, barrier, latencies, errors):
+    barrier.wait()
+    local_latencies = []
+    local_errors = 0
+    for n in range(ops):
+        start = time.perf_counter()
+        try:
+            write_op(n % 3, session_ids[(index + n) % len(session_ids)], n)
+            local_latencies.append(time.perf_counter() - start)
+        except OperationalError:
+            # "database is locked": la escritura no consiguió el lock a tiempo
+            local_errors += 1
+    connections.close_all()
+    latencies.extend(local_latencies)
+    errors.append(local_errors)
+
+
+def run(threads, ops, session_ids):
+    barrier = threading.Barrier(threads)
+    latencies, errors = [], []
+    pool = [
+        threading.Thread(target=worker, args=(i, session_ids, ops, barrier, latencies, errors))
+        for i in range(threads)
+    ]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0
+    return len(latencies) / elapsed, p95, sum(errors)
+
+
+def create_fixtures(sessions):
+    user, _ = User.objects.get_or_create(username='bench_db_writes')
+    session_ids = [
+        InterviewSession.objects.create(user=user, session_type='it', title=f'bench {i}').id
+        for i in range(sessions)
+    ]
+    return user, session_ids
+
+
+def use_sqlite_file(path, wal):
+    connections.close_all()
+    settings.SQLITE_WAL = wal
+    connection.settings_dict['NAME'] = path
+
+
+def print_header(title):
+    print(f"\n== {title} ==")
+    print(f"{'hilos':>6} | {'escrituras/s':>12} | {'p95 (ms)':>9} | {'bloqueos':>8}")
+    print('-' * 46)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de escrituras concurrentes en la base de datos')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--ops', type=int, default=200, help='Escrituras por hilo')
+    parser.add_argument('--sessions', type=int, default=8, help='Sesiones sobre las que se reparten las escrituras')
+    args = parser.parse_args()
+
+    if connection.vendor != 'sqlite':
+        user, session_ids = create_fixtures(args.sessions)
+        try:
+            print_header(f"{connection.vendor} (CONN_MAX_AGE={connection.settings_dict.get('CONN_MAX_AGE')})")
+            for threads in args.threads:
+                rate, p95, locked = run(threads, args.ops, session_ids)
+                print(f"{threads:>6} | {rate:>12.1f} | {p95:>9.1f} | {locked:>8}")
+        finally:
+            user.delete()
+        return
+
+    try:
+        # Base de plantilla migrada una vez; cada modo parte de una copia
+        template = connection.settings_dict['NAME']
+        use_sqlite_file(template, wal=False)
+        call_command('migrate', verbosity=0)
+        _, session_ids = create_fixtures(args.sessions)
+        connections.close_all()
+
+        for mode, wal in (('journal DELETE', False), ('WAL + busy_timeout', True)):
+            path = os.path.join(TMP_DIR, f"{'wal' if wal else 'delete'}.sqlite3")
+            shutil.copyfile(template, path)
+            use_sqlite_file(path, wal)
+            print_header(f"SQLite, {mode}")
+            for threads in args.threads:
+                rate, p95, locked = run(threads, args.ops, session_ids)
+                print(f"{threads:>6} | {rate:>12.1f} | {p95:>9.1f} | {locked:>8}")
+    finally:
+        connections.close_all()
+        shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark de concurrencia para GeminiService.generate_response.
+
+Usa un modelo falso con latencia artificial (no llama a la API real) y compara:
+  - "bloqueante": la llamada síncrona al SDK dentro de la corrutina (comportamiento anterior)
+  - "no bloqueante": el camino actual de GeminiService (pool de hilos acotado)
+
+Ejemplo de uso:
+  python scripts/bench_gemini_concurrency.py
+  python scripts/bench_gemini_concurrency.py --latency-ms 400 --concurrency 1 8 32 64
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+# Ajustar path para que el paquete lumo_project sea importable
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lumo_project.settings')
+import django
+django.setup()
+
+from interview_trainer.services import GeminiService
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Simula GenerativeModel.generate_content con una latencia fija."""
+
+    def __init__(self, latency_s):
+        self.latency_s = latency_s
+
+    def generate_content(self, prompt, generation_config=None):
+        time.sleep(self.latency_s)
+        return FakeResponse('Pregunta 2/7: ¿Qué harías si...?')
+
+
+async def blocking_generate(service, message):
+    # Réplica del comportamiento anterior: llamada síncrona dentro de la corrutina
+    response = service.model.generate_content(message)
+    return service._extract_response_text(response)
+
+
+async def non_blocking_generate(service, message):
+    return await service.generate_response(message=message, conversation_history=[])
+
+
+async def run_batch(func, service, concurrency):
+    start = time.perf_counter()
+    await asyncio.gather(*(func(service, f'respuesta {i}') for i in range(concurrency)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de throughput concurrente de GeminiService')
+    parser.add_argument('--latency-ms', type=int, default=250, help='Latencia simulada del modelo')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    service = GeminiService()
+    service.model = FakeModel(args.latency_ms / 1000.0)
+
+    print(f"Latencia simulada: {args.latency_ms} ms")
+    print(f"{'concurrencia':>12} | {'bloqueante (req/s)':>19} | {'no bloqueante (req/s)':>22} | {'speedup':>7}")
+    print('-' * 72)
+    for n in args.concurrency:
+        blocking_elapsed = asyncio.run(run_batch(blocking_generate, service, n))
+        async_elapsed = asyncio.run(run_batch(non_blocking_generate, service, n))
+        blocking_rps = n / blocking_elapsed
+        async_rps = n / async_elapsed
+        print(f"{n:>12} | {blocking_rps:>19.1f} | {async_rps:>22.1f} | {async_rps / blocking_rps:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Harness de carga para la API del chat (req/s y latencias p50/p95/p99).
+
+Inicia sesión con un usuario existente, lanza N peticiones con C clientes
+concurrentes contra un endpoint y guarda el resultado en JSON para compararlo.
+
+Para comparar el camino anterior (vista síncrona + event loop por petición) con
+las vistas ASGI nativas, levantar cada versión y ejecutar el harness contra ambas:
+
+  # versión anterior (WSGI)
+  git checkout <commit-anterior>
+  python manage.py runserver 8000
+  python scripts/loadtest_chat_api.py --base-url http://127.0.0.1:8000 \\
+      --username demo --password demo --session-id 1 --save old.json
+
+  # versión actual (ASGI)
+  uvicorn lumo_project.asgi:application --port 8001
+  python scripts/loadtest_chat_api.py --base-url http://127.0.0.1:8001 \\
+      --username demo --password demo --session-id 1 --save new.json
+
+  python scripts/loadtest_chat_api.py --compare old.json new.json
+
+Solo usa la librería estándar.
+"""
+import re
+import json
+import time
+import argparse
+import queue
+import statistics
+import http.cookiejar
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def build_client(base_url, username, password):
+    """Crea un opener con cookies de sesión autenticadas y devuelve (opener, csrftoken)."""
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+
+    login_url = f"{base_url}/auth/login/"
+    html = opener.open(login_url).read().decode('utf-8', 'replace')
+    match = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', html)
+    if not match:
+        raise SystemExit('No se encontró el token CSRF en la página de login')
+
+    data = urllib.parse.urlencode({
+        'csrfmiddlewaretoken': match.group(1),
+        'username': username,
+        'password': password,
+    }).encode()
+    request = urllib.request.Request(login_url, data=data, headers={'Referer': login_url})
+    opener.open(request).read()
+
+    csrftoken = next((c.value for c in jar if c.name == 'csrftoken'), '')
+    if not any(c.name == 'sessionid' for c in jar):
+        raise SystemExit('Login fallido: revisa usuario y contraseña')
+    return opener, csrftoken
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_load(args):
+    # Los logins se hacen antes de medir: cada cliente concurrente tiene su propia sesión
+    clients = queue.Queue()
+    for _ in range(args.concurrency):
+        clients.put(build_client(args.base_url, args.username, args.password))
+
+    def one_request(i):
+        opener, csrftoken = clients.get()
+        try:
+            return timed_request(opener, csrftoken, i)
+        finally:
+            clients.put((opener, csrftoken))
+
+    def timed_request(opener, csrftoken, i):
+        body = json.dumps({
+            'message': f'{args.message} #{i}',
+            'session_id': args.session_id,
+        }).encode()
+        request = urllib.request.Request(
+            f"{args.base_url}{args.path}",
+            data=body if args.method == 'POST' else None,
+            method=args.method,
+            headers={
+                'Content-Type': 'application/json',
+                'X-CSRFToken': csrftoken,
+                'Referer': args.base_url,
+            },
+        )
+        start = time.perf_counter()
+        try:
+            with opener.open(request, timeout=args.timeout) as response:
+                response.read()
+                ok = 200 <= response.status < 300
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            ok = False
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one_request, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [lat for lat, ok in results if ok]
+    errors = sum(1 for _, ok in results if not ok)
+    return {
+        'label': args.label or args.base_url,
+        'path': args.path,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+    }
+
+
+def print_result(result):
+    print(f"[{result['label']}] {result['path']}  n={result['requests']} c={result['concurrency']}")
+    print(f"  req/s: {result['rps']}  errores: {result['errors']}")
+    print(f"  p50: {result['p50_ms']} ms  p95: {result['p95_ms']} ms  p99: {result['p99_ms']} ms")
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print_result(old)
+    print_result(new)
+    if old['rps']:
+        print(f"\nreq/s: {new['rps'] / old['rps']:.2f}x")
+    if new['p99_ms']:
+        print(f"p99:   {old['p99_ms'] / new['p99_ms']:.2f}x más rápido")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Harness de carga para la API del chat')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--path', default='/api/send-message/')
+    parser.add_argument('--method', default='POST', choices=['GET', 'POST'])
+    parser.add_argument('--username')
+    parser.add_argument('--password')
+    parser.add_argument('--session-id', type=int)
+    parser.add_argument('--message', default='Respuesta de prueba de carga')
+    parser.add_argument('--requests', '-n', type=int, default=100)
+    parser.add_argument('--concurrency', '-c', type=int, default=20)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--label', help='Etiqueta para el resultado (p. ej. "wsgi" o "asgi")')
+    parser.add_argument('--save', help='Ruta donde guardar el resultado en JSON')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Compara dos resultados guardados')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if not (args.username and args.password):
+        parser.error('--username y --password son obligatorios')
+
+    result = run_load(args)
+    print_result(result)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()